@@ -0,0 +1,38 @@
+### Sunflow Cryptobot ###
+#
+# Benchmark of the binary search time lookup in defs against the linear scan it replaced, run from the repository with -c config
+
+# Load external libraries
+from pathlib import Path
+import numpy as np, sys, timeit
+
+# Load internal libraries from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import defs
+
+# Closest index as the old linear scan found it
+def closest_scan(data, span):
+    closest_index = None
+    min_diff = float('inf')
+    for i, t in enumerate(data['time']):
+        diff = abs(t - span)
+        if diff < min_diff:
+            min_diff = diff
+            closest_index = i
+    return closest_index
+
+# Time both lookups for growing buffers of ticks
+for count in (1000, 100000, 1000000):
+    data   = {'time': np.arange(count, dtype=np.int64) * 100}
+    span   = int(data['time'][count // 2]) + 30
+    bisect = min(timeit.repeat(lambda: defs.get_closest_index(data, span), number=1000, repeat=5)) / 1000
+    scan   = min(timeit.repeat(lambda: closest_scan(data, span), number=1, repeat=3)) if count <= 100000 else float('nan')
+    print(f"{count:>8} elements: bisect {bisect * 1e6:8.1f} us, scan {scan * 1e6:10.1f} us")
+
+# Time the window of the last second against a scan for the first element within it
+for count in (1000, 100000, 1000000):
+    data   = {'time': np.arange(count, dtype=np.int64) * 100, 'price': np.ones(count)}
+    moment = int(data['time'][-1]) - 1000
+    bisect = min(timeit.repeat(lambda: defs.get_window(data, 'price', moment), number=1000, repeat=5)) / 1000
+    scan   = min(timeit.repeat(lambda: data['price'][next(i for i, t in enumerate(data['time']) if t >= moment):], number=1, repeat=3)) if count <= 100000 else float('nan')
+    print(f"{count:>8} elements: window {bisect * 1e6:8.1f} us, scan {scan * 1e6:10.1f} us")
@@ -0,0 +1,33 @@
+### Sunflow Cryptobot ###
+#
+# Benchmark of the EWM standard deviation trackers, cost per tick by number of spans in use and cost of a new span, run from the repository with -c config
+
+# Load external libraries
+from pathlib import Path
+import numpy as np, sys, timeit
+
+# Load internal libraries from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import distance, series
+
+# Random walk of index ticks
+rng    = np.random.default_rng(1)
+count  = 10000
+times  = np.cumsum(rng.integers(50, 400, count))
+prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, count)))
+raw    = series.create({'time': times, 'price': prices})
+
+# Cost per tick by number of spans in use
+for spans in (1, 2, 8, 32):
+    distance.ewm_std.clear()
+    for span in range(20, 20 + spans):
+        distance.ewm_std_wave(raw, span)
+    ticks   = iter(range(1, 10 ** 9))
+    elapsed = min(timeit.repeat(lambda: distance.update_ewm_std(int(times[-1]) + next(ticks), 100.0), number=1000, repeat=5)) / 1000
+    print(f"{spans:>3} spans in use: {elapsed * 1e6:8.1f} us per tick")
+
+# Cost of a new span, it replays the raw ticks once
+for size in (1000, 4000, 10000):
+    window  = series.create({'time': times[-size:], 'price': prices[-size:]})
+    elapsed = min(timeit.repeat(lambda: distance.create_ewm_std(window, 50), number=3, repeat=3)) / 3
+    print(f"New span over {size:>5} raw ticks: {elapsed * 1e3:8.2f} ms")
@@ -0,0 +1,44 @@
+### Sunflow Cryptobot ###
+#
+# Benchmark of the cost per update of the indicators for the default set and a reduced set, run from the repository with -c config
+
+# Load external libraries
+from pathlib import Path
+import numpy as np, sys, timeit
+
+# Load internal libraries from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import defs, indicators, kernels, series, streaming
+
+# Indicator sets
+sets = {'default': indicators.selected, 'reduced': ["rsi", "macd", "EMA20", "SMA50"]}
+
+# Random walk of 250 klines with one minute interval
+rng    = np.random.default_rng(1)
+close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 250)))
+klines = series.create({'time': np.arange(250) * 60000, 'open': close, 'high': close * 1.001, 'low': close * 0.999, 'close': close, 'volume': np.ones(250)})
+
+# Change the open kline like a tick does
+def tick():
+    klines['close'][-1] = klines['close'][-1] * (1 + rng.normal(0, 0.0001))
+
+# Time one update per backend and set
+for name, selected in sets.items():
+    nodes = indicators.resolve(selected)
+    for backend, calculate in (('Streaming', lambda: streaming.calculate(klines, 1, nodes)), ('Kernels', lambda: kernels.calculate(klines, nodes)), ('Pandas', lambda: indicators.calculate_pandas(klines, nodes))):
+        number  = 20 if backend == 'Pandas' else 1000
+        elapsed = min(timeit.repeat(lambda: (tick(), calculate()), number=number, repeat=5)) / number
+        print(f"{name:>8} set of {len(nodes):>2} nodes: {backend:<9} {elapsed * 1e6:9.1f} us per update")
+
+# Roll to a new kline like a closed kline does, the oldest kline rolls off
+def roll():
+    global klines
+    time  = int(klines['time'][-1]) + 60000
+    price = float(klines['close'][-1]) * (1 + rng.normal(0, 0.002))
+    klines = defs.add_kline({'time': time, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': 1.0}, klines)
+
+# Time a new kline per update with streaming indicators
+for name, selected in sets.items():
+    nodes   = indicators.resolve(selected)
+    elapsed = min(timeit.repeat(lambda: (roll(), streaming.calculate(klines, 2, nodes)), number=1000, repeat=5)) / 1000
+    print(f"{name:>8} set of {len(nodes):>2} nodes: Streaming {elapsed * 1e6:9.1f} us per new kline")
@@ -0,0 +1,31 @@
+### Sunflow Cryptobot ###
+#
+# Benchmark of a full recompute of the kernels on 250 klines against pandas_ta and of each path of the exponentially weighted mean, run from the repository with -c config
+
+# Load external libraries
+from pathlib import Path
+import numpy as np, sys, timeit
+
+# Load internal libraries from the repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import indicators, kernels, series
+
+# Random walk of 250 klines with one minute interval
+rng    = np.random.default_rng(1)
+close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, 250)))
+klines = series.create({'time': np.arange(250) * 60000, 'open': close, 'high': close * 1.001, 'low': close * 0.999, 'close': close, 'volume': np.ones(250)})
+
+# Time a call in microseconds
+def measure(call, number):
+    return min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6
+
+# Full recompute of the default indicators
+print(f"Kernels {'compiled' if kernels.njit else 'without Numba'}: {measure(lambda: kernels.calculate(klines, indicators.nodes), 1000):8.1f} us per recompute")
+print(f"pandas_ta:               {measure(lambda: indicators.calculate_pandas(klines, indicators.nodes), 20):8.1f} us per recompute")
+
+# Exponentially weighted mean of the closes per path
+path = 'compiled' if kernels.njit else 'closed form'
+print(f"EWM {path:<21} {measure(lambda: kernels.ewm(close, 1 / 14, True, 14), 1000):8.1f} us")
+kernels.njit, kernels.closed_limit = None, 0
+kernels.ewm_loop = getattr(kernels.ewm_loop, "py_func", kernels.ewm_loop)
+print(f"EWM interpreted           {measure(lambda: kernels.ewm(close, 1 / 14, True, 14), 1000):8.1f} us")
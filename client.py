@@ -0,0 +1,130 @@
+### Sunflow Cryptobot ###
+#
+# Deribit REST client with a shared keep-alive connection pool, synchronous only because the event loop makes no REST calls itself,
+# handlers that call the exchange run in the worker thread when exchange_threaded is set
+
+# Load external libraries
+from requests.adapters import HTTPAdapter
+import requests, threading, time
+
+# Load internal libraries
+from loader import load_config
+import defs, rpc
+
+# Load config
+config = load_config()
+
+# Shared session, connections to the exchange are kept alive and reused
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+# Latency per endpoint in ms
+latency      = {}
+latency_lock = threading.Lock()
+
+# Quote currency per instrument, used to look up orders by label
+currencies = {}
+
+# Register latency of an endpoint
+def record_latency(endpoint, elapsed):
+
+    # Register latency, thread safe
+    with latency_lock:
+        if endpoint not in latency:
+            latency[endpoint] = {'count': 0, 'total': 0, 'last': 0, 'max': 0}
+        latency[endpoint]['count'] += 1
+        latency[endpoint]['total'] += elapsed
+        latency[endpoint]['last']   = elapsed
+        latency[endpoint]['max']    = max(latency[endpoint]['max'], elapsed)
+
+    # Return
+    return
+
+# Report latency per endpoint to stdout
+def report_latency():
+
+    # Copy latency, thread safe
+    with latency_lock:
+        endpoints = {endpoint: dict(data) for endpoint, data in latency.items()}
+
+    # Output to stdout
+    for endpoint, data in sorted(endpoints.items()):
+        average = data['total'] / data['count']
+        defs.announce(f"Latency of {endpoint} is {average:.1f} ms on average, {data['last']:.1f} ms last and {data['max']:.1f} ms maximum over {data['count']} calls")
+
+    # Return
+    return
+
+# Look up an order placed by a websocket call that may have reached the exchange, returns the response of the call or None when not placed
+def confirm(params):
+
+    # Get quote currency of the instrument once
+    instrument = params['instrument_name']
+    if instrument not in currencies:
+        currencies[instrument] = get("/public/get_instrument", {"instrument_name": instrument})['result']['quote_currency']
+
+    # Look up order by its unique label
+    data = get("/private/get_order_state_by_label", {"currency": currencies[instrument], "label": params['label']}, True)
+    if not data.get('result'):
+        return None
+
+    # Return response like placing the order does
+    return {"jsonrpc": "2.0", "result": {"order": data['result'][-1], "trades": []}}
+
+# Send a request to the exchange and return the decoded response
+def get(endpoint, params, private=False):
+
+    # Debug
+    debug = False
+
+    # Initialize variables
+    url     = config.api_url + endpoint
+    headers = {}
+
+    # Private endpoints require the access token
+    if private:
+        headers = {
+            "Authorization": f"Bearer {config.access_token}",
+            "Content-Type" : "application/json"
+        }
+
+    # Send order calls over the websocket when possible, several can be in flight at once
+    method = endpoint.lstrip("/")
+    if config.exchange_transport == "Websocket" and rpc.available(method):
+        start_time = time.perf_counter()
+        try:
+            data = rpc.request(method, params)
+            record_latency(endpoint + " (ws)", (time.perf_counter() - start_time) * 1000)
+            return data
+
+        # Message was never written, sending it over HTTP can not place or edit an order twice
+        except rpc.NotSent as e:
+            defs.announce(f"*** Warning: Websocket call to {endpoint} failed, falling back to HTTP: {e} ***")
+
+        # Message may have reached the exchange, an edit is not repeated because trailing sends a new one with current values
+        except Exception as e:
+            if method == "private/edit":
+                raise
+
+            # New orders are first looked up by label, cancels and order states are safe to repeat
+            if method in ("private/buy", "private/sell"):
+                defs.announce(f"*** Warning: Websocket call to {endpoint} failed, checking order by label: {e} ***")
+                data = confirm(params)
+                if data is not None:
+                    defs.announce(f"Order with label {params['label']} was placed, not sending it again")
+                    return data
+            defs.announce(f"*** Warning: Websocket call to {endpoint} failed, sending it over HTTP: {e} ***")
+
+    # Send request over the shared session and measure latency
+    start_time = time.perf_counter()
+    try:
+        response = session.get(url, headers=headers, params=params, timeout=config.exchange_timeout)
+    finally:
+        record_latency(endpoint, (time.perf_counter() - start_time) * 1000)
+
+    # Debug to stdout
+    if debug:
+        defs.announce(f"Debug: Response of {endpoint} has status code {response.status_code}")
+
+    # Return decoded response
+    return response.json()
@@ -3,26 +3,86 @@
 # Do database stuff
 
 # Load external libraries
+from itertools import accumulate
 import pprint
 
 # Load internal libraries
 from loader import load_config
-import defs, json
+import dbjournal, dbsqlite, dbwriter, defs, json
 
 # Load config
 config = load_config()
 
+# Closed buys sorted by avgPrice with prefix sums of their quantity and avgPrice of all buys sorted, rebuilt on every save and load of buys
+index = {'buys': None, 'size': 0, 'prices': [], 'lots': [], 'qty': [0], 'scale': 1, 'avg_prices': []}
+
+# Sort buys by avgPrice, the index is replaced at once so readers never see a partial index
+def index_buys(all_buys):
+
+    # Declare some variables global
+    global index
+
+    # Sort closed buys, buys with the same avgPrice keep their order
+    lots = sorted((buy for buy in all_buys if buy['status'] == 'Closed'), key=lambda buy: buy['avgPrice'])
+
+    # Quantities as integers over a common power of two, prefix sums are then exact and divide into a correctly rounded float
+    ratios = [float(buy['cumExecQty']).as_integer_ratio() for buy in lots]
+    scale  = max((denominator for numerator, denominator in ratios), default=1)
+    qty    = list(accumulate((numerator * (scale // denominator) for numerator, denominator in ratios), initial=0))
+
+    # Replace index
+    index = {'buys': all_buys, 'size': len(all_buys), 'prices': [buy['avgPrice'] for buy in lots], 'lots': lots, 'qty': qty, 'scale': scale, 'avg_prices': sorted(buy['avgPrice'] for buy in all_buys)}
+
+    # Return index
+    return index
+
+# Get the index of buys, rebuilt when all buys were replaced or resized without a save
+def get_index(all_buys):
+    current = index
+    if current['buys'] is not all_buys or current['size'] != len(all_buys):
+        current = index_buys(all_buys)
+    return current
+
+# Write the all buys database, the SQLite and Journal backends only write the changed and removed buys
+def write(all_buys, changed, removed, sold):
+
+    # Write rows
+    if config.dbase_backend == "SQLite":
+        if changed is None:
+            dbsqlite.save(all_buys)
+        else:
+            dbsqlite.store(changed, removed)
+
+    # Append to journal
+    elif config.dbase_backend == "Journal":
+        if changed is None:
+            dbjournal.save(all_buys)
+        else:
+            dbjournal.store(changed, removed, sold)
+
+    # Hand the file to the writer thread
+    elif config.dbase_writer:
+        dbwriter.save(all_buys)
+
+    # Write the file
+    else:
+        with open(config.dbase_file, 'w', encoding='utf-8') as json_file:
+            json.dump(all_buys, json_file)
+
+    # Return
+    return
+
 # Create a new all buy database file
-def save(all_buys, info):
+def save(all_buys, info, changed=None, removed=(), sold=False):
 
     # Debug and speed
     debug = False
     speed = True
     stime = defs.now_utc()[4]
 
-    # Write the file
-    with open(config.dbase_file, 'w', encoding='utf-8') as json_file:
-        json.dump(all_buys, json_file)
+    # Write the database and index closed buys
+    write(all_buys, changed, removed, sold)
+    index_buys(all_buys)
 
     # Get statistics and output to stdout
     result = order_count(all_buys, info)
@@ -45,10 +105,15 @@ def load(dbase_file, info):
     # Initialize variables
     all_buys = []
 
-    # Load existing database file
+    # Load existing database file, the SQLite backend imports it on first use and the Journal backend replays its journal
     try:
-        with open(dbase_file, 'r', encoding='utf-8') as json_file:
-            all_buys = json.load(json_file)
+        if config.dbase_backend == "SQLite":
+            all_buys = dbsqlite.load(dbase_file)
+        elif config.dbase_backend == "Journal":
+            all_buys = dbjournal.load(dbase_file)
+        else:
+            with open(dbase_file, 'r', encoding='utf-8') as json_file:
+                all_buys = json.load(json_file)
     except FileNotFoundError:
         defs.announce("Database with all buys not found, exiting...")
         defs.halt_sunflow = True
@@ -56,6 +121,9 @@ def load(dbase_file, info):
     except json.decoder.JSONDecodeError:
         defs.announce("Database with all buys not yet filled, may come soon!")
 
+    # Index closed buys
+    index_buys(all_buys)
+
     # Get statistics and output to stdout
     result = order_count(all_buys, info)
     defs.announce(f"Database contains {result[0]} buy transactions and {defs.format_number(result[1], info['basePrecision'])} {info['baseCoin']} was bought")
@@ -91,7 +159,7 @@ def remove(orderid, all_buys, info):
         defs.announce(f"Order with ID {orderid} removed from all buys database!")
     
     # Save to database
-    save(all_buys_new, info)
+    save(all_buys_new, info, [], [loop_buy['orderLinkId'] for loop_buy in all_buys if loop_buy['orderId'] == orderid])
 
     # Report execution time
     if speed: defs.announce(defs.report_exec(stime))
@@ -133,7 +201,7 @@ def register_buy(buy_order, all_buys, info):
         print()
 
     # Save to database
-    save(all_buys_new, info)    
+    save(all_buys_new, info, [buy_order])
 
     # Report execution time
     if speed: defs.announce(defs.report_exec(stime))
@@ -162,7 +230,7 @@ def register_sell(all_buys, all_sells, info):
     unique_ids = len(sell_order_ids)
     
     # Save to database
-    save(filtered_buys, info)
+    save(filtered_buys, info, [], [buy['orderLinkId'] for buy in all_buys if buy['orderLinkId'] in sell_order_ids], True)
     
     # Debug to stdout
     if debug:
@@ -185,6 +253,16 @@ def register_sell(all_buys, all_sells, info):
     # Return the cleaned buys
     return filtered_buys
 
+# Compact the journal into the database file in the background
+def compact():
+
+    # Only the Journal backend keeps a journal
+    if config.dbase_backend != "Journal":
+        return False
+
+    # Return compaction started
+    return dbjournal.compact()
+
 # Determine number of orders and qty
 def order_count(all_buys, info):
 
@@ -0,0 +1,180 @@
+### Sunflow Cryptobot ###
+#
+# Journal storage of the buys database, changes are appended to a journal that is compacted into the database file
+
+# Load external libraries
+import json, os, threading
+
+# Load internal libraries
+from loader import load_config
+import defs
+
+# Load config
+config = load_config()
+
+# Journal being compacted, changes made during compaction go to a new journal
+compacting_file = config.dbase_journal + ".compacting"
+
+# Journal state, guarded by lock
+journal = {'file': None, 'records': 0, 'compacting': False}
+lock    = threading.Lock()
+
+# Stored buys as JSON by orderLinkId in order of the database
+stored = {}
+
+# Replay a journal on stored, a torn last record of a crash is skipped
+def replay(journal_file):
+
+    # Initialize variables
+    records = 0
+    line    = "\n"
+
+    # Journal does not exist
+    if not os.path.exists(journal_file):
+        return records
+
+    # Apply records
+    with open(journal_file, 'r', encoding='utf-8') as journal_handle:
+        for line in journal_handle:
+            try:
+                record = json.loads(line)
+            except json.decoder.JSONDecodeError:
+                defs.log_error(f"*** Warning: Skipped incomplete record in {journal_file} ***")
+                continue
+            if record['event'] == "buy":
+                stored[record['order']['orderLinkId']] = json.dumps(record['order'])
+            else:
+                for link_id in record['orderLinkIds']:
+                    stored.pop(link_id, None)
+            records = records + 1
+
+    # End a torn record so the next record starts on its own line
+    if not line.endswith("\n"):
+        with open(journal_file, 'a', encoding='utf-8') as journal_handle:
+            journal_handle.write("\n")
+
+    # Return number of records
+    return records
+
+# Load all buys from the database file and replay the journals
+def load(dbase_file):
+
+    # Initialize variables
+    all_buys = []
+
+    # Load database file, raises when not found like the Json backend
+    with open(dbase_file, 'r', encoding='utf-8') as json_file:
+        try:
+            all_buys = json.load(json_file)
+        except json.decoder.JSONDecodeError:
+            all_buys = []
+
+    # Replay journals, a compaction that did not finish leaves its journal
+    with lock:
+        stored.clear()
+        for buy in all_buys:
+            stored[buy['orderLinkId']] = json.dumps(buy)
+        journal['records'] = replay(compacting_file) + replay(config.dbase_journal)
+        all_buys = [json.loads(data) for data in stored.values()]
+
+    # Return database
+    return all_buys
+
+# Append a record to the journal and sync it to disk, caller holds lock
+def append(record):
+    if journal['file'] is None:
+        journal['file'] = open(config.dbase_journal, 'a', encoding='utf-8')
+    journal['file'].write(json.dumps(record, separators=(',', ':')) + "\n")
+    journal['file'].flush()
+    os.fsync(journal['file'].fileno())
+    journal['records'] = journal['records'] + 1
+
+# Journal changed and removed buys, caller holds lock
+def write(changed, removed, sold):
+    for buy in changed:
+        stored[buy['orderLinkId']] = json.dumps(buy)
+        append({'event': "buy", 'order': buy})
+    if removed:
+        for link_id in removed:
+            stored.pop(link_id, None)
+        append({'event': "sold" if sold else "removed", 'orderLinkIds': list(removed)})
+
+# Store changed and removed buys, sold tells if buys were removed because they were sold
+def store(changed, removed, sold=False):
+
+    # Append records
+    with lock:
+        write(changed, removed, sold)
+
+    # Return
+    return
+
+# Save the whole database, only buys that differ from the stored buys are journaled
+def save(all_buys):
+
+    # Find changed and removed buys
+    with lock:
+        link_ids = {buy['orderLinkId'] for buy in all_buys}
+        changed  = [buy for buy in all_buys if stored.get(buy['orderLinkId']) != json.dumps(buy)]
+        removed  = [link_id for link_id in stored if link_id not in link_ids]
+
+        # Append records
+        write(changed, removed, False)
+
+    # Return
+    return
+
+# Write stored buys to the database file and remove the compacted journal, runs in a thread
+def compact_task():
+
+    # Debug and speed
+    debug = False
+    speed = True
+    stime = defs.now_utc()[4]
+
+    # Start a new journal and take the stored buys
+    with lock:
+        if journal['file'] is not None:
+            journal['file'].close()
+            journal['file'] = None
+        records = journal['records']
+        if os.path.exists(config.dbase_journal) and not os.path.exists(compacting_file):
+            os.replace(config.dbase_journal, compacting_file)
+            journal['records'] = 0
+        snapshot = "[" + ", ".join(stored.values()) + "]"
+
+    # Write database file atomically, then the compacted journal is no longer needed
+    try:
+        temp_file = config.dbase_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as json_file:
+            json_file.write(snapshot)
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        os.replace(temp_file, config.dbase_file)
+        if os.path.exists(compacting_file): os.remove(compacting_file)
+        defs.announce(f"Compacted {records} journal records into {config.dbase_file}")
+    except OSError as error:
+        defs.log_error(f"*** Warning: Compacting {config.dbase_journal} failed: {error} ***")
+
+    # Compaction done
+    with lock:
+        journal['compacting'] = False
+
+    # Report execution time
+    if speed: defs.announce(defs.report_exec(stime))
+
+    # Return
+    return
+
+# Compact the journal in a thread when it has grown beyond dbase_compact records
+def compact():
+
+    # Start compaction
+    with lock:
+        if journal['compacting'] or journal['records'] < config.dbase_compact:
+            return False
+        journal['compacting'] = True
+    threading.Thread(target=compact_task, daemon=True).start()
+
+    # Return compaction started
+    return True
@@ -0,0 +1,143 @@
+### Sunflow Cryptobot ###
+#
+# SQLite storage of the buys database, rows are written one by one in write-ahead log mode
+
+# Load external libraries
+import json, os, sqlite3, threading
+
+# Load internal libraries
+from loader import load_config
+import defs
+
+# Load config
+config = load_config()
+
+# Connection, shared by all threads and guarded by lock
+connection = None
+lock       = threading.Lock()
+
+# Stored rows as JSON by orderLinkId, used to find changed rows when saving the whole database
+stored = {}
+
+# Open the database and create the table with its indexes
+def connect():
+
+    # Declare some variables global
+    global connection
+
+    # Already connected
+    if connection is not None:
+        return connection
+
+    # Connect in write-ahead log mode, a normal sync is safe in that mode
+    connection = sqlite3.connect(config.dbase_sqlite, check_same_thread=False, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+
+    # Create table, the complete order is kept as JSON and the columns used for lookups are copied
+    connection.execute("CREATE TABLE IF NOT EXISTS buys (orderLinkId TEXT NOT NULL, orderId TEXT, status TEXT, avgPrice REAL, cumExecQty REAL, data TEXT NOT NULL)")
+    connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS buys_orderLinkId ON buys (orderLinkId)")
+    connection.execute("CREATE INDEX IF NOT EXISTS buys_orderId ON buys (orderId)")
+    connection.execute("CREATE INDEX IF NOT EXISTS buys_status ON buys (status)")
+    connection.execute("CREATE INDEX IF NOT EXISTS buys_avgPrice ON buys (avgPrice)")
+
+    # Return connection
+    return connection
+
+# Insert or update rows, rows keep their position in the database
+def upsert(buys):
+    rows = []
+    for buy in buys:
+        data = json.dumps(buy)
+        rows.append((buy['orderLinkId'], buy.get('orderId'), buy.get('status'), buy.get('avgPrice'), buy.get('cumExecQty'), data))
+        stored[buy['orderLinkId']] = data
+    connection.executemany("INSERT INTO buys (orderLinkId, orderId, status, avgPrice, cumExecQty, data) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (orderLinkId) DO UPDATE SET orderId = excluded.orderId, status = excluded.status, avgPrice = excluded.avgPrice, cumExecQty = excluded.cumExecQty, data = excluded.data", rows)
+
+# Delete rows by orderLinkId
+def delete(link_ids):
+    for link_id in link_ids:
+        stored.pop(link_id, None)
+    connection.executemany("DELETE FROM buys WHERE orderLinkId = ?", [(link_id,) for link_id in link_ids])
+
+# Import the JSON database once, the import is remembered in the user version of the database
+def import_json(json_file):
+
+    # Initialize variables
+    all_buys = []
+
+    # Already imported
+    if connection.execute("PRAGMA user_version").fetchone()[0] != 0:
+        return 0
+
+    # Load JSON database, an empty file has nothing to import
+    if os.path.exists(json_file):
+        try:
+            with open(json_file, 'r', encoding='utf-8') as json_file_handle:
+                all_buys = json.load(json_file_handle)
+        except json.decoder.JSONDecodeError:
+            all_buys = []
+
+    # Import buys and remember the import
+    connection.execute("BEGIN")
+    upsert(all_buys)
+    connection.execute("PRAGMA user_version = 1")
+    connection.execute("COMMIT")
+    defs.announce(f"Imported {len(all_buys)} buy transactions from {json_file} into {config.dbase_sqlite}")
+
+    # Return number of imported buys
+    return len(all_buys)
+
+# Load all buys in order of insertion
+def load(json_file):
+
+    # Connect and import the JSON database on first use
+    with lock:
+        connect()
+        import_json(json_file)
+
+        # Load buys
+        stored.clear()
+        all_buys = []
+        for link_id, data in connection.execute("SELECT orderLinkId, data FROM buys ORDER BY rowid"):
+            stored[link_id] = data
+            all_buys.append(json.loads(data))
+
+    # Return database
+    return all_buys
+
+# Write changed and removed buys in one transaction, caller holds lock
+def write(changed, removed):
+    connect()
+    connection.execute("BEGIN")
+    try:
+        delete(removed)
+        upsert(changed)
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+
+# Store changed and removed buys
+def store(changed, removed):
+
+    # Write rows
+    with lock:
+        write(changed, removed)
+
+    # Return
+    return
+
+# Save the whole database, only rows that differ from the stored rows are written
+def save(all_buys):
+
+    # Find changed and removed rows
+    with lock:
+        link_ids = {buy['orderLinkId'] for buy in all_buys}
+        changed  = [buy for buy in all_buys if stored.get(buy['orderLinkId']) != json.dumps(buy)]
+        removed  = [link_id for link_id in stored if link_id not in link_ids]
+
+        # Write rows
+        write(changed, removed)
+
+    # Return
+    return
@@ -0,0 +1,153 @@
+### Sunflow Cryptobot ###
+#
+# Writer thread of the buys database file, saves in quick succession are coalesced into one atomic write
+
+# Load external libraries
+import atexit, json, os, threading, time
+
+# Load internal libraries
+from loader import load_config
+import defs
+
+# Load config
+config = load_config()
+
+# Writer state, guarded by condition
+writer    = {'thread': None, 'pending': None, 'dirty': False, 'writing': False, 'error': None}
+condition = threading.Condition()
+
+# Writer statistics
+stats = {'saves': 0, 'writes': 0, 'total': 0.0, 'last': 0.0, 'max': 0.0}
+
+# Write all buys to the database file atomically, via a synced temporary file that replaces the database file
+def write_file(all_buys):
+    temp_file = config.dbase_file + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as json_file:
+        json.dump(all_buys, json_file)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    os.replace(temp_file, config.dbase_file)
+
+# Write pending buys until stopped, runs in a thread
+def run():
+
+    # Store the exception that stops the writer, so flush can report it and write the buys itself
+    try:
+        write_pending()
+    except Exception as error:
+        with condition:
+            writer['error']   = error
+            writer['writing'] = False
+            condition.notify_all()
+
+# Write pending buys, loops until an unexpected exception
+def write_pending():
+
+    # Wait for saves
+    while True:
+        with condition:
+            while not writer['dirty']:
+                condition.wait()
+
+        # Let saves in quick succession come in
+        time.sleep(config.dbase_coalesce / 1000)
+
+        # Take the latest buys
+        with condition:
+            all_buys          = writer['pending']
+            writer['pending'] = None
+            writer['dirty']   = False
+            writer['writing'] = True
+
+        # Write file, on failure the buys are pending again so a later save or flush retries
+        start_time = time.perf_counter()
+        try:
+            write_file(all_buys)
+        except (OSError, TypeError, ValueError) as error:
+            defs.log_error(f"*** Warning: Writing {config.dbase_file} failed: {error} ***")
+        except Exception:
+            with condition:
+                if not writer['dirty']:
+                    writer['pending'] = all_buys
+                    writer['dirty']   = True
+            raise
+        latency = (time.perf_counter() - start_time) * 1000
+
+        # Update statistics and wake up flush
+        with condition:
+            writer['writing'] = False
+            stats['writes']   = stats['writes'] + 1
+            stats['total']    = stats['total'] + latency
+            stats['last']     = latency
+            stats['max']      = max(stats['max'], latency)
+            condition.notify_all()
+
+# Hand all buys to the writer, the buys are copied so callers can keep changing them
+def save(all_buys):
+
+    # Start writer on first save or after it died, pending saves are flushed on exit
+    with condition:
+        if writer['thread'] is None:
+            atexit.register(flush)
+        if writer['thread'] is None or not writer['thread'].is_alive():
+            writer['thread'] = threading.Thread(target=run, daemon=True)
+            writer['thread'].start()
+
+        # Replace pending buys
+        writer['pending'] = [dict(buy) for buy in all_buys]
+        writer['dirty']   = True
+        stats['saves']    = stats['saves'] + 1
+        condition.notify_all()
+
+    # Return
+    return
+
+# Wait until all saves are written, returns False if the writer thread died
+def flush():
+
+    # Initialize variables
+    all_buys = None
+
+    # Wait for writer while it is alive, the timeout catches a thread that died without notifying
+    with condition:
+        while writer['dirty'] or writer['writing']:
+            if writer['thread'] is None or not writer['thread'].is_alive():
+                break
+            condition.wait(timeout=1)
+
+        # Take the buys the writer left behind
+        if writer['dirty']:
+            all_buys          = writer['pending']
+            writer['pending'] = None
+            writer['dirty']   = False
+        error = writer['error']
+
+    # Report why the writer stopped
+    if error is not None:
+        defs.log_error(f"*** Warning: Database writer stopped: {error!r} ***")
+
+    # Write the buys left behind ourselves
+    if all_buys is not None:
+        try:
+            write_file(all_buys)
+        except (OSError, TypeError, ValueError) as error_write:
+            defs.log_error(f"*** Warning: Writing {config.dbase_file} failed: {error_write} ***")
+            return False
+
+    # Return
+    return error is None
+
+# Report write latency and coalesced saves
+def report_writer():
+
+    # Copy statistics, thread safe
+    with condition:
+        data = dict(stats)
+
+    # Output to stdout
+    if data['writes'] > 0:
+        average = data['total'] / data['writes']
+        defs.announce(f"Database writer coalesced {data['saves']} saves into {data['writes']} writes, latency is {average:.1f} ms on average, {data['last']:.1f} ms last and {data['max']:.1f} ms maximum")
+
+    # Return
+    return
@@ -5,11 +5,11 @@
 # Load external libraries
 from pathlib import Path
 from datetime import datetime, timezone
-import apprise, inspect, math, pprint, pytz, time
+import apprise, bisect, inspect, math, numpy as np, pprint, pytz, time
 
 # Load internal libraries
 from loader import load_config
-import defs, deribit, indicators, preload
+import database, defs, deribit, indicators, preload, series, workers
 
 # Load config
 config = load_config()
@@ -27,72 +27,112 @@ for urls, tag in urls_tags:
 df_errors    = 0        # Dataframe error counter
 halt_sunflow = False    # Register halt or continue
 
-# Add new kline and remove the oldest
+# Add new kline and remove the oldest, O(1) amortised
 def new_kline(kline, klines):
 
     # Add new kline
-    klines['time'].append(kline['time'])
-    klines['open'].append(kline['open'])
-    klines['high'].append(kline['high'])
-    klines['low'].append(kline['low'])
-    klines['close'].append(kline['close'])
-    klines['volume'].append(kline['volume'])
-    klines['turnover'].append(kline['turnover'])
-    
-    # Remove first kline
-    klines['time'].pop(0)
-    klines['open'].pop(0)
-    klines['high'].pop(0)
-    klines['low'].pop(0)
-    klines['close'].pop(0)
-    klines['volume'].pop(0)
-    klines['turnover'].pop(0)
+    series.append(klines, *[kline[column] for column in klines['columns']])
+    
+    # Remove oldest klines when there are more than limit
+    series.trim(klines, config.limit)
 
     # Return klines
     return klines
 
-# Remove the first kline and replace with fresh kline
-def update_kline(kline, klines): 
+# Replace a kline in place, last one by default
+def update_kline(kline, klines, index=-1): 
 
-    # Remove last kline
-    klines['time'].pop()
-    klines['open'].pop()
-    klines['high'].pop()
-    klines['low'].pop()
-    klines['close'].pop()
-    klines['volume'].pop()
-    klines['turnover'].pop()
-    
-    # Add new kline
-    klines['time'].append(kline['time'])
-    klines['open'].append(kline['open'])
-    klines['high'].append(kline['high'])
-    klines['low'].append(kline['low'])
-    klines['close'].append(kline['close'])
-    klines['volume'].append(kline['volume'])
-    klines['turnover'].append(kline['turnover'])
+    # Override the values, views write through to the buffers
+    for column in klines['columns']:
+        klines[column][index] = kline[column]
 
     # Return klines
     return klines
 
-# Update matching kline based on time
+# Update the current kline or roll to a new kline
 def add_kline(kline, klines):
 
-    # Find the index
-    if kline['time'] in klines['time']:
-        index = klines['time'].index(kline['time'])
-        
-        # Override the values
-        klines['open'][index]     = kline['open']
-        klines['high'][index]     = kline['high']
-        klines['low'][index]      = kline['low']
-        klines['close'][index]    = kline['close']
-        klines['turnover'][index] = kline['turnover']
-        klines['volume'][index]   = kline['volume']
+    # Initialize variables
+    count = series.size(klines)
+
+    # Roll to a new kline when time advances
+    if count == 0 or kline['time'] > klines['time'][-1]:
+        klines = new_kline(kline, klines)
+
+    # Update current kline
+    elif kline['time'] == klines['time'][-1]:
+        klines = update_kline(kline, klines)
+
+    # Update an older kline if we still have it
+    else:
+        index = bisect.bisect_left(klines['time'], kline['time'])
+        if index < count and klines['time'][index] == kline['time']:
+            klines = update_kline(kline, klines, index)
     
     # Return klines
     return klines
 
+# Aggregate klines into klines of a larger interval in minutes, keeps the last limit klines
+def aggregate_klines(klines, interval):
+
+    # Initialize variables
+    size    = interval * 60 * 1000
+    buckets = klines['time'] - (klines['time'] % size)
+
+    # Find first and last kline of every bucket
+    starts  = np.flatnonzero(np.diff(buckets, prepend=-1))
+    ends    = np.append(starts[1:], len(buckets)) - 1
+
+    # Aggregate per bucket
+    aggregated = {
+        'time'    : buckets[starts],
+        'open'    : klines['open'][starts],
+        'high'    : np.maximum.reduceat(klines['high'], starts),
+        'low'     : np.minimum.reduceat(klines['low'], starts),
+        'close'   : klines['close'][ends],
+        'volume'  : np.add.reduceat(klines['volume'], starts),
+        'turnover': np.add.reduceat(klines['turnover'], starts)
+    }
+
+    # Store aggregated klines
+    aggregated = series.create(aggregated)
+    series.trim(aggregated, config.limit)
+
+    # Return aggregated klines
+    return aggregated
+
+# Check if klines of interval can be derived from base klines, the current bucket must fit in the limit base klines that are kept and their history in one download
+def derivable(interval, base):
+
+    # Both intervals are required and interval must be a multiple of base
+    if interval == 0 or base == 0 or interval % base != 0:
+        return False
+
+    # Ratio must fit in the kept klines and the download
+    ratio = interval // base
+    return ratio <= config.limit and (config.limit + 1) * ratio <= preload.klines_maximum
+
+# Derive the current kline of a larger interval in minutes from the last klines, requires derivable
+def derive_kline(klines, interval):
+
+    # Initialize variables
+    kline  = {}
+    size   = interval * 60 * 1000
+    bucket = klines['time'][-1] - (klines['time'][-1] % size)
+    start  = bisect.bisect_left(klines['time'], bucket)
+
+    # Aggregate klines in the current bucket
+    kline['time']     = int(bucket)
+    kline['open']     = float(klines['open'][start])
+    kline['high']     = float(klines['high'][start:].max())
+    kline['low']      = float(klines['low'][start:].min())
+    kline['close']    = float(klines['close'][-1])
+    kline['volume']   = float(klines['volume'][start:].sum())
+    kline['turnover'] = float(klines['turnover'][start:].sum())
+
+    # Return kline
+    return kline
+
 # Check if there are no adjacent orders already 
 def check_spread(all_buys, spot, spread):
 
@@ -100,20 +140,26 @@ def check_spread(all_buys, spot, spread):
     debug = False
 
     # Initialize variables
-    near    = 0
-    can_buy = True
+    near       = 0
+    can_buy    = True
+    avg_prices = database.get_index(all_buys)['avg_prices']
 
     # Get the boundaries
     min_price = spot * (1 - (spread / 100))
     max_price = spot * (1 + (spread / 100))
 
-    # Loop through the all buys
-    for transaction in all_buys:
-        avg_price = transaction["avgPrice"]
+    # Get the nearest buys below and above spot, when any buy is within the boundaries one of these is
+    position   = bisect.bisect_right(avg_prices, spot)
+    neighbours = avg_prices[max(position - 1, 0):position + 1]
+
+    # Check if a neighbour is within the boundaries
+    for avg_price in neighbours:
         if (avg_price >= min_price) and (avg_price <= max_price):
-             can_buy = False
-             near = min(abs((avg_price / min_price * 100) - 100), abs((avg_price / max_price * 100) - 100))
-             break
+            can_buy = False
+
+    # Distance to the nearest buy in percentage of spot
+    if neighbours:
+        near = min(abs((avg_price / spot * 100) - 100) for avg_price in neighbours)
          
     # Debug to stdout
     if debug:
@@ -345,24 +391,29 @@ def advice_buy(indicators_advice, orderbook_advice, trade_advice, pricelimit_adv
 
     # Initialize variables
     spread_advice          = {}
-    technical_indicators   = {}
     result                 = ()
 
 
     '''' Check TECHNICAL INDICATORS for buy decission '''
     
     if use_indicators['enabled']:
-        indicators_advice[interval]['filled'] = True
-        technical_indicators                  = indicators.calculate(klines[interval], spot)
-        result                                = indicators.advice(technical_indicators)
-        indicators_advice[interval]['value']  = result[0]
-        indicators_advice[interval]['level']  = result[1]
-
-        # Check if indicator advice is within range
-        if (indicators_advice[interval]['value'] >= use_indicators['minimum']) and (indicators_advice[interval]['value'] <= use_indicators['maximum']):
-            indicators_advice[interval]['result'] = True
+
+        # Workers calculate all active intervals in parallel, otherwise only this interval
+        if workers.active():
+            results = indicators.parallel_advice(klines, spot)
         else:
-            indicators_advice[interval]['result'] = False
+            results = {interval: indicators.cached_advice(klines[interval], spot, interval)}
+
+        for advice_interval, result in results.items():
+            indicators_advice[advice_interval]['filled'] = True
+            indicators_advice[advice_interval]['value']  = result[0]
+            indicators_advice[advice_interval]['level']  = result[1]
+
+            # Check if indicator advice is within range
+            if (indicators_advice[advice_interval]['value'] >= use_indicators['minimum']) and (indicators_advice[advice_interval]['value'] <= use_indicators['maximum']):
+                indicators_advice[advice_interval]['result'] = True
+            else:
+                indicators_advice[advice_interval]['result'] = False
     else:
         # If indicators are not enabled, always true
         indicators_advice[interval]['result'] = True
@@ -834,19 +885,44 @@ def scientific_to_decimal_str(number):
 # Calculates the closest index
 def get_closest_index(data, span):
     
-    # Find the closest index in the time {timeframe}
-    closest_index = None
-    min_diff = float('inf')
+    # Initialize variables
+    times = data['time']
+    
+    # No data
+    if len(times) == 0:
+        return None
+
+    # Find the neighbours of span in the sorted time
+    index = bisect.bisect_left(times, span)
+    if index == len(times):
+        index = index - 1
+    elif index > 0 and span - times[index - 1] <= times[index] - span:
+        index = index - 1
 
-    for i, t in enumerate(data['time']):
-        diff = abs(t - span)
-        if diff < min_diff:
-            min_diff = diff
-            closest_index = i
+    # On equal times use the first one
+    closest_index = bisect.bisect_left(times, times[index], 0, index)
 
     # Return closest index
     return closest_index
 
+# Get the index of the first element at or after moment
+def get_index_after(data, moment):
+    
+    # Binary search in the sorted time
+    index = bisect.bisect_left(data['time'], moment)
+
+    # Return index
+    return index
+
+# Get the elements of a column at or after moment
+def get_window(data, column, moment):
+    
+    # Slice from the first element within the window
+    window = data[column][get_index_after(data, moment):]
+
+    # Return window
+    return window
+
 # Calcuate number of items to use
 def get_index_number(data, timeframe, limit):
     
@@ -855,15 +931,13 @@ def get_index_number(data, timeframe, limit):
     span         = latest_time - timeframe    # Get the time of the last element minus the timeframe
     
     # Calculate number of items to use
-    missing  = 0
     elements = len(data['time'])
     ratio = (elements / limit) * 100
     if elements < limit:
-        missing = limit - elements
         defs.announce(f"*** Warning: Still fetching data, message will disappear ({ratio:.0f} %)! ***")
     
     closest_index = defs.get_closest_index(data, span)
-    number        = limit - closest_index - missing
+    number        = elements - closest_index
     
     # Return number
     return number
@@ -4,11 +4,11 @@
 
 # Load external libraries
 from datetime import datetime
-import hashlib, requests, pprint
+import hashlib, pprint, threading
 
 # Load internal libraries
 from loader import load_config
-import defs
+import client, defs
 
 # Load config
 config = load_config()
@@ -16,6 +16,9 @@ config = load_config()
 # Initialize token stuck counter
 token_stuck = 0
 
+# Only one thread at a time may check or renew the token
+token_lock = threading.Lock()
+
 # Set token data
 def set_token_data(token):
     
@@ -103,14 +106,12 @@ def new_token(token):
     # Get new token
     message = defs.announce("session: /public/auth")
     try:
-        url    = config.api_url + "/public/auth"
         params = {
             "grant_type"   : "client_credentials",
             "client_id"    : str(config.api_key),
             "client_secret": str(config.api_secret)
         }
-        response = requests.get(url, params=params)
-        data = response.json()
+        data = client.get("/public/auth", params)
         if debug:
             defs.announce("Debug: Raw new token response:")
             pprint.pprint(data)
@@ -138,15 +139,13 @@ def refresh_token(token):
     # Refresh token
     message = defs.announce("session: /public/auth")
     try:
-        url    = config.api_url + "/public/auth"
         params = {
             "grant_type"   : "refresh_token",
             "refresh_token": str(token['refresh']),
             "client_id"    : str(config.api_key),
             "client_secret": str(config.api_secret)
         }
-        response = requests.get(url, params=params)
-        data = response.json()
+        data = client.get("/public/auth", params)
         if debug:
             defs.announce("Debug: Raw refresh token response:")
             pprint.pprint(data)
@@ -169,6 +168,16 @@ def refresh_token(token):
 
 # Authenticate at Deribit
 def authenticate():
+
+    # Check token, thread safe
+    with token_lock:
+        check_token()
+
+    # Return
+    return
+
+# Check if the token is still valid and renew it when required
+def check_token():
   
     # Debug
     debug = False
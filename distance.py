@@ -3,23 +3,108 @@
 # Calculate trigger price distance
 
 # Load external libraries
-import math, pandas as pd, pandas_ta as ta
+from collections import deque
+import math, threading
 
 # Load internal libraries
 from loader import load_config
-import defs, preload
+import defs, history, preload, streaming
 
 # Load config
 config = load_config()
 
-# Initialize ATR timer
-atr_timer             = {}
-atr_timer['check']    = False
-atr_timer['time']     = 0
-atr_timer['interval'] = 60000
+# Not a number
+nan = float('nan')
 
-# Initialize ATR Klines
-atr_klines = {'time': [], 'open': [], 'high': [], 'low': [], 'close': [], 'volume': [], 'turnover': []}
+# Distance calculated for the last tick, reused by all callers within the same tick
+context                = {}
+context['key']         = None    # Wiggle, default distance and time of the last price, the wave does not depend on the order
+context['wave']        = 0       # Wave distance before protecting buy and sell
+context_stats          = {'reused': 0, 'computed': 0}
+context_lock           = threading.Lock()
+
+# Streaming ATR over 1 minute bars, filled by create_atr
+atr = {}
+
+# Streaming EWM standard deviation of tick returns for EMA and Hybrid by span, filled by ewm_std_wave
+ewm_std = {}
+
+# Create streaming ATR from 1 minute klines, the last kline is the open bar
+def create_atr(klines):
+
+    # Initialize ATR
+    atr.clear()
+    atr['rma']        = streaming.create_rma(14)    # Running moving average of true range
+    atr['prev_close'] = streaming.nan               # Close of the last closed bar
+    atr['bar']        = None                        # Open bar with time, high, low and close
+    atr['atrp']       = deque()                     # ATR percentages of the closed bars within limit
+    atr['sum']        = 0.0                         # Sum of ATR percentages of the closed bars
+    atr['count']      = 0                           # Number of ATR percentages that are a number
+    atr['reported']   = True                        # Last closed bar was reported
+
+    # Replay klines
+    for time, high, low, close in zip(klines['time'], klines['high'], klines['low'], klines['close']):
+        update_atr(int(time), float(high), float(low), float(close))
+
+    # Return
+    return
+
+# Get ATR percentage of the open bar, only commits when the bar closed
+def step_atr(commit):
+
+    # Initialize variables
+    bar        = atr['bar']
+    prev_close = atr['prev_close']
+    true_range = streaming.nan
+
+    # True range like pandas_ta, the first bar has none
+    if not streaming.isnan(prev_close):
+        true_range = max(abs(streaming.non_zero(bar['high'] - bar['low'])), abs(bar['high'] - prev_close), abs(prev_close - bar['low']))
+
+    # Return ATR as percentage of close
+    return streaming.step_ewm(atr['rma'], true_range, commit) / bar['close'] * 100
+
+# Close the open bar and add its ATR percentage to the average
+def close_atr():
+
+    # Commit bar
+    atr_percentage    = step_atr(True)
+    atr['prev_close'] = atr['bar']['close']
+    atr['reported']   = False
+
+    # Add to average, the open bar makes the limit complete
+    atr['atrp'].append(atr_percentage)
+    if len(atr['atrp']) > config.limit - 1:
+        atr['atrp'].popleft()
+
+    # Sum is recalculated once per bar to prevent drift
+    atr['sum']   = math.fsum(value for value in atr['atrp'] if not streaming.isnan(value))
+    atr['count'] = sum(1 for value in atr['atrp'] if not streaming.isnan(value))
+
+    # Return
+    return
+
+# Update the open bar with a 1 minute trade kline, rolls to a new bar every minute
+def update_atr(time, high, low, close):
+
+    # Start of bar
+    start = time - (time % 60000)
+    bar   = atr['bar']
+
+    # Update open bar
+    if bar is not None and bar['time'] == start:
+        bar['high']  = max(bar['high'], high)
+        bar['low']   = min(bar['low'], low)
+        bar['close'] = close
+
+    # Close open bar and start a new one, older data is ignored
+    elif bar is None or start > bar['time']:
+        if bar is not None:
+            close_atr()
+        atr['bar'] = {'time': start, 'high': high, 'low': low, 'close': close}
+
+    # Return
+    return
 
 # Calculate ATR as percentage
 def calculate_atr():
@@ -27,44 +112,26 @@ def calculate_atr():
     # Debug
     debug = False
 
-    # Declare ATR timer and klines variables global
-    global atr_timer, atr_klines
-
-    # Initialize variables
-    get_atr_klines = False
-
-    # Check every interval
-    current_time = defs.now_utc()[4]
-    if atr_timer['check']:
-        atr_timer['check'] = False
-        atr_timer['time']  = current_time
-    if current_time - atr_timer['time'] > atr_timer['interval']:
+    # Load klines once when the ATR was not created at startup
+    if not atr:
         defs.announce(f"Requesting {config.limit} klines for ATR")
-        atr_timer['check'] = True
-        atr_timer['time']  = 0
-        get_atr_klines = True
-
-    # Get ATR klines if required
-    if get_atr_klines:
-        start_time = defs.now_utc()[4]
-        atr_klines = preload.get_klines(config.symbol, 1, config.limit)
-        end_time   = defs.now_utc()[4]
-        defs.announce(f"Received {config.limit} ATR klines in {end_time - start_time}ms")
-    
-    # Initialize dataframe
-    df = pd.DataFrame(atr_klines)
-    
-    # Calculate ATR and ATR percentage
-    start_time     = defs.now_utc()[4]
-    df['ATR']      = ta.atr(df['high'], df['low'], df['close'], length=14)
-    df['ATRP']     = (df['ATR'] / df['close']) * 100
-    atr_percentage = df['ATRP'].iloc[-1]
-    atr_perc_avg   = df['ATRP'].mean()
+        create_atr(preload.get_klines(config.symbol, 1, config.limit))
+
+    # Calculate ATR percentage of the open bar and average it with the closed bars
+    if debug: start_time = defs.now_utc()[4]
+    atr_percentage = step_atr(False)
+    atr_sum        = atr['sum']
+    atr_count      = atr['count']
+    if not streaming.isnan(atr_percentage):
+        atr_sum   += atr_percentage
+        atr_count += 1
+    atr_perc_avg   = atr_sum / atr_count if atr_count > 0 else streaming.nan
     atr_multiplier = atr_percentage / atr_perc_avg
-    end_time       = defs.now_utc()[4]
+    if debug: end_time = defs.now_utc()[4]
 
-    # Report ATR data
-    if get_atr_klines:
+    # Report ATR data once per bar
+    if not atr['reported']:
+        atr['reported'] = True
         print("ATR Data (experimental)")
         print(f"ATR current percentage is {atr_percentage} %")
         print(f"ATR average percentage over {config.limit} klines is {atr_perc_avg} %")
@@ -155,6 +222,21 @@ def protect(active_order, price_distance):
     # Return active_order
     return active_order
 
+# Report reused and computed distances to stdout
+def report_context():
+
+    # Copy statistics, thread safe
+    with context_lock:
+        reused   = context_stats['reused']
+        computed = context_stats['computed']
+
+    # Output to stdout
+    if reused + computed > 0:
+        defs.announce(f"Wave distance was reused {reused} times and computed {computed} times")
+
+    # Return
+    return
+
 # Calculate distance using fixed
 def distance_fixed(active_order):
     
@@ -189,32 +271,127 @@ def distance_spot(active_order, price_distance):
     # Return active_order
     return active_order
 
+# Create streaming EWM standard deviation of tick returns over raw prices, like pandas ewm(span, adjust=False).std()
+def create_ewm_std(prices, span):
+
+    # Initialize EWM standard deviation
+    tracker            = {}
+    tracker['alpha']   = 2 / (span + 1)                                      # Weight of the newest return
+    tracker['horizon'] = max(config.history_raw, config.wave_timeframe)      # Same horizon as the raw ticks of history
+    tracker['price']   = None                                                # Last price
+    tracker['mean']    = nan                                                 # Weighted mean of returns
+    tracker['cov']     = 0.0                                                 # Weighted variance of returns
+    tracker['sum_wt']  = 1.0                                                 # Sum of weights
+    tracker['sum_wt2'] = 1.0                                                 # Sum of squared weights
+    tracker['nobs']    = 0                                                   # Number of returns
+    tracker['std']     = nan                                                 # Standard deviation after the last price
+    tracker['maximum'] = deque()                                             # Time and standard deviation, decreasing, for the rolling maximum
+    tracker['used']    = 0                                                   # Time of the last price when the span was last used
+
+    # Replay prices
+    for time, price in zip(prices['time'], prices['price']):
+        step_ewm_std(tracker, int(time), float(price))
+
+    # Return tracker
+    return tracker
+
+# Step EWM standard deviation with a tick, same recursion as pandas ewmcov with bias False
+def step_ewm_std(tracker, time, price):
+
+    # Initialize variables
+    alpha = tracker['alpha']
+    decay = 1 - alpha
+
+    # Return since the previous price, the first price has none
+    value = nan
+    if tracker['price'] is not None and tracker['price'] != 0:
+        value = price / tracker['price'] - 1
+    tracker['price'] = price
+    is_obs = value == value
+
+    # Weigh return, the first return only starts the mean
+    if is_obs: tracker['nobs'] += 1
+    if tracker['mean'] == tracker['mean']:
+        tracker['sum_wt']  *= decay
+        tracker['sum_wt2'] *= decay * decay
+        if is_obs:
+            old_mean = tracker['mean']
+            if old_mean != value:
+                tracker['mean'] = (decay * old_mean + alpha * value) / (decay + alpha)
+            mean = tracker['mean']
+            tracker['cov']      = (decay * (tracker['cov'] + (old_mean - mean) * (old_mean - mean)) + alpha * ((value - mean) * (value - mean))) / (decay + alpha)
+            tracker['sum_wt']   = (tracker['sum_wt'] + alpha) / (decay + alpha)
+            tracker['sum_wt2']  = (tracker['sum_wt2'] + alpha * alpha) / ((decay + alpha) * (decay + alpha))
+    elif is_obs:
+        tracker['mean'] = value
+
+    # Unbiased variance as standard deviation
+    std = nan
+    if tracker['nobs'] >= 1:
+        numerator   = tracker['sum_wt'] * tracker['sum_wt']
+        denominator = numerator - tracker['sum_wt2']
+        if denominator > 0:
+            std = math.sqrt(max((numerator / denominator) * tracker['cov'], 0))
+    tracker['std'] = std
+
+    # Keep rolling maximum, smaller values before this one can never be the maximum again
+    maximum = tracker['maximum']
+    if std == std:
+        while maximum and maximum[-1][1] <= std:
+            maximum.pop()
+        maximum.append((time, std))
+    while maximum and maximum[0][0] < time - tracker['horizon']:
+        maximum.popleft()
+
+    # Return
+    return
+
+# Update the EWM standard deviation of every span with a tick
+def update_ewm_std(time, price):
+
+    # Step all trackers
+    for tracker in ewm_std.values():
+        step_ewm_std(tracker, time, price)
+
+    # Return
+    return
+
+# Normalize last EWM standard deviation of returns to a 0-1 scale, one tracker is kept per span used within wave_timeframe
+# Every tick steps each kept tracker and a new span replays the raw ticks once, so a tick costs O(spans in use) and a span change O(raw ticks)
+def ewm_std_wave(prices, span):
+
+    # Get tracker of span as most recently used, create it from all prices when new
+    tracker = ewm_std.pop(span, None)
+    if tracker is None:
+        tracker = create_ewm_std(prices, span)
+    tracker['used'] = prices['time'][-1]
+    ewm_std[span]   = tracker
+
+    # Drop trackers that are no longer in use, at most 32 are kept
+    while len(ewm_std) > 32 or ewm_std[next(iter(ewm_std))]['used'] < tracker['used'] - config.wave_timeframe:
+        ewm_std.pop(next(iter(ewm_std)))
+
+    # Only the maximum within the raw ticks counts
+    maximum = tracker['maximum']
+    while maximum and maximum[0][0] < prices['time'][0]:
+        maximum.popleft()
+
+    # Return wave, not a number like pandas when there was no deviation yet
+    if not maximum or maximum[0][1] == 0:
+        return nan
+    return tracker['std'] / maximum[0][1]
+
 # Calculate distance using EMA
-def distance_ema(active_order, prices, price_distance):
+def distance_ema(active_order, prices, price_distance, prevent=True):
     
     # Devide normalized value by this, ie. 2 means it will range between 0 and 0.5
     scaler = 1
     
     # Number of prices to use
-    number = defs.get_index_number(prices, config.timeframe, config.limit)
+    number = defs.get_index_number(prices, config.wave_timeframe, config.limit)
 
-    # Convert the lists to a pandas DataFrame
-    df = pd.DataFrame({
-        'price': prices['price'],
-        'time': pd.to_datetime(prices['time'], unit='ms')
-    })
-    
-    # Set time as the index
-    df.set_index('time', inplace=True)
-        
-    # Calculate the periodic returns
-    df['returns'] = df['price'].pct_change()
-    
-    # Apply an exponentially weighted moving standard deviation to the returns
-    df['ewm_std'] = df['returns'].ewm(span=number, adjust=False).std()
-    
-    # Normalize the last value of EWM_Std to a 0-1 scale
-    wave = df['ewm_std'].iloc[-1] / df['ewm_std'].max()
+    # Normalize the last EWM standard deviation of the returns to a 0-1 scale
+    wave = ewm_std_wave(prices, number)
     
     # Calculate trigger price distance percentage
     active_order['wave'] = (wave / scaler)
@@ -224,13 +401,14 @@ def distance_ema(active_order, prices, price_distance):
         active_order['wave'] = active_order['distance']
     
     # Prevent sell at loss and other issues
-    active_order = protect(active_order, price_distance)
+    if prevent:
+        active_order = protect(active_order, price_distance)
     
     # Return active_order
     return active_order
 
 # Calculate distance using hybrid
-def distance_hybrid(active_order, prices, price_distance):
+def distance_hybrid(active_order, prices, price_distance, prevent=True):
 
     # Devide normalized value by this, ie. 2 means it will range between 0 and 0.5
     scaler = 2
@@ -239,22 +417,13 @@ def distance_hybrid(active_order, prices, price_distance):
     number = defs.get_index_number(prices, config.wave_timeframe, config.limit)
     
     # Adaptive EMA span based on volatility
-    recent_prices = pd.Series(prices['price'][-number:])      # Get recent prices
-    volatility = recent_prices.std() / recent_prices.mean()   # Calculate volatility as a percentage
-    if math.isnan(volatility): volatility = 0                 # Safeguard volatilty
-    ema_span = max(5, int(number * (1 + volatility)))         # Adjust span based on volatility, minimum span of 5
-
-    # Convert the list to a pandas DataFrame
-    df = pd.DataFrame(prices['price'], columns=['price'])
-
-    # Calculate the periodic returns
-    df['returns'] = df['price'].pct_change()
-
-    # Apply an exponentially weighted moving standard deviation to the returns
-    df['ewm_std'] = df['returns'].ewm(span=ema_span, adjust=False).std()
+    recent_prices = prices['price'][-number:]                                                      # Get recent prices
+    volatility    = recent_prices.std(ddof=1) / recent_prices.mean() if number > 1 else nan      # Calculate volatility as a percentage
+    if math.isnan(volatility): volatility = 0                                                    # Safeguard volatilty
+    ema_span = max(5, int(number * (1 + volatility)))                                            # Adjust span based on volatility, minimum span of 5
 
-    # Normalize the last value of EWM_Std to a 0-1 scale
-    wave = df['ewm_std'].iloc[-1] / df['ewm_std'].max()
+    # Normalize the last EWM standard deviation of the returns to a 0-1 scale
+    wave = ewm_std_wave(prices, ema_span)
 
     # Calculate dynamic scaler based on market conditions (here we just use the default scaler, but it could be dynamic)
     dynamic_scaler = scaler
@@ -263,7 +432,8 @@ def distance_hybrid(active_order, prices, price_distance):
     active_order['wave'] = (wave / dynamic_scaler) + active_order['distance']
 
     # Prevent sell at loss and other issues
-    active_order = protect(active_order, price_distance)
+    if prevent:
+        active_order = protect(active_order, price_distance)
     
     # Return active_order
     return active_order
@@ -303,7 +473,7 @@ def distance_wave(active_order, prices, price_distance, prevent=True):
     return active_order   
 
 # Calculate distance using wave taking ATR into account
-def distance_atr(active_order, prices, price_distance):
+def distance_atr(active_order, prices, price_distance, prevent=True):
 
     # Initialize variables
     scaler = 1
@@ -322,27 +492,14 @@ def distance_atr(active_order, prices, price_distance):
     active_order['wave'] = atr_multiplier * active_order['wave']
 
     # Prevent sell at loss and other issues
-    active_order = protect(active_order, price_distance)
+    if prevent:
+        active_order = protect(active_order, price_distance)
     
     # Return active_order
     return active_order
 
-# Calculate trigger price distance
-def calculate(active_order, prices):
-
-    # Debug and speed
-    debug = False
-    speed = True
-    stime = defs.now_utc()[4]
-
-    # Store previous fluctuation
-    previous_fluctuation = active_order['fluctuation']
-    
-    # By default fluctuation equals distance
-    active_order['fluctuation'] = active_order['distance']
-    
-    # Calculate price distance since start of trailing in percentages 
-    price_distance = ((active_order['current'] - active_order['start']) / active_order['start']) * 100
+# Calculate trigger price distance with the configured wiggle, without prevent only the wave is set
+def wiggle(active_order, prices, price_distance, prevent=True):
 
     ''' Use FIXED to set trigger price distance '''
     if active_order['wiggle'] == "Fixed":
@@ -354,19 +511,68 @@ def calculate(active_order, prices):
 
     ''' Use WAVE to set distance '''
     if active_order['wiggle'] == "Wave":
-        active_order = distance_wave(active_order, prices, price_distance)
+        active_order = distance_wave(active_order, prices, price_distance, prevent)
 
     ''' Use ATR for WAVE to set distance '''
     if active_order['wiggle'] == "ATR":
-        active_order = distance_atr(active_order, prices, price_distance)
+        active_order = distance_atr(active_order, prices, price_distance, prevent)
 
     ''' Use EMA to set trigger price distance '''
     if active_order['wiggle'] == "EMA":
-        active_order = distance_ema(active_order, prices, price_distance)
+        active_order = distance_ema(active_order, prices, price_distance, prevent)
 
     ''' Use HYBRID to set distance '''
     if active_order['wiggle'] == "Hybrid":
-        active_order = distance_hybrid(active_order, prices, price_distance)
+        active_order = distance_hybrid(active_order, prices, price_distance, prevent)
+
+    # Return modified data
+    return active_order
+
+# Calculate trigger price distance, once per tick and order
+def calculate(active_order, prices):
+
+    # Debug and speed
+    debug = False
+    speed = True
+    stime = defs.now_utc()[4]
+
+    # Trigger price distance uses raw ticks
+    prices = history.view(prices, "raw")
+
+    # Store previous fluctuation
+    previous_fluctuation = active_order['fluctuation']
+    
+    # By default fluctuation equals distance
+    active_order['fluctuation'] = active_order['distance']
+
+    # Calculate price distance since start of trailing in percentages
+    price_distance = ((active_order['current'] - active_order['start']) / active_order['start']) * 100
+
+    # Fixed and spot only depend on the order, they are cheap to calculate
+    if active_order['wiggle'] in ("Fixed", "Spot"):
+        active_order = wiggle(active_order, prices, price_distance)
+
+    # Reuse the wave when it was already calculated for this price, any order or side can use it
+    else:
+        key = (active_order['wiggle'], active_order['distance'], int(prices['time'][-1]))
+        with context_lock:
+            reuse = context['key'] == key
+            if reuse:
+                active_order['wave']     = context['wave']
+                context_stats['reused'] += 1
+
+        # Calculate wave and store it for other callers until the next price
+        if not reuse:
+            active_order = wiggle(active_order, prices, price_distance, False)
+            with context_lock:
+                context['key']             = key
+                context['wave']            = active_order['wave']
+                context_stats['computed'] += 1
+        elif debug:
+            defs.announce("Debug: Reused wave distance of this price")
+
+        # Prevent sell at loss and other issues, this depends on the order
+        active_order = protect(active_order, price_distance)
 
     # Output to stdout
     if previous_fluctuation != active_order['fluctuation']:
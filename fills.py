@@ -0,0 +1,172 @@
+### Sunflow Cryptobot ###
+#
+# Order state cache fed by user.orders and user.trades websocket subscriptions
+
+# Load external libraries
+import threading
+
+# Load internal libraries
+from loader import load_config
+import defs, rpc
+
+# Load config
+config = load_config()
+
+# Subscription state
+state               = {}
+state['subscribed'] = False    # Private channels are subscribed on the current websocket
+state['limit']      = 100      # Maximum number of orders kept in cache
+state['pushed']     = 0        # Number of order and trade events received
+
+# Order state and trades by order ID, a triggered stop order fills as a new order with the same label and its trigger_order_id
+orders     = {}
+trades     = {}
+fills_lock = threading.Lock()
+
+# Private channels for symbol
+def channels(symbol):
+    return [f"user.orders.{symbol.upper()}.raw", f"user.trades.{symbol.upper()}.raw"]
+
+# Subscribe to private channels, runs as a task within the event loop
+async def subscribe(symbol):
+
+    # Subscribe via JSON-RPC, connection is authorized first
+    try:
+        data = await rpc.call("private/subscribe", {"channels": channels(symbol)})
+    except Exception as e:
+        message = f"*** Warning: Subscribing to order and trade updates failed, polling instead ***\n>>> Message: {e}"
+        defs.log_error(message)
+        return
+
+    # Check response
+    if 'result' in data:
+        state['subscribed'] = True
+        defs.announce(f"Subscribed to private channels: {', '.join(data['result'])}")
+    else:
+        defs.log_error(f"*** Warning: Subscribing to order and trade updates failed, polling instead: {data} ***")
+
+    # Return
+    return
+
+# Websocket closed, events may be missed until subscribed again
+def unsubscribe():
+
+    # Reset subscription
+    state['subscribed'] = False
+
+    # Return
+    return
+
+# Check if fills are pushed
+def active():
+    return state['subscribed']
+
+# Store order, drop oldest orders when cache is full
+def store(order):
+
+    # Store as most recent
+    orders.pop(order['order_id'], None)
+    orders[order['order_id']] = order
+
+    # Limit cache
+    while len(orders) > state['limit']:
+        order_id = next(iter(orders))
+        orders.pop(order_id)
+        trades.pop(order_id, None)
+
+    # Return
+    return
+
+# Handle order updates
+def handle_orders(message):
+
+    # Debug
+    debug = False
+
+    # Get order
+    order = message['params']['data']
+
+    # Store order, thread safe
+    with fills_lock:
+        store(order)
+        state['pushed'] += 1
+
+    # Output to stdout
+    if order['order_state'] == "filled":
+        defs.announce(f"Order with order ID '{order['order_id']}' filled, received via websocket")
+    elif debug:
+        defs.announce(f"Debug: Order with order ID '{order['order_id']}' is {order['order_state']}")
+
+    # Return
+    return
+
+# Handle trade updates
+def handle_trades(message):
+
+    # Debug
+    debug = False
+
+    # Register trades, thread safe
+    with fills_lock:
+        for trade in message['params']['data']:
+            trades.setdefault(trade['order_id'], []).append(trade)
+            state['pushed'] += 1
+
+            # Debug to stdout
+            if debug:
+                defs.announce(f"Debug: Trade of {trade['amount']} at {trade['price']} for order ID '{trade['order_id']}'")
+
+    # Return
+    return
+
+# Check if an order or trade belongs to the order, by its own ID, the stop order that triggered it or its label
+def matches(event, order_id, label):
+    return event.get('order_id') == order_id or event.get('trigger_order_id') == order_id or (label is not None and event.get('label') == label)
+
+# Check if an order was filled according to pushed events
+def filled(order_id, label=None):
+
+    # Initialize variables
+    is_filled = False
+
+    # Check order states and trades, thread safe, the cache is small
+    with fills_lock:
+        for order in orders.values():
+            if matches(order, order_id, label) and order['order_state'] == "filled":
+                is_filled = True
+        for order_trades in trades.values():
+            for trade in order_trades:
+                if matches(trade, order_id, label) and trade['state'] == "filled":
+                    is_filled = True
+
+    # Return
+    return is_filled
+
+# Get filled order like get_order_state returns it, empty if not filled, when the fill is a new order it keeps the order ID and fields of the stop order
+def filled_order(order_id, label=None):
+
+    # Initialize variables
+    data = {}
+
+    # Get order, thread safe
+    with fills_lock:
+        for order in orders.values():
+            if matches(order, order_id, label) and order['order_state'] == "filled":
+                data = {'result': {**orders.get(order_id, {}), **order, 'order_id': order_id}}
+
+    # Return order
+    return data
+
+# Remove order and the orders it triggered from cache when trailing closed
+def forget(order_id, label=None):
+
+    # Remove, thread safe
+    with fills_lock:
+        for key in [key for key, order in orders.items() if matches(order, order_id, label)]:
+            orders.pop(key)
+            trades.pop(key, None)
+        for key in [key for key, order_trades in trades.items() if any(matches(trade, order_id, label) for trade in order_trades)]:
+            trades.pop(key)
+
+    # Return
+    return
@@ -0,0 +1,92 @@
+### Sunflow Cryptobot ###
+#
+# Tiered price history, raw ticks for a short horizon and minute bars for longer ones
+
+# Load internal libraries
+from loader import load_config
+import series
+
+# Load config
+config = load_config()
+
+# Bar sizes in ms per tier
+bar_sizes = {'minute': 60000}
+
+# Create history from a dictionary of lists, ie. {'time': [], 'price': []}, longest horizon in ms
+def create(prices, limit_max):
+
+    # Initialize history
+    history            = {}
+    history['raw']     = series.create({'time': [], 'price': []})
+    history['minute']  = series.create({'time': [], 'open': [], 'high': [], 'low': [], 'close': []})
+    history['horizon'] = {
+        'raw'   : max(config.history_raw, config.wave_timeframe),    # Raw ticks, used for trigger price distance
+        'minute': limit_max                                          # Minute bars, used by the optimizer
+    }
+
+    # Fill tiers from preloaded prices
+    for time, price in zip(prices['time'], prices['price']):
+        append(history, time, price)
+    if prices['time']:
+        evict(history, prices['time'][-1])
+
+    # Return history
+    return history
+
+# Add price to an open bar or start a new bar
+def add_bar(bars, size, time, price):
+
+    # Start of bar
+    start = time - (time % size)
+
+    # Fold a late tick into the open bar, bars stay in order of time and the close stays the latest price
+    if series.size(bars) > 0 and bars['time'][-1] > start:
+        bars['high'][-1] = max(bars['high'][-1], price)
+        bars['low'][-1]  = min(bars['low'][-1], price)
+
+    # Update open bar, views write through to the buffers
+    elif series.size(bars) > 0 and bars['time'][-1] == start:
+        bars['high'][-1]  = max(bars['high'][-1], price)
+        bars['low'][-1]   = min(bars['low'][-1], price)
+        bars['close'][-1] = price
+
+    # Start new bar
+    else:
+        series.append(bars, start, price, price, price, price)
+
+    # Return
+    return
+
+# Append tick to all tiers
+def append(history, time, price):
+
+    # Raw ticks, a late tick is dropped so time stays sorted and the last price stays the latest
+    if series.size(history['raw']) == 0 or time >= history['raw']['time'][-1]:
+        series.append(history['raw'], time, price)
+
+    # Bars
+    for tier, size in bar_sizes.items():
+        add_bar(history[tier], size, time, price)
+
+    # Return
+    return
+
+# Remove data outside the horizon of each tier
+def evict(history, current_time):
+
+    # Evict per tier
+    for tier, horizon in history['horizon'].items():
+        series.evict(history[tier], current_time - horizon)
+
+    # Return
+    return
+
+# Get time and price of a tier, bars use their close price
+def view(history, resolution):
+
+    # Raw ticks
+    if resolution == "raw":
+        return history['raw']
+
+    # Bars
+    return {'time': history[resolution]['time'], 'price': history[resolution]['close']}
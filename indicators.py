@@ -3,202 +3,388 @@
 # Calculate technical indicators
 
 # Load external libraries
-import pandas as pd, pandas_ta as ta
+import pandas as pd, pandas_ta as ta, threading
 
 # Load internal libraries
-import defs
+from loader import load_config
+import defs, kernels, series, streaming, workers
+
+# Load config
+config = load_config()
+
+# Dependencies of each indicator, moving averages are added per length
+graph = {
+    'rsi'      : [],
+    'stochk'   : ['range'],
+    'cci'      : ['rsi'],             # Advice of CCI is based on RSI
+    'adx'      : [],
+    'ao'       : [],
+    'momentum' : [],
+    'macd'     : ['EMA12', 'EMA26'],
+    'stochrsi' : ['rsi'],
+    'williamsr': ['range'],
+    'uo'       : [],
+    'range'    : []                   # Lowest low and highest high
+}
+for length in (10, 12, 20, 26, 30, 50, 100, 200):
+    graph[f"EMA{length}"] = []
+    graph[f"SMA{length}"] = []
+
+# Resolve indicators into the set of indicators to calculate, including their dependencies
+def resolve(names):
 
-# Calculcate indicators based on klines
-def calculate(klines, spot):
+    # Initialize variables
+    nodes = set()
+    stack = [name for name in names if name in graph]
+
+    # Walk dependencies
+    while stack:
+        name = stack.pop()
+        if name not in nodes:
+            nodes.add(name)
+            stack.extend(graph[name])
+
+    # Return indicators to calculate
+    return frozenset(nodes)
+
+# Indicators used for advice and the indicators to calculate for them
+selected = [name for name in config.indicators_set if name in graph]
+nodes    = resolve(selected)
+
+# Advice cache per interval, keyed on the state of the last kline
+cache       = {}
+cache_stats = {'hits': 0, 'misses': 0}
+cache_lock  = threading.Lock()
+
+# Calculcate indicator values based on klines using pandas_ta
+def calculate_pandas(klines, nodes):
     
     # Debug
     debug = False
     
     # Initialize variables
-    indicators = {}
-    df = pd.DataFrame(klines)
+    values = {}
+    df = pd.DataFrame(series.columns(klines))
 
-    # Calculate start and end times
-    if debug:
-        start_time = defs.now_utc()[4]
-        defs.announce("Calculating indicators")
-        
     # Indicators: Calculate various Oscillators
-    df['RSI']         = ta.rsi(df['close'], length=14)
-    df['CCI']         = ta.cci(df['high'], df['low'], df['close'], length=20)
-    df['AO']          = ta.ao(df['high'], df['low'], fast=5, slow=34)    
-    df['Momentum']    = ta.mom(df['close'], length=10)
-    df['WilliamsR']   = ta.willr(df['high'], df['low'], df['close'], length=14)
-    #df['BullBear']
-    df['UO']          = ta.uo(df['high'], df['low'], df['close'], fast=7, medium=14, slow=28)
+    if 'rsi' in nodes:
+        values['rsi']            = ta.rsi(df['close'], length=14).iloc[-1]
+    if 'cci' in nodes:
+        values['cci']            = ta.cci(df['high'], df['low'], df['close'], length=20).iloc[-1]
+    if 'ao' in nodes:
+        ao                       = ta.ao(df['high'], df['low'], fast=5, slow=34)
+        values['ao']             = ao.iloc[-1]
+        values['ao_prev']        = ao.iloc[-2]
+    if 'momentum' in nodes:
+        momentum                 = ta.mom(df['close'], length=10)
+        values['momentum']       = momentum.iloc[-1]
+        values['momentum_prev']  = momentum.iloc[-2]
+    if 'williamsr' in nodes:
+        values['williamsr']      = ta.willr(df['high'], df['low'], df['close'], length=14).iloc[-1]
+    if 'uo' in nodes:
+        values['uo']             = ta.uo(df['high'], df['low'], df['close'], fast=7, medium=14, slow=28).iloc[-1]
 
     # Indicator: Stochastic % K Oscillator
-    stoch_k           = {}
-    stoch_k_result    = ta.stoch(df['high'], df['low'], df['close'], k=14, d=3, smooth_k=3)
-    stoch_k['k']      = stoch_k_result['STOCHk_14_3_3']
-    stoch_k['d']      = stoch_k_result['STOCHd_14_3_3']
+    if 'stochk' in nodes:
+        stoch_k_result           = ta.stoch(df['high'], df['low'], df['close'], k=14, d=3, smooth_k=3)
+        values['stoch_k']        = stoch_k_result['STOCHk_14_3_3'].iloc[-1]
+        values['stoch_d']        = stoch_k_result['STOCHd_14_3_3'].iloc[-1]
 
     # Indicator: MACD Lines Oscillator
-    macd              = {}
-    macd_result       = ta.macd(df['close'], fast=12, slow=26)
-    macd['macd']      = macd_result['MACD_12_26_9']
-    macd['histogram'] = macd_result['MACDh_12_26_9']
-    macd['signal']    = macd_result['MACDs_12_26_9']
-    
+    if 'macd' in nodes:
+        macd_result              = ta.macd(df['close'], fast=12, slow=26)
+        values['macd']           = macd_result['MACD_12_26_9'].iloc[-1]
+        values['macd_hist']      = macd_result['MACDh_12_26_9'].iloc[-1]
+        values['macd_hist_prev'] = macd_result['MACDh_12_26_9'].iloc[-2]
+        values['macd_signal']    = macd_result['MACDs_12_26_9'].iloc[-1]
+
     # Indicator: Stochastic RSI Fast Oscillator
-    stoch_rsi         = {}
-    stoch_rsi_result  = ta.stochrsi(df['close'], length=14, rsi_length=14, k=3, d=3)   
-    stoch_rsi['k']    = stoch_rsi_result['STOCHRSIk_14_14_3_3']
-    stoch_rsi['d']    = stoch_rsi_result['STOCHRSId_14_14_3_3']
+    if 'stochrsi' in nodes:
+        stoch_rsi_result         = ta.stochrsi(df['close'], length=14, rsi_length=14, k=3, d=3)
+        values['stochrsi_k']     = stoch_rsi_result['STOCHRSIk_14_14_3_3'].iloc[-1]
+        values['stochrsi_d']     = stoch_rsi_result['STOCHRSId_14_14_3_3'].iloc[-1]
 
     # Indicator: Average Directional Index Oscillator
-    adx               = {}
-    adx_result        = ta.adx(df['high'], df['low'], df['close'], length=14)
-    adx['adx']        = adx_result['ADX_14']
-    adx['dmp']        = adx_result['DMP_14']
-    adx['dmn']        = adx_result['DMN_14']
+    if 'adx' in nodes:
+        adx_result               = ta.adx(df['high'], df['low'], df['close'], length=14)
+        values['adx']            = adx_result['ADX_14'].iloc[-1]
+        values['dmp']            = adx_result['DMP_14'].iloc[-1]
+        values['dmn']            = adx_result['DMN_14'].iloc[-1]
 
     ## Indicators: Calculate various Moving Averages
-    df['EMA10']       = ta.ema(df['close'], length=10)
-    df['SMA10']       = ta.sma(df['close'], length=10)
-    df['EMA20']       = ta.ema(df['close'], length=20)
-    df['SMA20']       = ta.sma(df['close'], length=20)      
-    df['EMA30']       = ta.ema(df['close'], length=30)
-    df['SMA30']       = ta.sma(df['close'], length=30)
-    df['EMA50']       = ta.ema(df['close'], length=50)
-    df['SMA50']       = ta.sma(df['close'], length=50)
-    df['EMA100']      = ta.ema(df['close'], length=100)
-    df['SMA100']      = ta.sma(df['close'], length=100)
-    df['EMA200']      = ta.ema(df['close'], length=200)
-    df['SMA200']      = ta.sma(df['close'], length=200)
-    df['VWMA']        = ta.vwma(df['close'], df['volume'], length=20)
-    df['HMA']         = ta.hma(df['close'], length=9)
+    for name in nodes:
+        if name[:3] == "EMA": values[name] = ta.ema(df['close'], length=int(name[3:])).iloc[-1]
+        if name[:3] == "SMA": values[name] = ta.sma(df['close'], length=int(name[3:])).iloc[-1]
 
     # Debug to stdout
     if debug:
-        print("Combined Dataframes")
-        print(df)
-        print("MACD Dataframes")
-        print(macd_result)
-        print("Stochastic % K Dataframes")
-        print(stoch_k_result)
-        print("Stochastic RSI Fast Dataframes")
-        print(stoch_rsi_result)
-        print("Average Directional Index")
-        print(adx_result)
-
-    ## Determine advice per indicator
+        defs.announce("Debug: Indicator values of the last kline")
+        print(values)
+
+    # Return indicator values
+    return values
+
+# Calculate indicator values incrementally, with NumPy kernels or with pandas_ta
+def calculate_values(klines, interval=0):
+
+    # Close policy calculates on the last closed kline, not on the open kline that is still forming
+    if config.indicators_policy == "Close":
+        klines = closed(klines)
+
+    # Select backend
+    if config.indicators_backend == "Streaming":
+        values = streaming.calculate(klines, interval, nodes)
+    elif config.indicators_backend == "Kernels":
+        values = kernels.calculate(klines, nodes)
+    else:
+        values = calculate_pandas(klines, nodes)
+
+    # Return indicator values
+    return values
+
+# Calculcate indicators based on klines
+def calculate(klines, spot, interval=0):
+    
+    # Debug
+    debug = False
+
+    # Calculate start and end times
+    if debug:
+        start_time = defs.now_utc()[4]
+        defs.announce("Calculating indicators")
+
+    # Calculate indicator values
+    values = calculate_values(klines, interval)
+
+    # Determine advice per indicator
+    indicators = evaluate(values, spot, selected)
+
+    # Debug to stdout
+    if debug:
+        defs.announce("Advice calculated:")
+        print(indicators)
+        end_time = defs.now_utc()[4]
+        defs.announce(f"{config.indicators_backend} spent {end_time - start_time}ms calculating indicators and advice")
+    
+    # Return technicals
+    return indicators
+
+# Calculate advice, skipped when the last kline did not change or the policy does not require it
+def cached_advice(klines, spot, interval=0):
+
+    # Debug
+    debug = False
+
+    # Initialize variables
+    current_time = defs.now_utc()[4]
+    bar          = last_bar(klines)
+    entry        = cache.get(interval)
+
+    # Calculate indicator values or use cache, values are missing when advice was calculated by a worker
+    if stale(entry, bar, current_time) or entry['values'] is None:
+        values = calculate_values(klines, interval)
+        entry = {'bar': bar, 'time': current_time, 'values': values, 'spot': None, 'result': ()}
+        cache[interval] = entry
+
+    # Moving averages compare against spot, advice only has to be redone when spot changed
+    hit = entry['spot'] == spot
+    if not hit:
+        entry['result'] = advice(evaluate(entry['values'], spot, selected))
+        entry['spot']   = spot
+
+    # Register hit or miss, thread safe
+    with cache_lock:
+        if hit:
+            cache_stats['hits'] += 1
+        else:
+            cache_stats['misses'] += 1
+
+    # Debug to stdout
+    if debug:
+        defs.announce(f"Debug: Indicator advice for interval {interval}m was {'cached' if hit else 'calculated'}")
+
+    # Return strength and advice
+    return entry['result']
+
+# Calculate advice of all intervals at once, intervals that are not cached are calculated in parallel by the workers
+def parallel_advice(klines, spot):
+
+    # Initialize variables
+    current_time = defs.now_utc()[4]
+    results      = {}
+    futures      = {}
+    hits         = 0
+    misses       = 0
+
+    # Use cache or submit to worker
+    for interval in klines:
+        bar   = last_bar(klines[interval])
+        entry = cache.get(interval)
+        if not stale(entry, bar, current_time) and entry['spot'] == spot:
+            results[interval] = entry['result']
+            hits += 1
+        else:
+            futures[interval] = (bar, workers.submit(interval, klines[interval], spot))
+
+    # Collect advice, fall back to calculating in this process when a worker fails
+    for interval, (bar, future) in futures.items():
+        try:
+            results[interval] = future.result()
+            cache[interval]   = {'bar': bar, 'time': current_time, 'values': None, 'spot': spot, 'result': results[interval]}
+            misses += 1
+        except Exception as e:
+            if workers.active():
+                defs.log_error(f"*** Warning: Indicator worker for interval {interval}m failed, calculating indicators serially ***\n>>> Message: {e}")
+                workers.stop()
+            results[interval] = cached_advice(klines[interval], spot, interval)
+
+    # Register hits and misses, thread safe
+    with cache_lock:
+        cache_stats['hits']   += hits
+        cache_stats['misses'] += misses
+
+    # Return strength and advice per interval
+    return results
+
+# Klines without the open kline, as views
+def closed(klines):
+    view = {'columns': klines['columns']}
+    for column in klines['columns']:
+        view[column] = klines[column][:-1]
+    return view
+
+# State of the last kline
+def last_bar(klines):
+    return tuple(float(klines[column][-1]) for column in ('time', 'open', 'high', 'low', 'close', 'volume'))
+
+# Check if cached values must be calculated again according to the policy, a new kline always requires it
+def stale(entry, bar, current_time):
+
+    # Nothing cached or new kline
+    if not entry or entry['bar'][0] != bar[0]:
+        return True
+
+    # Apply policy
+    if config.indicators_policy == "Close":
+        return False
+    if config.indicators_policy == "Interval":
+        return current_time - entry['time'] >= config.indicators_interval
+    return entry['bar'] != bar
+
+# Report hits and misses of advice cache to stdout
+def report_cache():
+
+    # Copy statistics, thread safe
+    with cache_lock:
+        hits   = cache_stats['hits']
+        misses = cache_stats['misses']
+
+    # Output to stdout
+    if hits + misses > 0:
+        defs.announce(f"Indicator advice cache had {hits} hits and {misses} misses, hit rate {hits / (hits + misses) * 100:.1f} %")
+
+    # Return
+    return
+
+# Determine advice per selected indicator
+def evaluate(values, spot, selected):
+
+    # Initialize variables
+    indicators = {}
 
     # RSI Oscillator
-    rsi = df['RSI'].iloc[-1]
-    bsn = 'N'
-    if rsi > 70:bsn = 'S'
-    if rsi < 30:bsn = 'B'
-    indicators['rsi'] = [rsi, bsn, 'O']
+    if 'rsi' in selected:
+        rsi = values['rsi']
+        bsn = 'N'
+        if rsi > 70:bsn = 'S'
+        if rsi < 30:bsn = 'B'
+        indicators['rsi'] = [rsi, bsn, 'O']
 
     # Stochastic % K Oscillator
-    bsn = 'N'
-    if stoch_k['k'].iloc[-1] < 20:
-        if stoch_k['k'].iloc[-1] > stoch_k['d'].iloc[-1]: bsn = 'B'
-    if stoch_k['k'].iloc[-1] > 80:
-        if stoch_k['k'].iloc[-1] < stoch_k['d'].iloc[-1]: bsn = 'S'
-    indicators['stochk'] = [{stoch_k['k'].iloc[-1], stoch_k['d'].iloc[-1]}, bsn, 'O']
+    if 'stochk' in selected:
+        bsn = 'N'
+        if values['stoch_k'] < 20:
+            if values['stoch_k'] > values['stoch_d']: bsn = 'B'
+        if values['stoch_k'] > 80:
+            if values['stoch_k'] < values['stoch_d']: bsn = 'S'
+        indicators['stochk'] = [{values['stoch_k'], values['stoch_d']}, bsn, 'O']
 
     # CCI Oscillator
-    cci = df['CCI'].iloc[-1]
-    bsn = 'N'
-    if rsi < -100:bsn = 'S'
-    if rsi > 100 :bsn = 'B'
-    indicators['cci'] = [cci, bsn, 'O']
+    if 'cci' in selected:
+        cci = values['cci']
+        rsi = values['rsi']
+        bsn = 'N'
+        if rsi < -100:bsn = 'S'
+        if rsi > 100 :bsn = 'B'
+        indicators['cci'] = [cci, bsn, 'O']
     
     # ADX Oscillator
-    bsn = 'N'
-    if adx['adx'].iloc[-1] > 25:
-        if adx['dmp'].iloc[-1] > adx['dmn'].iloc[-1]: bsn = 'B'
-        if adx['dmp'].iloc[-1] < adx['dmn'].iloc[-1]: bsn = 'S'
-    indicators['adx'] = [{adx['dmp'].iloc[-1], adx['dmn'].iloc[-1], adx['adx'].iloc[-1]}, bsn, 'O']
+    if 'adx' in selected:
+        bsn = 'N'
+        if values['adx'] > 25:
+            if values['dmp'] > values['dmn']: bsn = 'B'
+            if values['dmp'] < values['dmn']: bsn = 'S'
+        indicators['adx'] = [{values['dmp'], values['dmn'], values['adx']}, bsn, 'O']
 
     # Awesome Oscillator
-    ao = df['AO']
-    bsn = 'N'
-    if ao.iloc[-1] >= 0:
-        if high_low(ao):bsn = 'B'
-    if ao.iloc[-1] < 0:
-        if high_low(ao, True):bsn = 'S'
-    indicators['ao'] = [ao.iloc[-1], bsn, 'O']
+    if 'ao' in selected:
+        ao = values['ao']
+        bsn = 'N'
+        if ao >= 0:
+            if high_low(ao, values['ao_prev']):bsn = 'B'
+        if ao < 0:
+            if high_low(ao, values['ao_prev'], True):bsn = 'S'
+        indicators['ao'] = [ao, bsn, 'O']
 
     # Momentum Oscillator
-    momentum = df['Momentum']
-    bsn = 'N'
-    if momentum.iloc[-1] >= 0:
-        if high_low(momentum):bsn = 'B'
-    if momentum.iloc[-1] < 0:
-        if high_low(momentum, True):bsn = 'S'
-    indicators['momentum'] = [momentum.iloc[-1], bsn, 'O']
+    if 'momentum' in selected:
+        momentum = values['momentum']
+        bsn = 'N'
+        if momentum >= 0:
+            if high_low(momentum, values['momentum_prev']):bsn = 'B'
+        if momentum < 0:
+            if high_low(momentum, values['momentum_prev'], True):bsn = 'S'
+        indicators['momentum'] = [momentum, bsn, 'O']
     
     # MACD Oscillator
-    bsn = 'N'
-    if macd['histogram'].iloc[-1] >= 0:
-        if high_low(macd['histogram']):bsn = 'B'
-    if macd['histogram'].iloc[-1] < 0:
-        if high_low(macd['histogram'], True): bsn = 'S'
-    indicators['macd'] = [{macd['histogram'].iloc[-1], macd['macd'].iloc[-1], macd['signal'].iloc[-1]}, bsn, 'O']
+    if 'macd' in selected:
+        bsn = 'N'
+        if values['macd_hist'] >= 0:
+            if high_low(values['macd_hist'], values['macd_hist_prev']):bsn = 'B'
+        if values['macd_hist'] < 0:
+            if high_low(values['macd_hist'], values['macd_hist_prev'], True): bsn = 'S'
+        indicators['macd'] = [{values['macd_hist'], values['macd'], values['macd_signal']}, bsn, 'O']
 
     # Stochastic RSI Fast Oscillator
-    bsn = 'N'
-    if stoch_rsi['k'].iloc[-1] < 20:
-        if stoch_rsi['k'].iloc[-1] > stoch_rsi['d'].iloc[-1]: bsn = 'B'
-    if stoch_rsi['k'].iloc[-1] > 80:
-        if stoch_rsi['k'].iloc[-1] < stoch_rsi['d'].iloc[-1]: bsn = 'S'
-    indicators['stochrsi'] = [{stoch_rsi['k'].iloc[-1], stoch_rsi['d'].iloc[-1]}, bsn, 'O']
+    if 'stochrsi' in selected:
+        bsn = 'N'
+        if values['stochrsi_k'] < 20:
+            if values['stochrsi_k'] > values['stochrsi_d']: bsn = 'B'
+        if values['stochrsi_k'] > 80:
+            if values['stochrsi_k'] < values['stochrsi_d']: bsn = 'S'
+        indicators['stochrsi'] = [{values['stochrsi_k'], values['stochrsi_d']}, bsn, 'O']
 
     # WilliamsR Oscillator
-    williams_r = df['WilliamsR'].iloc[-1]
-    bsn = 'N'
-    if williams_r < 30:bsn = 'B'
-    if williams_r > 70:bsn = 'S'
-    indicators['williamsr'] = [williams_r, bsn, 'O']   
+    if 'williamsr' in selected:
+        williams_r = values['williamsr']
+        bsn = 'N'
+        if williams_r < 30:bsn = 'B'
+        if williams_r > 70:bsn = 'S'
+        indicators['williamsr'] = [williams_r, bsn, 'O']   
 
     # Ultimate Oscillator
-    uo = df['UO'].iloc[-1]
-    bsn = 'N'
-    if uo < 30:bsn = 'B'
-    if uo > 70:bsn = 'S'
-    indicators['uo'] = [uo, bsn, 'O']
+    if 'uo' in selected:
+        uo = values['uo']
+        bsn = 'N'
+        if uo < 30:bsn = 'B'
+        if uo > 70:bsn = 'S'
+        indicators['uo'] = [uo, bsn, 'O']
 
     # EMA and SMA Moving Averages
-    ema10 = df['EMA10'].iloc[-1]
-    sma10 = df['SMA10'].iloc[-1]
-    ema20 = df['EMA20'].iloc[-1]
-    sma20 = df['SMA20'].iloc[-1]
-    ema30 = df['EMA30'].iloc[-1]
-    sma30 = df['SMA30'].iloc[-1]
-    ema50 = df['EMA50'].iloc[-1]
-    sma50 = df['SMA50'].iloc[-1]
-    ema100 = df['EMA100'].iloc[-1]
-    sma100 = df['SMA100'].iloc[-1]
-    ema200 = df['EMA200'].iloc[-1]
-    sma200 = df['SMA200'].iloc[-1]    
-    indicators['EMA10'] = [ema10, hesma(ema10, spot), 'A']
-    indicators['SMA10'] = [sma10, hesma(sma10, spot), 'A']
-    indicators['EMA20'] = [ema20, hesma(ema20, spot), 'A']
-    indicators['SMA20'] = [sma20, hesma(sma20, spot), 'A']
-    indicators['EMA30'] = [ema30, hesma(ema30, spot), 'A']
-    indicators['SMA30'] = [sma30, hesma(sma30, spot), 'A']
-    indicators['EMA50'] = [ema50, hesma(ema50, spot), 'A']
-    indicators['SMA50'] = [sma50, hesma(sma50, spot), 'A']
-    indicators['EMA100'] = [ema100, hesma(ema100, spot), 'A']
-    indicators['SMA100'] = [sma100, hesma(sma100, spot), 'A']
-    indicators['EMA200'] = [ema200, hesma(ema200, spot), 'A']
-    indicators['SMA200'] = [sma200, hesma(sma200, spot), 'A']
+    for name in selected:
+        if name[:3] in ("EMA", "SMA"):
+            indicators[name] = [values[name], hesma(values[name], spot), 'A']
 
-    # Debug to stdout
-    if debug:
-        defs.announce("Advice calculated:")
-        print(indicators)
-        end_time = defs.now_utc()[4]
-        defs.announce(f"Pandas_ta spent {end_time - start_time}ms calculating indicators and advice")
-    
     # Return technicals
     return indicators
 
@@ -214,14 +400,10 @@ def hesma(hesma, spot):
     return bsn
 
 # Check if the previous value was lower (default) or higher
-def high_low(values, invert = False):
+def high_low(last_value, single_last, invert = False):
     
     # Initialize variables
     check = False
-       
-    # Get the last and single last value
-    last_value  = values.iloc[-1]
-    single_last = values.iloc[-2]
 
     # Compare the two
     if last_value >= single_last:
@@ -241,8 +423,10 @@ def technicals_value(count, countB, countS):
     # Initialize variables
     strength = 0
 
-    # Determine strength
-    if countB > countS:
+    # Determine strength, a subset of indicators may have no moving averages or oscillators
+    if count == 0:
+        strength = 0
+    elif countB > countS:
         strength = countB / count
     else:
         strength = -countS / count
@@ -0,0 +1,346 @@
+### Sunflow Cryptobot ###
+#
+# Technical indicators on NumPy arrays, same formulas as pandas_ta without the DataFrame overhead
+
+# Load external libraries
+from sys import float_info
+import math, numpy as np
+
+# Load Numba when installed, loops then run compiled
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Load internal libraries
+from loader import load_config
+
+# Load config
+config = load_config()
+
+# Not a number
+nan = float('nan')
+
+# Powers of decay by alpha and length, klines keep the same length so these are reused
+powers = {}
+
+# Largest exponent of the weights of the closed form, beyond it they could overflow and the loop runs interpreted
+closed_limit = 600
+
+### Loops, indexable by NumPy arrays when compiled and by lists when not ###
+
+# Exponentially weighted mean, same recursion as pandas ewm with ignore_na=False
+def ewm_loop(values, alpha, adjust, min_periods, out):
+
+    # Initialize variables
+    weighted = nan
+    old_wt   = 1.0
+    nobs     = 0
+    new_wt   = 1.0 if adjust else alpha
+
+    # Weigh values
+    for i in range(len(values)):
+        value  = values[i]
+        is_obs = value == value
+        if is_obs: nobs += 1
+        if weighted == weighted:
+            old_wt = old_wt * (1 - alpha)
+            if is_obs:
+                if weighted != value:
+                    weighted = ((old_wt * weighted) + (new_wt * value)) / (old_wt + new_wt)
+                if adjust:
+                    old_wt = old_wt + new_wt
+                else:
+                    old_wt = 1.0
+        elif is_obs:
+            weighted = value
+        out[i] = weighted if nobs >= min_periods else nan
+
+    # Return
+    return
+
+# Compile loops
+if njit is not None:
+    ewm_loop = njit(cache=True)(ewm_loop)
+
+### Kernels, all take and return float64 arrays of the same length ###
+
+# Exponentially weighted mean as weighted cumulative sums, the weights grow with decay ** -i
+def ewm_closed(values, observed, first, alpha, adjust, min_periods):
+
+    # Initialize variables
+    out  = np.full(len(values), nan)
+    span = len(values) - first
+    tail = values[first:]
+
+    # Get powers of decay
+    if (alpha, span) not in powers:
+        if len(powers) > 100: powers.clear()
+        powers[(alpha, span)] = ((1 - alpha) ** -np.arange(span), (1 - alpha) ** np.arange(span))
+    growth, shrink = powers[(alpha, span)]
+
+    # Weights are normalized, missing values carry no weight
+    if adjust:
+        weights     = np.where(observed[first:], growth, 0.0)
+        out[first:] = np.cumsum(weights * np.where(observed[first:], tail, 0.0)) / np.cumsum(weights)
+
+    # First value has weight one and every next value alpha
+    else:
+        weights     = growth * alpha
+        weights[0]  = 1.0
+        out[first:] = np.cumsum(weights * tail) * shrink
+
+    # Not a number until there are enough observations
+    out[np.cumsum(observed) < min_periods] = nan
+
+    # Return mean
+    return out
+
+# Exponentially weighted mean
+def ewm(values, alpha, adjust, min_periods):
+
+    # Run compiled
+    if njit is not None:
+        out = np.empty(len(values))
+        ewm_loop(values, alpha, adjust, min_periods, out)
+        return out
+
+    # Closed form when weights stay finite, without adjust only when no values are missing after the first
+    observed = ~np.isnan(values)
+    if observed.any():
+        first = int(np.argmax(observed))
+        if -(len(values) - first) * math.log(1 - alpha) < closed_limit and (adjust or observed[first:].all()):
+            return ewm_closed(values, observed, first, alpha, adjust, min_periods)
+
+    # Run interpreted on lists, lists are faster to index in Python
+    out = [nan] * len(values)
+    ewm_loop(values.tolist(), alpha, adjust, min_periods, out)
+
+    # Return mean
+    return np.array(out)
+
+# Rolling window, rows are the windows ending at each value from length - 1 onwards, a view without copies
+def windows(values, length):
+    values = np.ascontiguousarray(values)
+    return np.ndarray((len(values) - length + 1, length), dtype=values.dtype, buffer=values, strides=(values.itemsize, values.itemsize))
+
+# Pad result of windows to the length of values
+def pad(values, length, result):
+    return np.concatenate((np.full(min(length - 1, len(values)), nan), result))
+
+# Simple moving average, not a number until the window is full
+def sma(values, length):
+    if len(values) < length:
+        return np.full(len(values), nan)
+    return pad(values, length, windows(values, length).mean(axis=1))
+
+# Rolling minimum and maximum
+def rolling_min(values, length):
+    if len(values) < length:
+        return np.full(len(values), nan)
+    return pad(values, length, windows(values, length).min(axis=1))
+
+def rolling_max(values, length):
+    if len(values) < length:
+        return np.full(len(values), nan)
+    return pad(values, length, windows(values, length).max(axis=1))
+
+# Shift values forward, first values become not a number
+def shift(values, periods=1):
+    return np.concatenate((np.full(periods, nan), values[:-periods]))
+
+# Range that is never zero, like pandas_ta does
+def non_zero_range(high, low):
+    difference = high - low
+    if (difference == 0).any():
+        difference = difference + float_info.epsilon
+    return difference
+
+# Values that are almost zero are zero, like pandas_ta does
+def zero(values):
+    return np.where(np.abs(values) < float_info.epsilon, 0.0, values)
+
+# Exponential moving average seeded with the simple average of the first length values, leading not a number is skipped
+def ema(values, length):
+
+    # Skip leading not a number
+    out      = np.full(len(values), nan)
+    observed = ~np.isnan(values)
+    first    = int(observed.argmax())
+    if not observed[first] or len(values) - first < length:
+        return out
+
+    # Seed, missing values in the seed are skipped like pandas mean does
+    seeded = values[first:].copy()
+    if observed[first:first + length].all():
+        seeded[length - 1] = seeded[:length].mean()
+    else:
+        seeded[length - 1] = np.nanmean(seeded[:length])
+    seeded[:length - 1] = nan
+
+    # Continue average
+    out[first:] = ewm(seeded, 2 / (length + 1), False, 0)
+
+    # Return average
+    return out
+
+# Running moving average
+def rma(values, length):
+    return ewm(values, 1 / length, True, length)
+
+# Relative Strength Index
+def rsi(close, length=14):
+    change   = close - shift(close)
+    positive = rma(np.where(change > 0, change, np.where(np.isnan(change), nan, 0.0)), length)
+    negative = rma(np.where(change < 0, change, np.where(np.isnan(change), nan, 0.0)), length)
+    return 100 * positive / (positive + np.abs(negative))
+
+# Commodity Channel Index
+def cci(high, low, close, length=20):
+    typical = (high + low + close) / 3
+    out     = np.full(len(close), nan)
+    if len(close) >= length:
+        window = windows(typical, length)
+        mean   = window.mean(axis=1)
+        mad    = np.abs(window - mean[:, None]).mean(axis=1)
+        out[length - 1:] = (typical[length - 1:] - mean) / (0.015 * mad)
+    return out
+
+# Awesome Oscillator
+def ao(high, low, fast=5, slow=34):
+    median = 0.5 * (high + low)
+    return sma(median, fast) - sma(median, slow)
+
+# Momentum
+def mom(close, length=10):
+    return close - shift(close, length)
+
+# Williams %R
+def willr(high, low, close, length=14):
+    lowest  = rolling_min(low, length)
+    highest = rolling_max(high, length)
+    return 100 * ((close - lowest) / (highest - lowest) - 1)
+
+# Stochastic, returns k and d
+def stoch(high, low, close, k=14, d=3, smooth_k=3):
+    lowest  = rolling_min(low, k)
+    highest = rolling_max(high, k)
+    stoch   = 100 * (close - lowest) / non_zero_range(highest, lowest)
+    stoch_k = sma(stoch, smooth_k)
+    return stoch_k, sma(stoch_k, d)
+
+# Ultimate Oscillator
+def uo(high, low, close, fast=7, medium=14, slow=28):
+    prev_close = shift(close)
+    maximum    = np.fmax(high, prev_close)
+    minimum    = np.fmin(low, prev_close)
+    buying     = close - minimum
+    true_range = maximum - minimum
+    averages   = {length: sma(buying, length) / sma(true_range, length) for length in (fast, medium, slow)}
+    return 100 * (4 * averages[fast] + 2 * averages[medium] + averages[slow]) / 7
+
+# Moving Average Convergence Divergence, returns macd, histogram and signal
+def macd(close, fast=12, slow=26, signal=9):
+    line   = ema(close, fast) - ema(close, slow)
+    signal = ema(line, signal)
+    return line, line - signal, signal
+
+# Stochastic RSI, returns k and d, RSI can be passed when already calculated
+def stochrsi(close, length=14, rsi_length=14, k=3, d=3, rsi_=None):
+    if rsi_ is None: rsi_ = rsi(close, rsi_length)
+    lowest  = rolling_min(rsi_, length)
+    highest = rolling_max(rsi_, length)
+    stoch   = 100 * (rsi_ - lowest) / non_zero_range(highest, lowest)
+    stoch_k = sma(stoch, k)
+    return stoch_k, sma(stoch_k, d)
+
+# Average True Range
+def atr(high, low, close, length=14):
+    prev_close = shift(close)
+    true_range = np.fmax(np.fmax(np.abs(non_zero_range(high, low)), np.abs(high - prev_close)), np.abs(prev_close - low))
+    true_range[:1] = nan
+    return rma(true_range, length)
+
+# Average Directional Index, returns adx, dmp and dmn
+def adx(high, low, close, length=14):
+    scale    = 100 / atr(high, low, close, length)
+    up       = high - shift(high)
+    down     = shift(low) - low
+    positive = np.where(np.isnan(up), nan, zero(np.where((up > down) & (up > 0), up, 0.0)))
+    negative = np.where(np.isnan(down), nan, zero(np.where((down > up) & (down > 0), down, 0.0)))
+    dmp      = scale * rma(positive, length)
+    dmn      = scale * rma(negative, length)
+    dx       = 100 * np.abs(dmp - dmn) / (dmp + dmn)
+    return rma(dx, length), dmp, dmn
+
+### Backend ###
+
+# Calculate indicator values of the last kline for the indicators in nodes
+def calculate(klines, nodes):
+
+    # Initialize variables
+    values = {}
+    rsi_   = None
+    high   = np.asarray(klines['high'], dtype=np.float64)
+    low    = np.asarray(klines['low'], dtype=np.float64)
+    close  = np.asarray(klines['close'], dtype=np.float64)
+
+    # Divisions by zero result in infinity or not a number like pandas
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # Oscillators, indicators without recursion only need the klines of their last windows
+        if 'rsi' in nodes:
+            rsi_          = rsi(close)
+            values['rsi'] = rsi_[-1]
+        if 'cci' in nodes:
+            values['cci'] = cci(high[-20:], low[-20:], close[-20:])[-1]
+        if 'ao' in nodes:
+            result                  = ao(high[-35:], low[-35:])
+            values['ao']            = result[-1]
+            values['ao_prev']       = result[-2]
+        if 'momentum' in nodes:
+            result                  = mom(close[-12:])
+            values['momentum']      = result[-1]
+            values['momentum_prev'] = result[-2]
+        if 'williamsr' in nodes:
+            values['williamsr'] = willr(high[-14:], low[-14:], close[-14:])[-1]
+        if 'uo' in nodes:
+            values['uo'] = uo(high[-29:], low[-29:], close[-29:])[-1]
+
+        # Stochastic % K
+        if 'stochk' in nodes:
+            stoch_k, stoch_d  = stoch(high[-18:], low[-18:], close[-18:])
+            values['stoch_k'] = stoch_k[-1]
+            values['stoch_d'] = stoch_d[-1]
+
+        # MACD
+        if 'macd' in nodes:
+            line, histogram, signal  = macd(close)
+            values['macd']           = line[-1]
+            values['macd_hist']      = histogram[-1]
+            values['macd_hist_prev'] = histogram[-2]
+            values['macd_signal']    = signal[-1]
+
+        # Stochastic RSI
+        if 'stochrsi' in nodes:
+            stochrsi_k, stochrsi_d = stochrsi(close, rsi_=rsi_)
+            values['stochrsi_k']   = stochrsi_k[-1]
+            values['stochrsi_d']   = stochrsi_d[-1]
+
+        # ADX
+        if 'adx' in nodes:
+            adx_, dmp, dmn = adx(high, low, close)
+            values['adx']  = adx_[-1]
+            values['dmp']  = dmp[-1]
+            values['dmn']  = dmn[-1]
+
+        # Moving averages
+        for name in nodes:
+            if name[:3] == "EMA": values[name] = ema(close, int(name[3:]))[-1]
+            if name[:3] == "SMA": values[name] = sma(close[-int(name[3:]):], int(name[3:]))[-1]
+
+    # Values as floats
+    values = {key: float(value) for key, value in values.items()}
+
+    # Return indicator values
+    return values
@@ -3,106 +3,178 @@
 # Find optimal trigger price distance and profit percentage
 
 # Load external libraries
-import math, pandas as pd, pprint
+from collections import deque
+import math
 
 # Load internal libraries
 from loader import load_config
-import defs
+import defs, history, series
 
 # Load config
 config = load_config()
 
-# Resample and create dataframe for optimizer
-def resample_optimzer(prices, interval):
+# Interval of optimizer bars in ms
+def bar_size(optimizer):
 
-    # Debug
-    debug = False
-  
-    # Convert the time and price data into a DataFrame
-    df = pd.DataFrame(prices)
-    
-    # Convert the 'time' column to datetime format
-    df['time'] = pd.to_datetime(df['time'], unit='ms')
-    
-    # Set the 'time' column as the index
-    df.set_index('time', inplace=True)
-    
-    # Resample the data to the specified interval
-    df_resampled = df['price'].resample(interval).last()
-    
-    # Drop any NaN values that may result from resampling
-    df_resampled.dropna(inplace=True)
+    # Units of delta in ms
+    units = {'s': 1000, 'min': 60000, 'h': 3600000}
 
-    # Remove the last row
-    df_resampled = df_resampled.iloc[:-1]
+    # Return interval in ms
+    return int(optimizer['interval'] * units[optimizer['delta']])
 
-    # Debug to stdout
-    if debug:
-        defs.announce("Debug: Resampled dataframe:")
-        pprint.pprint(df_resampled)
-        print()
+# Create volatility engine, rolling std of log returns over length bars and the running mean of it
+def create_volatility(length):
+
+    # Initialize engine
+    engine             = {}
+    engine['length']   = length     # Number of log returns in the rolling window
+    engine['previous'] = None       # Close of the last closed bar
+    engine['returns']  = deque()    # Last length - 1 log returns of closed bars
+    engine['mean']     = 0.0        # Mean of returns in window (Welford)
+    engine['m2']       = 0.0        # Sum of squared deviations of returns in window (Welford)
+    engine['values']   = deque()    # Volatility of closed bars
+    engine['total']    = 0.0        # Sum of volatility of closed bars
+
+    # Return engine
+    return engine
+
+# Rolling volatility of the window plus one log return, the window itself is not changed
+def peek_volatility(engine, value):
+
+    # Welford step on a copy of the state
+    count = len(engine['returns']) + 1
+    delta = value - engine['mean']
+    mean  = engine['mean'] + delta / count
+    m2    = engine['m2'] + delta * (value - mean)
+
+    # Sample standard deviation scaled to the window
+    volatility = math.sqrt(max(m2, 0.0) / (count - 1)) * math.sqrt(engine['length'])
+
+    # Return volatility
+    return volatility
+
+# Add log return to the window, drop the oldest when the window is full
+def push_return(engine, value):
+
+    # Welford add
+    engine['returns'].append(value)
+    count           = len(engine['returns'])
+    delta           = value - engine['mean']
+    engine['mean'] += delta / count
+    engine['m2']   += delta * (value - engine['mean'])
+
+    # Welford remove
+    if count > engine['length'] - 1:
+        old   = engine['returns'].popleft()
+        count = count - 1
+        delta = old - engine['mean']
+        engine['mean'] -= delta / count
+        engine['m2']   -= delta * (old - engine['mean'])
+
+    # Return
+    return
+
+# Register a closed bar
+def close_volatility(engine, close):
+
+    # Log return versus the previous closed bar
+    if engine['previous'] is not None:
+        value = math.log(close) - math.log(engine['previous'])
+
+        # Volatility is known once the window is full
+        if len(engine['returns']) == engine['length'] - 1:
+            volatility = peek_volatility(engine, value)
+            engine['values'].append(volatility)
+            engine['total'] += volatility
+
+        # Add return to window
+        push_return(engine, value)
+
+    # Remember close
+    engine['previous'] = close
+
+    # Return
+    return
+
+# Drop volatility of bars that were evicted
+def evict_volatility(engine, count):
+
+    # Oldest volatility belongs to the oldest bar
+    for _ in range(min(count, len(engine['values']))):
+        engine['total'] -= engine['values'].popleft()
+
+    # Return
+    return
 
-    # Return dataframe
-    return df_resampled
+# Deviation of the volatility of the open bar from the average volatility
+def deviation_volatility(engine, close):
 
-# Rebuild dataframe in two steps for speed reasons. First part is kept in cache, then we add the last one or two intervals. 
-def build_df(optimizer, prices, interval):
+    # Check if the window is full
+    if engine['previous'] is None or len(engine['returns']) < engine['length'] - 1:
+        raise ValueError(f"Not enough bars, {len(engine['returns'])} log returns of {engine['length']}")
+
+    # Volatility of the open bar
+    value      = math.log(close) - math.log(engine['previous'])
+    volatility = peek_volatility(engine, value)
+
+    # Average including the open bar
+    average    = (engine['total'] + volatility) / (len(engine['values']) + 1)
+    deviation  = (volatility - average) / average
+
+    # Return deviation
+    return deviation
+
+# Create optimizer bars from price history
+def create_bars(optimizer, prices, length=10):
 
     # Debug and speed
     debug = False
     speed = True
     stime = defs.now_utc()[4]
 
-    # Resample and create dataframe for the first time or get it from cache
-    if optimizer['df'].empty:
-        df = resample_optimzer(prices, interval)
-    else:
-        df = optimizer['df']
-    
-    # Get the timestamp of the last item in the dataframe in miliseconds
-    last_timestamp = int(df.index[-1].timestamp() * 1000)
-    
-    # Which prices are not yet in the resampled data since last timestamp of dataframe
-    prices_new = {
-        'price': [price for price, time in zip(prices['price'], prices['time']) if time > last_timestamp],
-        'time': [time for time in prices['time'] if time > last_timestamp]
-    }
+    # Initialize bars, time is the start of the bucket and close the last price in it
+    optimizer['bar_size']   = bar_size(optimizer)
+    optimizer['bars']       = series.create({'time': [], 'close': []})
+    optimizer['volatility'] = create_volatility(length)
 
-    # Create a dataframe from the new prices
-    df_new         = pd.DataFrame(prices_new)
-    df_new['time'] = pd.to_datetime(df_new['time'], unit='ms')
-    df_new.set_index('time', inplace=True)
+    # Aggregate history
+    for time, price in zip(prices['time'], prices['price']):
+        update_bars(optimizer, time, price)
 
     # Debug to stdout
     if debug:
-        defs.announce("Debug: Dataframes to be concatenated, first dataframe:")
-        print(df)
-        print()
-        defs.announce("Debug: Dataframes to be concatenated, second dataframe:")        
-        print(df_new)
-        print()
-
-    # Concatenate the cached and new dataframes
-    df = pd.concat([df, df_new])
-
-    # Resample again and drop empty rows
-    df = df['price'].resample(interval).last()
-    df.dropna(inplace=True)
-    
-    # Debug to stdout
-    if debug:
-        defs.announce("Debug: Concatenated dataframe:")
-        print(df)
-        print()
+        defs.announce(f"Debug: Created {series.size(optimizer['bars'])} optimizer bars")
 
     # Report execution time
     if speed: defs.announce(defs.report_exec(stime))
-    
-    # Return dataframe
-    return df
+
+    # Return optimizer
+    return optimizer
+
+# Add price to the open bar, a new bar is only started when the bucket rolls
+def update_bars(optimizer, time, price):
+
+    # Initialize variables
+    bars   = optimizer['bars']
+    bucket = time - (time % optimizer['bar_size'])
+
+    # Update open bar, view writes through to the buffer
+    if series.size(bars) > 0 and bucket <= bars['time'][-1]:
+        bars['close'][-1] = price
+
+    # Close bar and start a new one, remove bars older than the optimizer window
+    else:
+        if series.size(bars) > 0:
+            close_volatility(optimizer['volatility'], bars['close'][-1])
+        series.append(bars, bucket, price)
+        removed = series.evict(bars, bucket - optimizer['limit_max'])
+        evict_volatility(optimizer['volatility'], removed)
+
+    # Return
+    return
 
 # Optimize based on volatility
-def calc_volatility(optimizer, df, prices, distance, spread, profit, length=10):
+def calc_volatility(optimizer, prices, distance, spread, profit):
 
     # Debug and speed
     debug = False
@@ -124,28 +196,15 @@ def calc_volatility(optimizer, df, prices, distance, spread, profit, length=10):
         if debug:
             defs.announce("Debug: Trying to optimize using volatility")
 
-        # Calculate the log returns
-        df = df.to_frame()
-        df['log_return'] = df['price'].apply(lambda x: math.log(x)) - df['price'].shift(1).apply(lambda x: math.log(x))
-        
-        # Calculate the rolling volatility (standard deviation of log returns)
-        df['volatility'] = df['log_return'].rolling(window=length).std() * math.sqrt(length)
-        
-        # Calculate the average volatility
-        average_volatility = df['volatility'].mean()
-        
-        # Add a column for the deviation percentage from the average volatility
-        df['volatility_deviation_pct'] = ((df['volatility'] - average_volatility) / average_volatility)
-        
-        # Drop the 'log_return' column if not needed
-        df.drop(columns=['log_return'], inplace=True)
-        
+        # Deviation of the open bar, maintained per closed bar by the volatility engine
+        deviation = deviation_volatility(optimizer['volatility'], optimizer['bars']['close'][-1])
+
         # Debug to stdout
         if debug:
-            defs.announce(f"Debug: Raw optimized volatility {df['volatility_deviation_pct'].iloc[-1]:.4f} %")
-        
+            defs.announce(f"Debug: Raw optimized volatility {deviation:.4f} %")
+
         # Get volatility deviation
-        volatility   = df['volatility_deviation_pct'].iloc[-1] * optimizer['scaler']
+        volatility   = deviation * optimizer['scaler']
         vol_stored   = volatility
         volatility   = min(volatility, optimizer['adj_max'] / 100)
         volatility   = max(volatility, optimizer['adj_min'] / 100)
@@ -160,13 +219,8 @@ def calc_volatility(optimizer, df, prices, distance, spread, profit, length=10):
 
         # Debug to stdout
         if debug:
-            defs.announce("Debug: Optimized full dataframe:")
-            print(df)
-            print()
+            defs.announce(f"Debug: Average volatility over {len(optimizer['volatility']['values'])} closed bars")
             defs.announce(f"Age of database is: {stime - prices['time'][0]} ms")
-            
-        # Store the dataframe for future use, except for the last row
-        optimizer['df'] = df.iloc[:-1]
         
     # In case of failure
     except Exception as e:
@@ -180,7 +234,7 @@ def calc_volatility(optimizer, df, prices, distance, spread, profit, length=10):
         if df_errors > 2:
             halt_sunflow = True
         if speed: defs.announce(defs.report_exec(stime, "early return due to error"))    
-        return distance, spread, profit
+        return distance, spread, profit, False
    
     # Reset error counter
     df_errors = 0
@@ -211,7 +265,6 @@ def optimize(prices, profit, active_order, use_spread, optimizer):
     global df_errors, halt_sunflow
   
     # Initialize variables
-    interval     = str(optimizer['interval']) + optimizer['delta']   # Interval used for indicator KPI (in our case historical volatility)
     distance     = optimizer['distance']    # Initial distance
     distance_new = optimizer['distance']    # New distance to be
     spread       = optimizer['spread']      # Initial spread
@@ -220,6 +273,9 @@ def optimize(prices, profit, active_order, use_spread, optimizer):
     profit_new   = optimizer['profit']      # New profit to be
     success      = False                    # Optimize possible
 
+    # Optimizer uses minute bars
+    prices       = history.view(prices, "minute")
+
     # Optimize only on desired sides
     if active_order['side'] not in optimizer['sides']:
         defs.announce(f"Optimization not executed, active side {active_order['side']} is not in {optimizer['sides']}")
@@ -232,14 +288,11 @@ def optimize(prices, profit, active_order, use_spread, optimizer):
         if speed: defs.announce(defs.report_exec(stime, "early return due to optimizaton issue"))
         return profit, active_order, use_spread, optimizer
 
-    # Get the most recent dataframe
-    df = build_df(optimizer, prices, interval)
-
     # Method used for optimization
     if optimizer['method'] == "Volatility":
         
         # Optimize based on volatility:
-        result       = calc_volatility(optimizer, df, prices, distance, spread, profit, 10)
+        result       = calc_volatility(optimizer, prices, distance, spread, profit)
         distance_new = result[0]
         spread_new   = result[1]
         profit_temp  = result[2]
@@ -4,10 +4,10 @@
 
 # Load external libraries
 from loader import load_config
-import pprint, requests, time
+import bisect, pprint, time
 
 # Load internal libraries
-import database, defs, deribit, distance, preload
+import client, database, defs, deribit, distance, fills, preload
 
 # Load config
 config = load_config()
@@ -92,16 +92,10 @@ def history(orderId, orderLinkId, info, startup=False):
     deribit.authenticate()
     message = defs.announce("session: /private/get_order_state")
     try:
-        url     = config.api_url + "/private/get_order_state"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "order_id": str(orderId)
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/get_order_state", params, True)
     except Exception as e:
         message = f"*** Error: Get order state for history failed: {e} ***"
         defs.log_error(message)
@@ -112,7 +106,7 @@ def history(orderId, orderLinkId, info, startup=False):
         defs.log_exchange(data, message)
         
     # Order response
-    if response.status_code == 200:
+    if 'result' in data:
         order          = data
         order_received = True
 
@@ -133,17 +127,11 @@ def history(orderId, orderLinkId, info, startup=False):
             deribit.authenticate()                  
             message = defs.announce("session: /private/get_order_state_by_label")
             try:
-                url     = config.api_url + "/private/get_order_state_by_label"
-                headers = {
-                    "Authorization": f"Bearer {config.access_token}",
-                    "Content-Type" : "application/json"
-                }
                 params = {
                     "currency": str(info['quoteCoin']),
                     "label"   : str(orderLinkId)
                 }
-                response = requests.get(url, headers=headers, params=params)
-                data     = response.json()
+                data = client.get("/private/get_order_state_by_label", params, True)
             except Exception as e:
                 message = f"*** Error: Get order state by label for history failed: {e} ***"
                 defs.log_error(message)
@@ -157,7 +145,7 @@ def history(orderId, orderLinkId, info, startup=False):
             defs.announce(f"Checking linked order {orderLinkId}")
             
             # Check if order is maybe delayed
-            if (response.status_code == 200) and (data['result'] == []):
+            if ('result' in data) and (data['result'] == []):
                 recheck = True
                 defs.announce(f"Rechecking order, maybe it's delayed, attempt {attempt + 1} / 10")
                 time.sleep(1 + attempt)
@@ -166,7 +154,7 @@ def history(orderId, orderLinkId, info, startup=False):
             if (not recheck) and (not startup): break
 
         # Order response
-        if response.status_code == 200:
+        if 'result' in data:
             if data.get('result'):
                 data['result'] = data['result'][0]   # labels are not unique at Deribit, for Bybit they are
                 order          = data
@@ -188,7 +176,7 @@ def history(orderId, orderLinkId, info, startup=False):
         else:
 
             # There was a unknown error
-            message = f"*** Error: Failed to get order state: {response.status_code}, {response.text} ***"
+            message = f"*** Error: Failed to get order state: {data} ***"
             defs.log_error(message)
             error_code = 1
 
@@ -269,16 +257,10 @@ def cancel(symbol, orderId, orderLinkId):
     deribit.authenticate()
     message = defs.announce("session: /private/cancel_by_label")
     try:
-        url     = config.api_url + "/private/cancel_by_label"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "label": str(orderLinkId)
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/cancel_by_label", params, True)
     except Exception as e:
         message = f"*** Error: Cancel by label failed: {e} ***"
         defs.announce(message)
@@ -308,12 +290,19 @@ def cancel(symbol, orderId, orderLinkId):
     return error_code, exception    
 
 # Turn an order from the exchange into a properly formatted transaction after the order already exists
-def transaction_from_id(orderId, orderLinkId, info, startup=False):
+def transaction_from_id(orderId, orderLinkId, info, startup=False, cached=False):
 
     # Initialize variables
     result        = ()
     transaction   = {}
     
+    # Use the fill pushed by the exchange if available, saves a query
+    if cached:
+        order_history = fills.filled_order(orderId, orderLinkId)
+        if order_history:
+            transaction = decode(order_history)
+            return transaction, 0
+
     # Do logic
     result        = history(orderId, orderLinkId, info, startup)
     order_history = result[0]
@@ -388,8 +377,8 @@ def check_sell(spot, profit, active_order, all_buys, use_pricelimit, pricelimit_
     counter   = 0
     message   = ""
     rise_to   = ""
-    nearest   = []
     distance  = active_order['distance']
+    factor    = 1 + ((profit + distance) / 100)
     pre_sell  = False
     can_sell  = False
     all_sells = []
@@ -400,19 +389,20 @@ def check_sell(spot, profit, active_order, all_buys, use_pricelimit, pricelimit_
     pricelimit_advice = result[0]
     message           = result[1]
     
-    # Walk through buy database and find profitable buys
-    for transaction in all_buys:
-
-        # Only walk through closed buy orders
-        if transaction['status'] == 'Closed':
-                    
-            # Check if a transaction is profitable
-            profitable_price = transaction['avgPrice'] * (1 + ((profit + distance) / 100))
-            nearest.append(profitable_price - spot)
-            if spot >= profitable_price:
-                qty = qty + transaction['cumExecQty']
-                all_sells.append(transaction)
-                counter = counter + 1
+    # Closed buys sorted by avgPrice, profitable buys are the ones below spot divided by factor
+    lots    = database.get_index(all_buys)
+    prices  = lots['prices']
+    counter = bisect.bisect_right(prices, spot / factor)
+
+    # Correct for rounding, a buy is profitable when spot reaches its profitable price
+    while counter < len(prices) and spot >= prices[counter] * factor:
+        counter = counter + 1
+    while counter > 0 and spot < prices[counter - 1] * factor:
+        counter = counter - 1
+
+    # Get profitable buys and their quantity
+    all_sells = lots['lots'][:counter]
+    qty       = lots['qty'][counter] / lots['scale']
     
     # Adjust quantity to exchange regulations
     qty = defs.round_number(qty, info['basePrecision'], "down")
@@ -426,8 +416,8 @@ def check_sell(spot, profit, active_order, all_buys, use_pricelimit, pricelimit_
         can_sell = True
         defs.announce(f"Trying to sell {counter} orders for a total of {defs.format_number(qty, info['basePrecision'])} {info['baseCoin']}")
     else:
-        if nearest:
-            rise_to = f"{defs.format_number(min(nearest), info['tickSize'])} {info['quoteCoin']}"
+        if prices:
+            rise_to = f"{defs.format_number(prices[0] * factor - spot, info['tickSize'])} {info['quoteCoin']}"
 
     # We have orders to sell, but sell price limit is blocking
     if pre_sell and not pricelimit_advice['sell_result']:
@@ -482,11 +472,6 @@ def buy(symbol, spot, compounding, active_order, all_buys, prices, info):
     deribit.authenticate()
     message = defs.announce("session: /private/buy")
     try:
-        url     = config.api_url + "/private/buy"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "instrument_name": symbol,
             "amount"         : float(active_order['qty']),
@@ -495,8 +480,7 @@ def buy(symbol, spot, compounding, active_order, all_buys, prices, info):
             "trigger"        : "index_price",
             "trigger_price"  : float(active_order['trigger'])
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/buy", params, True)
     except Exception as e:
         
         # Buy order failed, log, reset active_order and return
@@ -605,11 +589,6 @@ def sell(symbol, spot, active_order, prices, info):
     deribit.authenticate()
     message = defs.announce("session: /private/sell")
     try:
-        url     = config.api_url + "/private/sell"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "instrument_name": symbol,
             "amount"         : float(active_order['qty']),
@@ -618,8 +597,7 @@ def sell(symbol, spot, active_order, prices, info):
             "trigger"        : "index_price",
             "trigger_price"  : float(active_order['trigger'])
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/sell", params, True)
     except Exception as e:
 
         # Sell order failed, log, reset active_order and return
@@ -691,16 +669,10 @@ def get_wallet(coins):
     deribit.authenticate()    
     message = defs.announce("session: private/get_account_summary")
     try:
-        url     = config.api_url + "/private/get_account_summary"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "currency": str(coins)
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/get_account_summary", params, True)
     except Exception as e:
         message = f"*** Error: Get account summary for wallet failed: {e} ***"
         defs.log_error(message)
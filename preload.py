@@ -4,14 +4,17 @@
 
 # Load external libraries
 from loader import load_config
-import os, requests, pprint
+import os, pprint
 
 # Load internal libraries
-import database, defs, orders
+import client, database, defs, orders, series
 
 # Load config
 config = load_config()
 
+# Most klines downloaded in one request when interval 1 history has to cover derived intervals
+klines_maximum = 5000
+
 # Preload ticker
 def get_ticker(symbol):
 
@@ -25,12 +28,10 @@ def get_ticker(symbol):
     # Load ticker via normal session
     message = defs.announce("session: /public/ticker")
     try:
-        url    = config.api_url + "/public/ticker"
         params = {
             'instrument_name': str(symbol)
         }
-        response = requests.get(url, params=params)
-        data     = response.json()
+        data = client.get("/public/ticker", params)
     except Exception as e:
         message = f"*** Error: Getting ticker failed: {e} ***"
         defs.log_error(message)
@@ -73,16 +74,13 @@ def get_klines(symbol, interval, limit):
     # Load klines via normal session
     message = defs.announce("session: /public/get_tradingview_chart_data")
     try:
-        url    = config.api_url + "/public/get_tradingview_chart_data"
         params = {
             'instrument_name': str(symbol),
             'start_timestamp': int(start_timestamp),
             'end_timestamp'  : int(end_timestamp),
             'resolution'     : str(interval)
         }
-              
-        response = requests.get(url, params=params)
-        data     = response.json()
+        data = client.get("/public/get_tradingview_chart_data", params)
     except Exception as e:
         message = f"*** Error: Getting klines failed: {e} ***"
         defs.log_error(message)
@@ -120,6 +118,9 @@ def get_klines(symbol, interval, limit):
         defs.announce(f"Low  : {klines['low']}")
         defs.announce(f"Close: {klines['close']}")
     
+    # Store klines in columns
+    klines = series.create(klines)
+
     # return klines
     return klines
 
@@ -135,8 +136,8 @@ def get_prices(symbol, interval, limit):
     # Get kline with the lowest interval (1 minute)
     kline_prices = get_klines(symbol, interval, limit)
     prices       = {
-        'time' : kline_prices['time'],
-        'price': kline_prices['close']
+        'time' : kline_prices['time'].tolist(),
+        'price': kline_prices['close'].tolist()
     }
 
     # Report to stdout
@@ -211,12 +212,10 @@ def get_info(symbol, spot, multiplier, compounding):
     # Load instrument info via normal session
     message  = defs.announce("session: /public/get_instrument")
     try:
-        url    = config.api_url + "/public/get_instrument"
         params = {
             'instrument_name': str(symbol)
         }
-        response = requests.get(url, params=params)
-        data     = response.json()
+        data = client.get("/public/get_instrument", params)
     except Exception as e:
         message = f"*** Error: Getting info from exchange failed: {e} ***"
         defs.log_error(message)
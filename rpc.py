@@ -0,0 +1,205 @@
+### Sunflow Cryptobot ###
+#
+# JSON-RPC order calls over the exchange websocket
+
+# Load external libraries
+import asyncio, itertools, json, threading
+
+# Load internal libraries
+from loader import load_config
+import defs
+
+# Load config
+config = load_config()
+
+# Methods that can be sent over the websocket instead of HTTP
+methods = ["private/edit", "private/buy", "private/sell", "private/cancel_by_label", "private/get_order_state"]
+
+# Connection state, set by attach and cleared by detach
+connection                = {}
+connection['websocket']   = None    # Websocket held open by call_api
+connection['loop']        = None    # Event loop reading the websocket
+connection['auth_lock']   = None    # Only one authorization at a time
+connection['expires']     = 0       # When authorization of the websocket expires
+connection['timeout']     = 10      # Seconds to wait for a response
+
+# Requests in flight by JSON-RPC id, ids start above the fixed ids of subscriptions like 3600 in sunflow
+pending      = {}
+request_ids  = itertools.count(1000000)
+pending_lock = threading.Lock()
+
+# Raised when a call failed before its message was written to the websocket, only then it is safe to send it again
+class NotSent(ConnectionError):
+    pass
+
+# Attach websocket, must be called from within the event loop
+def attach(websocket):
+
+    # Set connection
+    connection['websocket'] = websocket
+    connection['loop']      = asyncio.get_running_loop()
+    connection['auth_lock'] = asyncio.Lock()
+    connection['expires']   = 0
+
+    # Return
+    return
+
+# Detach websocket and fail all requests in flight
+def detach():
+
+    # Clear connection
+    connection['websocket'] = None
+    connection['expires']   = 0
+
+    # Fail requests in flight, callers fall back to HTTP
+    with pending_lock:
+        futures = list(pending.values())
+        pending.clear()
+    for future in futures:
+        if not future.done():
+            future.set_exception(ConnectionError("Exchange websocket detached"))
+
+    # Return
+    return
+
+# Resolve a response by its id, returns True if it was ours
+def resolve(response_data):
+
+    # Only responses carry an id
+    request_id = response_data.get('id')
+    if request_id is None:
+        return False
+
+    # Find request in flight
+    with pending_lock:
+        future = pending.pop(request_id, None)
+
+    # Unknown id
+    if future is None:
+        return False
+
+    # Set result
+    if not future.done():
+        future.set_result(response_data)
+
+    # Return
+    return True
+
+# Send a JSON-RPC message and wait for the response with the same id, state tells the caller if the message was written
+async def send(method, params, state=None):
+
+    # Initialize variables
+    websocket  = connection['websocket']
+    request_id = next(request_ids)
+    future     = asyncio.get_running_loop().create_future()
+
+    # Not connected
+    if websocket is None:
+        raise NotSent("Exchange websocket detached")
+
+    # Mark message as written unless the caller gave up, from here on it may reach the exchange
+    if state is not None:
+        with pending_lock:
+            if state['abandoned']:
+                raise NotSent("Call was abandoned before it was sent")
+            state['sent'] = True
+
+    # Register request in flight
+    with pending_lock:
+        pending[request_id] = future
+
+    # Send and wait
+    try:
+        await websocket.send(json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+        data = await asyncio.wait_for(future, connection['timeout'])
+    finally:
+        with pending_lock:
+            pending.pop(request_id, None)
+
+    # Return response
+    return data
+
+# Authorize the websocket connection for private methods
+async def authorize():
+
+    # Only one authorization at a time
+    async with connection['auth_lock']:
+
+        # Still authorized
+        if defs.now_utc()[4] < connection['expires']:
+            return
+
+        # Authorize
+        params = {
+            "grant_type"   : "client_credentials",
+            "client_id"    : str(config.api_key),
+            "client_secret": str(config.api_secret)
+        }
+        data = await send("public/auth", params)
+
+        # Check response
+        if 'result' not in data:
+            raise ConnectionError(f"Websocket authorization failed: {data}")
+
+        # Set expiration, expires_in is in seconds
+        connection['expires'] = defs.now_utc()[4] + data['result']['expires_in'] * 1000 - 1000
+        defs.announce("Websocket authorization successful")
+
+    # Return
+    return
+
+# Authorize when required and call method
+async def call(method, params, state=None):
+
+    # Private methods require an authorized connection, the call itself is not sent when this fails
+    if method.startswith("private/"):
+        try:
+            await authorize()
+        except Exception as e:
+            raise NotSent(f"Websocket authorization failed: {e}") from e
+
+    # Send message
+    data = await send(method, params, state)
+
+    # Return response
+    return data
+
+# Check if a method can be sent over the websocket from this thread
+def available(method):
+
+    # Method must be supported and the websocket attached
+    if method not in methods or connection['websocket'] is None:
+        return False
+
+    # Calls from within the event loop would block it, these go over HTTP
+    try:
+        asyncio.get_running_loop()
+        return False
+    except RuntimeError:
+        pass
+
+    # Return
+    return True
+
+# Call method from a worker thread, returns the response like the REST API does, raises NotSent when the message was never written
+def request(method, params):
+
+    # Initialize variables
+    state = {'sent': False, 'abandoned': False}
+
+    # Run call in the event loop and wait for the response
+    try:
+        future = asyncio.run_coroutine_threadsafe(call(method, params, state), connection['loop'])
+        data   = future.result(connection['timeout'] * 2)
+
+    # Give up on the call, it is only safe to send again when the message was never written
+    except Exception as e:
+        with pending_lock:
+            state['abandoned'] = True
+            sent               = state['sent']
+        if not sent and not isinstance(e, NotSent):
+            raise NotSent(str(e)) from e
+        raise
+
+    # Return response
+    return data
@@ -0,0 +1,128 @@
+### Sunflow Cryptobot ###
+#
+# Time series backed by preallocated NumPy buffers
+
+# Load external libraries
+import numpy as np
+
+# Load internal libraries
+from loader import load_config
+
+# Load config
+config = load_config()
+
+# Create series from a dictionary of lists, ie. {'time': [], 'price': []}
+def create(data, capacity=1024):
+
+    # Initialize variables
+    length   = len(data['time'])
+    capacity = max(capacity, 2 * length)
+
+    # Create series
+    series            = {}
+    series['columns'] = list(data.keys())    # Column names, time is always int64 in ms, others float64
+    series['buffer']  = {}                   # Preallocated storage per column
+    series['start']   = 0                    # Index of first element in buffer
+    series['end']     = length               # Index after last element in buffer
+
+    # Fill buffers
+    for column in series['columns']:
+        dtype = np.int64 if column == "time" else np.float64
+        series['buffer'][column] = np.empty(capacity, dtype=dtype)
+        series['buffer'][column][:length] = data[column]
+
+    # Create views
+    refresh(series)
+
+    # Return series
+    return series
+
+# Refresh the contiguous zero-copy views, ie. series['time'] and series['price']
+def refresh(series):
+
+    # Slice buffers
+    for column in series['columns']:
+        series[column] = series['buffer'][column][series['start']:series['end']]
+
+    # Return
+    return
+
+# Make room at the end of the buffers, compact when half is evicted otherwise grow
+def make_room(series):
+
+    # Initialize variables
+    capacity = len(series['buffer']['time'])
+    length   = series['end'] - series['start']
+
+    # Move elements to the front of the buffers
+    if length <= capacity // 2:
+        for column in series['columns']:
+            buffer = series['buffer'][column]
+            buffer[:length] = buffer[series['start']:series['end']]
+
+    # Double the buffers
+    else:
+        for column in series['columns']:
+            buffer = np.empty(capacity * 2, dtype=series['buffer'][column].dtype)
+            buffer[:length] = series['buffer'][column][series['start']:series['end']]
+            series['buffer'][column] = buffer
+
+    # Set new boundaries
+    series['start'] = 0
+    series['end']   = length
+
+    # Return
+    return
+
+# Append one element, values in order of columns
+def append(series, *values):
+
+    # Make room if buffers are full
+    if series['end'] == len(series['buffer']['time']):
+        make_room(series)
+
+    # Store values
+    for column, value in zip(series['columns'], values):
+        series['buffer'][column][series['end']] = value
+    series['end'] += 1
+
+    # Update views
+    refresh(series)
+
+    # Return
+    return
+
+# Remove all elements older than oldest time, the latest element is always kept
+def evict(series, oldest):
+
+    # Find first element within the window, time is sorted
+    cut = int(np.searchsorted(series['time'], oldest, side='left'))
+    cut = min(cut, len(series['time']) - 1)
+
+    # Move start of series
+    if cut > 0:
+        series['start'] += cut
+        refresh(series)
+
+    # Return number of removed elements
+    return cut
+
+# Keep only the last count elements
+def trim(series, count):
+
+    # Move start of series
+    cut = size(series) - count
+    if cut > 0:
+        series['start'] += cut
+        refresh(series)
+
+    # Return number of removed elements
+    return max(cut, 0)
+
+# Number of elements in series
+def size(series):
+    return series['end'] - series['start']
+
+# Columns of series, ie. to create a dataframe
+def columns(series):
+    return {column: series[column] for column in series['columns']}
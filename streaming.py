@@ -0,0 +1,477 @@
+### Sunflow Cryptobot ###
+#
+# Streaming technical indicators, updated per kline instead of recalculated over all klines
+
+# Load external libraries
+from collections import deque
+from sys import float_info
+import bisect, math
+
+# Load internal libraries
+from loader import load_config
+import defs
+
+# Load config
+config = load_config()
+
+# Engines by interval
+engines = {}
+
+# Not a number
+nan = float('nan')
+
+### Helpers ###
+
+# Check if value is not a number
+def isnan(value):
+    return value != value
+
+# Divide like pandas does, no exceptions on zero
+def divide(a, b):
+
+    # Division by zero
+    if b == 0:
+        if a == 0 or isnan(a):
+            return nan
+        return math.copysign(math.inf, a) * math.copysign(1, b)
+
+    # Return division
+    return a / b
+
+# Range that is never zero, like pandas_ta does
+def non_zero(value):
+    if value == 0:
+        return float_info.epsilon
+    return value
+
+# Values that are almost zero are zero, like pandas_ta does
+def zero(value):
+    if abs(value) < float_info.epsilon:
+        return 0
+    return value
+
+### Blocks, every step function leaves the state untouched unless commit is True ###
+
+# Create window of the last length values
+def create_window(length):
+    return {'length': length, 'values': deque()}
+
+# Step window, returns the window including value
+def step_window(state, value, commit):
+
+    # Peek window
+    values = list(state['values'])
+    values.append(value)
+    if len(values) > state['length']:
+        values.pop(0)
+
+    # Commit window
+    if commit:
+        state['values'].append(value)
+        if len(state['values']) > state['length']:
+            state['values'].popleft()
+
+    # Return window
+    return values
+
+# Check if window is full and does not contain any not a number
+def full_window(state, values):
+    return len(values) == state['length'] and not any(isnan(value) for value in values)
+
+# Create simple moving average
+def create_sma(length):
+    return {'length': length, 'values': deque(), 'sum': 0.0, 'nans': 0}
+
+# Step simple moving average, like pandas rolling mean with min_periods equal to length
+def step_sma(state, value, commit):
+
+    # Remove oldest value when the window is full
+    total = state['sum']
+    nans  = state['nans']
+    if len(state['values']) == state['length']:
+        oldest = state['values'][0]
+        if isnan(oldest):
+            nans  -= 1
+        else:
+            total -= oldest
+
+    # Add value
+    if isnan(value):
+        nans  += 1
+    else:
+        total += value
+    count = min(len(state['values']) + 1, state['length'])
+
+    # Calculate average
+    average = nan
+    if count == state['length'] and nans == 0:
+        average = total / state['length']
+
+    # Commit, sum is recalculated to prevent drift
+    if commit:
+        state['values'].append(value)
+        if len(state['values']) > state['length']:
+            state['values'].popleft()
+        state['sum']  = math.fsum(x for x in state['values'] if not isnan(x))
+        state['nans'] = sum(1 for x in state['values'] if isnan(x))
+
+    # Return average
+    return average
+
+# Create exponentially weighted mean, pandas ewm with ignore_na=False
+def create_ewm(alpha, adjust, min_periods):
+    return {'alpha': alpha, 'adjust': adjust, 'min_periods': min_periods, 'weighted': nan, 'old_wt': 1.0, 'nobs': 0}
+
+# Step exponentially weighted mean, same recursion as pandas
+def step_ewm(state, value, commit):
+
+    # Initialize variables
+    weighted = state['weighted']
+    old_wt   = state['old_wt']
+    nobs     = state['nobs']
+    new_wt   = 1.0 if state['adjust'] else state['alpha']
+    is_obs   = not isnan(value)
+
+    # Weigh value
+    if is_obs: nobs += 1
+    if not isnan(weighted):
+        old_wt = old_wt * (1 - state['alpha'])
+        if is_obs:
+            if weighted != value:
+                weighted = ((old_wt * weighted) + (new_wt * value)) / (old_wt + new_wt)
+            if state['adjust']:
+                old_wt = old_wt + new_wt
+            else:
+                old_wt = 1.0
+    elif is_obs:
+        weighted = value
+
+    # Commit
+    if commit:
+        state['weighted'] = weighted
+        state['old_wt']   = old_wt
+        state['nobs']     = nobs
+
+    # Return mean
+    if nobs >= state['min_periods']:
+        return weighted
+    return nan
+
+# Create exponential moving average, seeded with the simple average of the first length values like pandas_ta
+def create_ema(length):
+    return {'length': length, 'seed': [], 'ewm': create_ewm(2 / (length + 1), False, 0)}
+
+# Step exponential moving average, leading values that are not a number are skipped
+def step_ema(state, value, commit):
+
+    # Seeded, continue average
+    if len(state['seed']) == state['length']:
+        return step_ewm(state['ewm'], value, commit)
+
+    # Skip leading not a number
+    if isnan(value):
+        return nan
+
+    # Collect seed
+    seed = state['seed'] + [value]
+    if commit:
+        state['seed'] = seed
+    if len(seed) < state['length']:
+        return nan
+
+    # Start average with simple average of seed
+    return step_ewm(state['ewm'], sum(seed) / state['length'], commit)
+
+# Create running moving average, like pandas_ta rma
+def create_rma(length):
+    return create_ewm(1 / length, True, length)
+
+# Create exponential moving average over the window of klines, like pandas_ta ema recalculated over the klines that are kept
+def create_window_ema(length):
+    return {'length': length, 'alpha': 2 / (length + 1), 'seed': deque(), 'tail': deque(), 'seed_sum': 0.0, 'tail_sum': 0.0, 'drops': 0}
+
+# Step exponential moving average over the window, the first length values seed it and the tail is weighted by alpha * decay ** age
+def step_window_ema(state, value, commit):
+
+    # Initialize variables
+    length  = state['length']
+    alpha   = state['alpha']
+    decay   = 1 - alpha
+    average = nan
+
+    # Collect seed
+    if len(state['seed']) < length:
+        if len(state['seed']) + 1 == length:
+            average = (state['seed_sum'] + value) / length
+        if commit:
+            state['seed'].append(value)
+            state['seed_sum'] += value
+
+    # Seed decays over the tail and value
+    else:
+        average = decay ** (len(state['tail']) + 1) * state['seed_sum'] / length + decay * state['tail_sum'] + alpha * value
+        if commit:
+            state['tail'].append(value)
+            state['tail_sum'] = decay * state['tail_sum'] + alpha * value
+
+    # Return average
+    return average
+
+# Drop the oldest value of the window, the first value of the tail joins the seed
+def drop_window_ema(state):
+
+    # Initialize variables
+    length = state['length']
+    alpha  = state['alpha']
+    decay  = 1 - alpha
+
+    # Move seed and tail up by one value
+    state['seed_sum'] -= state['seed'].popleft()
+    if state['tail']:
+        value = state['tail'].popleft()
+        state['tail_sum'] -= alpha * decay ** len(state['tail']) * value
+        state['seed'].append(value)
+        state['seed_sum'] += value
+
+    # Sums are recalculated once per window to prevent drift
+    state['drops'] += 1
+    if state['drops'] >= len(state['seed']) + len(state['tail']):
+        state['drops']    = 0
+        state['seed_sum'] = math.fsum(state['seed'])
+        state['tail_sum'] = math.fsum(alpha * decay ** age * value for age, value in enumerate(reversed(state['tail'])))
+
+    # Return
+    return
+
+### Engine ###
+
+# Create engine with the indicators in nodes
+def create_engine(nodes):
+
+    # Initialize engine
+    engine              = {}
+    engine['nodes']     = nodes   # Indicators to calculate, including dependencies
+    engine['time']      = None    # Time of the open kline
+    engine['count']     = 0       # Number of committed klines within the window of klines
+    engine['close']     = nan     # Close of the last committed kline
+    engine['high']      = nan     # High of the last committed kline
+    engine['low']       = nan     # Low of the last committed kline
+    engine['previous']  = {}      # Indicator values of the last committed kline
+
+    # RSI
+    if 'rsi' in nodes:
+        engine['rsi_pos']   = create_rma(14)
+        engine['rsi_neg']   = create_rma(14)
+
+    # CCI, AO and Momentum
+    if 'cci' in nodes:
+        engine['cci']       = create_window(20)
+    if 'ao' in nodes:
+        engine['ao_fast']   = create_sma(5)
+        engine['ao_slow']   = create_sma(34)
+    if 'momentum' in nodes:
+        engine['momentum']  = create_window(11)
+
+    # Lowest low and highest high, used by Williams %R and Stochastic
+    if 'range' in nodes:
+        engine['lows']      = create_window(14)
+        engine['highs']     = create_window(14)
+    if 'stochk' in nodes:
+        engine['stoch_k']   = create_sma(3)
+        engine['stoch_d']   = create_sma(3)
+
+    # Ultimate Oscillator
+    if 'uo' in nodes:
+        for length in (7, 14, 28):
+            engine[f"uo_bp_{length}"] = create_sma(length)
+            engine[f"uo_tr_{length}"] = create_sma(length)
+
+    # Moving averages, ie. EMA12 and EMA26 for MACD, exponential moving averages depend on the first kline of the window
+    for name in nodes:
+        if name[:3] == "EMA": engine[name] = create_window_ema(int(name[3:]))
+        if name[:3] == "SMA": engine[name] = create_sma(int(name[3:]))
+
+    # MACD
+    if 'macd' in nodes:
+        engine['macd_signal'] = create_ema(9)
+
+    # Stochastic RSI
+    if 'stochrsi' in nodes:
+        engine['stochrsi']    = create_window(14)
+        engine['stochrsi_k']  = create_sma(3)
+        engine['stochrsi_d']  = create_sma(3)
+
+    # ADX
+    if 'adx' in nodes:
+        engine['atr']         = create_rma(14)
+        engine['adx_pos']     = create_rma(14)
+        engine['adx_neg']     = create_rma(14)
+        engine['adx']         = create_rma(14)
+
+    # Return engine
+    return engine
+
+# Step the indicators of the engine with one kline
+def step(engine, high, low, close, commit):
+
+    # Initialize variables
+    values     = {}
+    nodes      = engine['nodes']
+    prev_close = engine['close']
+
+    # RSI
+    if 'rsi' in nodes:
+        change           = close - prev_close
+        positive         = nan if isnan(change) else max(change, 0)
+        negative         = nan if isnan(change) else min(change, 0)
+        positive_avg     = step_ewm(engine['rsi_pos'], positive, commit)
+        negative_avg     = step_ewm(engine['rsi_neg'], negative, commit)
+        values['rsi']    = divide(100 * positive_avg, positive_avg + abs(negative_avg))
+
+    # CCI
+    if 'cci' in nodes:
+        typical          = (high + low + close) / 3
+        window           = step_window(engine['cci'], typical, commit)
+        values['cci']    = nan
+        if full_window(engine['cci'], window):
+            mean          = sum(window) / len(window)
+            mad           = sum(abs(x - mean) for x in window) / len(window)
+            values['cci'] = divide(typical - mean, 0.015 * mad)
+
+    # Awesome Oscillator
+    if 'ao' in nodes:
+        median           = 0.5 * (high + low)
+        values['ao']     = step_sma(engine['ao_fast'], median, commit) - step_sma(engine['ao_slow'], median, commit)
+
+    # Momentum
+    if 'momentum' in nodes:
+        window             = step_window(engine['momentum'], close, commit)
+        values['momentum'] = close - window[0] if len(window) == engine['momentum']['length'] else nan
+
+    # Williams %R and Stochastic share the lowest low and highest high
+    if 'range' in nodes:
+        lows               = step_window(engine['lows'], low, commit)
+        highs              = step_window(engine['highs'], high, commit)
+        lowest             = min(lows) if full_window(engine['lows'], lows) else nan
+        highest            = max(highs) if full_window(engine['highs'], highs) else nan
+    if 'williamsr' in nodes:
+        values['williamsr'] = 100 * (divide(close - lowest, highest - lowest) - 1)
+    if 'stochk' in nodes:
+        stoch              = divide(100 * (close - lowest), non_zero(highest - lowest))
+        values['stoch_k']  = step_sma(engine['stoch_k'], stoch, commit)
+        values['stoch_d']  = step_sma(engine['stoch_d'], values['stoch_k'], commit)
+
+    # Ultimate Oscillator
+    if 'uo' in nodes:
+        maximum          = high if isnan(prev_close) else max(high, prev_close)
+        minimum          = low if isnan(prev_close) else min(low, prev_close)
+        buying           = close - minimum
+        true_range       = maximum - minimum
+        averages         = {}
+        for length in (7, 14, 28):
+            averages[length] = divide(step_sma(engine[f"uo_bp_{length}"], buying, commit), step_sma(engine[f"uo_tr_{length}"], true_range, commit))
+        values['uo']     = 100 * (4 * averages[7] + 2 * averages[14] + averages[28]) / 7
+
+    # Moving averages
+    for name in nodes:
+        if name[:3] == "EMA": values[name] = step_window_ema(engine[name], close, commit)
+        if name[:3] == "SMA": values[name] = step_sma(engine[name], close, commit)
+
+    # MACD
+    if 'macd' in nodes:
+        macd                   = values['EMA12'] - values['EMA26']
+        values['macd']         = macd
+        values['macd_signal']  = step_ema(engine['macd_signal'], macd, commit)
+        values['macd_hist']    = macd - values['macd_signal']
+
+    # Stochastic RSI
+    if 'stochrsi' in nodes:
+        window                 = step_window(engine['stochrsi'], values['rsi'], commit)
+        lowest_rsi             = min(window) if full_window(engine['stochrsi'], window) else nan
+        highest_rsi            = max(window) if full_window(engine['stochrsi'], window) else nan
+        stoch_rsi              = divide(100 * (values['rsi'] - lowest_rsi), non_zero(highest_rsi - lowest_rsi))
+        values['stochrsi_k']   = step_sma(engine['stochrsi_k'], stoch_rsi, commit)
+        values['stochrsi_d']   = step_sma(engine['stochrsi_d'], values['stochrsi_k'], commit)
+
+    # ADX
+    if 'adx' in nodes:
+        true_range       = nan
+        if not isnan(prev_close):
+            true_range   = max(abs(non_zero(high - low)), abs(high - prev_close), abs(prev_close - low))
+        atr              = step_ewm(engine['atr'], true_range, commit)
+        up               = high - engine['high']
+        down             = engine['low'] - low
+        positive         = nan if isnan(up) else zero(up if (up > down and up > 0) else 0)
+        negative         = nan if isnan(down) else zero(down if (down > up and down > 0) else 0)
+        scale            = divide(100, atr)
+        values['dmp']    = scale * step_ewm(engine['adx_pos'], positive, commit)
+        values['dmn']    = scale * step_ewm(engine['adx_neg'], negative, commit)
+        dx               = divide(100 * abs(values['dmp'] - values['dmn']), values['dmp'] + values['dmn'])
+        values['adx']    = step_ewm(engine['adx'], dx, commit)
+
+    # Commit kline
+    if commit:
+        engine['count']   += 1
+        engine['close']    = close
+        engine['high']     = high
+        engine['low']      = low
+        engine['previous'] = values
+
+    # Return indicator values
+    return values
+
+# Commit klines from index up to but not including the last one
+def commit_klines(engine, klines, start):
+
+    # Commit closed klines
+    for i in range(start, len(klines['time']) - 1):
+        step(engine, float(klines['high'][i]), float(klines['low'][i]), float(klines['close'][i]), True)
+
+    # Return
+    return
+
+# Get indicator values of the last kline, engine is kept in sync with the klines
+def calculate(klines, interval, nodes):
+
+    # Debug
+    debug = False
+
+    # Initialize variables
+    engine = engines.get(interval)
+    times  = klines['time']
+    last   = len(times) - 1
+
+    # Find open kline of the engine in klines
+    index = -1
+    if engine is not None:
+        index = bisect.bisect_left(times, engine['time'])
+        if index > last or times[index] != engine['time']:
+            index = -1
+
+    # Klines or indicators were replaced, build engine from scratch
+    if index == -1 or engine['nodes'] != nodes:
+        if debug: defs.announce(f"Debug: Building streaming indicators for {interval}m interval from {len(times)} klines")
+        engine = create_engine(nodes)
+        engines[interval] = engine
+        index  = 0
+
+    # Commit klines that closed since the last call
+    commit_klines(engine, klines, index)
+
+    # Drop klines that rolled off from the exponential moving averages, other recursions forgot them long ago
+    while engine['count'] > last:
+        engine['count'] -= 1
+        for name in nodes:
+            if name[:3] == "EMA": drop_window_ema(engine[name])
+
+    # Peek at the open kline
+    engine['time'] = times[last]
+    values = step(engine, float(klines['high'][last]), float(klines['low'][last]), float(klines['close'][last]), False)
+
+    # Values of the previous kline
+    for name in ('ao', 'momentum', 'macd_hist'):
+        if name in values:
+            values[name + '_prev'] = engine['previous'].get(name, nan)
+
+    # Return indicator values
+    return values
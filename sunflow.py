@@ -5,12 +5,12 @@
 # Load external libraries
 from time import sleep
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from websockets.protocol import State
-import asyncio, argparse, importlib, json, pprint, sys, traceback, websockets
-import pandas as pd
+import asyncio, argparse, importlib, json, pprint, sys, threading, traceback, websockets
 
 # Load internal libraries
-import database, defs, deribit, optimum, orders, preload, trailing
+import client, database, dbwriter, defs, deribit, distance, fills, history, indicators, optimum, orders, preload, rpc, series, trailing, workers
 
 # Parse command line arguments
 parser = argparse.ArgumentParser(description="Run the Sunflow Cryptobot with a specified config.")
@@ -40,6 +40,7 @@ intervals[0]                         = 0
 intervals[1]                         = config.interval_1                           # Klines timeframe interval 1
 intervals[2]                         = config.interval_2                           # Klines timeframe interval 2
 intervals[3]                         = config.interval_3                           # Klines timeframe interval 3
+derived_intervals                    = []                                          # Intervals derived from interval 1 klines, set at startup
 limit                                = config.limit                                # Number of klines downloaded, used for calculcating technical indicators
 trades                               = {}                                          # Trades for symbol
 ticker                               = {}                                          # Ticker data, including lastPrice and time
@@ -67,7 +68,7 @@ optimizer['limit_max']               = config.optimizer_limit_max
 optimizer['adj_min']                 = config.optimizer_adj_min                    # Minimum adjustment
 optimizer['adj_max']                 = config.optimizer_adj_max                    # Maximum adjustment
 optimizer['scaler']                  = config.optimizer_scaler                     # Scales the final optimizer value by multiplying by this value
-optimizer['df']                      = pd.DataFrame()                              # Dataframe is empty at start
+optimizer['bars']                    = {}                                          # Closes per interval, created at start
 
 # Minimum spread between historical buy orders
 use_spread                           = {}                                          # Spread
@@ -191,6 +192,18 @@ lock_ticker                          = {}
 lock_ticker['time']                  = defs.now_utc()[4]
 lock_ticker['delay']                 = 5000
 lock_ticker['enabled']               = False
+lock_ticker['pending']               = []                                          # Ticks received while handle_ticker was busy, latest tick wins
+lock_ticker['received']              = 0                                           # Number of ticks received
+lock_ticker['conflated']             = 0                                           # Number of ticks conflated into a newer tick
+lock_ticker['mutex']                 = threading.Lock()                            # Guards pending ticks and enabled flag
+
+# Klines queued for the worker thread per handler, a newer update of the same kline replaces the queued one
+lock_kline                           = {}
+lock_kline['pending']                = {}                                          # Queued kline messages per handler by kline time
+lock_kline['busy']                   = set()                                       # Handlers with a drain submitted to the worker
+lock_kline['received']               = 0                                           # Number of klines received
+lock_kline['conflated']              = 0                                           # Number of klines conflated into a newer update
+lock_kline['mutex']                  = threading.Lock()                            # Guards pending klines and busy handlers
 
 # Uptime ping
 uptime_ping                          = {}
@@ -209,56 +222,160 @@ periodic['enabled']                  = True
 # Channel handlers
 channel_handlers                     = {}
 
+# Execution of handlers and exchange calls
+execution                            = {}
+execution['threaded']                = config.exchange_threaded                    # Run handlers and exchange calls in a worker thread
+execution['pool']                    = None                                        # Worker thread, created when threaded
+if execution['threaded']             : execution['pool'] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sunflow")
+
 
 ### Functions ###
 
 # Handle messages to keep tickers up to date
 def handle_ticker(message):
+
+    # Queue the tick and process it if handle_ticker is not busy
+    if queue_ticker(message):
+        drain_ticker()
+
+    # Close function
+    return
+
+# Put tick in the latest tick wins slot, returns True when the caller has to drain the slot
+def queue_ticker(message):
     
-    # Debug and speed
+    # Debug
     debug = False
-    speed = False
-    stime = defs.now_utc()[4]
        
     # Errors are not reported within websocket
     try:
    
         # Declare some variables global
-        global spot, ticker, profit, active_order, all_buys, all_sells, prices, indicators_advice, lock_ticker, use_spread, optimizer, compounding, uptime_ping, info
+        global lock_ticker
 
         # Initialize variables
-        ticker              = {}
-        result              = ()
-        current_time        = defs.now_utc()[4]
-        lock_ticker['time'] = current_time
+        tick = {}
         
         # Decoded message and get latest ticker
-        ticker['time']          = int(message['params']['data']['timestamp'])
-        ticker['lastPrice']     = float(message['params']['data']['price'])
-        ticker['lastPrice']     = defs.round_number(ticker['lastPrice'], info['tickSize'])   # Deribit does not deliver prices occording to tickSize via websocket!
-        active_order['current'] = ticker['lastPrice']
-
-        # Popup new price
-        prices['time'].append(ticker['time'])
-        prices['price'].append(ticker['lastPrice'])
-        
-        # Remove last price if necessary
-        if current_time - prices['time'][0] > optimizer['limit_max']:
-            prices['time'].pop(0)
-            prices['price'].pop(0)
+        tick['time']      = int(message['params']['data']['timestamp'])
+        tick['lastPrice'] = float(message['params']['data']['price'])
+        tick['lastPrice'] = defs.round_number(tick['lastPrice'], info['tickSize'])   # Deribit does not deliver prices occording to tickSize via websocket!
 
         # Show incoming message
-        if debug: defs.announce(f"*** Incoming ticker with price {ticker['lastPrice']} {info['baseCoin']}, simulated = {ticker['simulated']} ***")
+        if debug: defs.announce(f"*** Incoming ticker with price {tick['lastPrice']} {info['baseCoin']} ***")
 
-        # Prevent race conditions
-        if lock_ticker['enabled']:
-            spot = ticker['lastPrice']
-            defs.announce("Function is busy, Sunflow will catch up with next tick")
-            if speed: defs.announce(defs.report_exec(stime, "function busy"))
-            return
-        
-        # Lock handle_ticker function
-        lock_ticker['enabled'] = True
+        # Put tick in the slot, when busy the tick will be picked up after the current cycle
+        with lock_ticker['mutex']:
+            lock_ticker['pending'].append(tick)
+            lock_ticker['received'] += 1
+            if lock_ticker['enabled']:
+                if debug: defs.announce("Debug: Function is busy, Sunflow will catch up right after the current tick")
+                return False
+            lock_ticker['enabled'] = True
+
+    # Report error
+    except Exception as e:
+        tb_info = traceback.extract_tb(e.__traceback__)
+        frame_summary = tb_info[-1]
+        filename = frame_summary.filename
+        line = frame_summary.lineno
+        defs.announce(f"*** Warning: Exception in {filename} on line {line}: {e} ***")
+        return False
+
+    # Caller has to drain
+    return True
+
+# Process ticks until no new ticks arrived while we were busy, when threaded one batch per turn on the worker
+def drain_ticker():
+
+    # Debug and speed
+    debug = False
+    speed = False
+    stime = defs.now_utc()[4]
+
+    # Declare some variables global
+    global prices, lock_ticker, optimizer
+
+    # Initialize variables
+    ticks = []
+
+    # Keep processing until no new ticks arrived while we were busy
+    while True:
+
+        # Take all pending ticks out of the slot or unlock function
+        with lock_ticker['mutex']:
+            ticks = lock_ticker['pending']
+            lock_ticker['pending'] = []
+            if not ticks:
+                lock_ticker['enabled'] = False
+                break
+
+        # Errors are not reported within websocket
+        try:
+
+            # Popup new prices, all ticks are stored even if they are not processed
+            current_time = defs.now_utc()[4]
+            for tick in ticks:
+                history.append(prices, tick['time'], tick['lastPrice'])
+                if optimizer['enabled']:
+                    optimum.update_bars(optimizer, tick['time'], tick['lastPrice'])
+                if distance.ewm_std:
+                    distance.update_ewm_std(tick['time'], tick['lastPrice'])
+            
+            # Remove all prices outside the horizon of each tier
+            history.evict(prices, current_time)
+
+            # Latest tick wins, older ticks were conflated
+            if len(ticks) > 1:
+                lock_ticker['conflated'] += len(ticks) - 1
+                defs.announce(f"Function was busy, conflated {len(ticks) - 1} ticks and catching up with latest price")
+
+        # Report error
+        except Exception as e:
+            tb_info = traceback.extract_tb(e.__traceback__)
+            frame_summary = tb_info[-1]
+            filename = frame_summary.filename
+            line = frame_summary.lineno
+            defs.announce(f"*** Warning: Exception in {filename} on line {line}: {e} ***")
+
+        # Process latest tick
+        process_ticker(ticks[-1])
+
+        # Take turns with the klines on the shared worker, resubmit if new ticks arrived while we were busy
+        if execution['threaded']:
+            with lock_ticker['mutex']:
+                if not lock_ticker['pending']:
+                    lock_ticker['enabled'] = False
+                    break
+            submit_handler(drain_ticker)
+            break
+
+    # Report execution time
+    if speed: defs.announce(defs.report_exec(stime))
+    
+    # Close function
+    return
+
+# Process the latest ticker
+def process_ticker(new_ticker):
+    
+    # Debug and speed
+    debug = False
+    speed = False
+    stime = defs.now_utc()[4]
+       
+    # Errors are not reported within websocket
+    try:
+   
+        # Declare some variables global
+        global spot, ticker, profit, active_order, all_buys, all_sells, prices, indicators_advice, lock_ticker, use_spread, optimizer, compounding, uptime_ping, info
+
+        # Initialize variables
+        ticker                  = new_ticker
+        result                  = ()
+        current_time            = defs.now_utc()[4]
+        lock_ticker['time']     = current_time
+        active_order['current'] = ticker['lastPrice']
 
         # Run trailing if active
         if active_order['active']:
@@ -358,9 +475,8 @@ def handle_ticker(message):
         line = frame_summary.lineno
         defs.announce(f"*** Warning: Exception in {filename} on line {line}: {e} ***")
 
-    # Always set new spot price and unlock function
+    # Always set new spot price
     spot = ticker['lastPrice']
-    lock_ticker['enabled'] = False
     
     # Report execution time
     if speed: defs.announce(defs.report_exec(stime))
@@ -380,6 +496,84 @@ def handle_kline_3(message):
     handle_kline(message, intervals[3])
     return
 
+# Update ATR with 1 minute trade klines, the same source it was created from
+def handle_kline_atr(message):
+
+    # Errors are not reported within websocket
+    try:
+
+        # Update open bar of ATR
+        data = message['params']['data']
+        if distance.atr:
+            distance.update_atr(int(data['tick']), float(data['high']), float(data['low']), float(data['close']))
+
+    # Report error
+    except Exception as e:
+        tb_info = traceback.extract_tb(e.__traceback__)
+        frame_summary = tb_info[-1]
+        filename = frame_summary.filename
+        line = frame_summary.lineno
+        defs.announce(f"*** Warning: Exception in {filename} on line {line}: {e} ***")
+
+    # Close function
+    return
+
+# Put kline in the slot of its handler, returns True when the caller has to drain the slot
+def queue_kline(handler, message):
+
+    # Errors are not reported within websocket
+    try:
+
+        # Initialize variables
+        tick = int(message['params']['data']['tick'])
+
+        # Replace a queued update of the same kline, updates of a new kline are queued after it
+        with lock_kline['mutex']:
+            pending = lock_kline['pending'].setdefault(handler, {})
+            if tick in pending:
+                lock_kline['conflated'] += 1
+            pending[tick] = message
+            lock_kline['received'] += 1
+            if handler in lock_kline['busy']:
+                return False
+            lock_kline['busy'].add(handler)
+
+    # Report error
+    except Exception as e:
+        tb_info = traceback.extract_tb(e.__traceback__)
+        frame_summary = tb_info[-1]
+        filename = frame_summary.filename
+        line = frame_summary.lineno
+        defs.announce(f"*** Warning: Exception in {filename} on line {line}: {e} ***")
+        return False
+
+    # Caller has to drain
+    return True
+
+# Process one batch of queued klines of handler and resubmit if new klines arrived while we were busy
+def drain_kline(handler):
+
+    # Take all queued klines out of the slot or release handler
+    with lock_kline['mutex']:
+        pending = lock_kline['pending'].pop(handler, {})
+        if not pending:
+            lock_kline['busy'].discard(handler)
+            return
+
+    # Process klines in order of time
+    for message in pending.values():
+        handler(message)
+
+    # Take turns with ticks and other intervals on the shared worker instead of looping until the queue is empty
+    with lock_kline['mutex']:
+        if not lock_kline['pending'].get(handler):
+            lock_kline['busy'].discard(handler)
+            return
+    submit_handler(drain_kline, handler)
+
+    # Close function
+    return
+
 # Handle messages to keep klines up to date
 def handle_kline(message, interval):
 
@@ -409,15 +603,25 @@ def handle_kline(message, interval):
         kline['volume']   = float(message['params']['data']['volume'])
         kline['turnover'] = float(message['params']['data']['cost'])
 
-        # Check if the number of klines and add in
-        klines_count = len(klines[interval]['close'])
-        if klines_count != limit:
-            klines[interval] = preload.get_klines(symbol, interval, limit)
+        # Update the current kline or roll to a new one
+        klines_count = series.size(klines[interval])
         klines[interval] = defs.add_kline(kline, klines[interval])
         defs.announce(f"Added {interval}m interval onto existing {klines_count} klines")
+
+        # ATR is created from these klines when the interval is 1 minute
+        if interval == 1 and distance.atr:
+            distance.update_atr(kline['time'], kline['high'], kline['low'], kline['close'])
         
+        # Update intervals derived from this one
+        updated = [interval]
+        if interval == intervals[1]:
+            for derived in derived_intervals:
+                klines[derived] = defs.add_kline(defs.derive_kline(klines[interval], derived), klines[derived])
+                updated.append(derived)
+
         # Run buy matrix
-        active_order = buy_matrix(spot, active_order, all_buys, interval)
+        for updated_interval in updated:
+            active_order = buy_matrix(spot, active_order, all_buys, updated_interval)
 
     # Report error
     except Exception as e:
@@ -583,12 +787,10 @@ def handle_trade(message):
             trades['size']  = trades['size'][-use_trade['limit']:]
             trades['price'] = trades['price'][-use_trade['limit']:]
     
-        # Number of trades to use for timeframe
-        number = defs.get_index_number(trades, use_trade['timeframe'], use_trade['limit'])
-        compare['time']  = trades['time'][-number:]
-        compare['side']  = trades['side'][-number:]
-        compare['size']  = trades['size'][-number:]
-        compare['price'] = trades['price'][-number:]        
+        # Trades within timeframe
+        moment = trades['time'][-1] - use_trade['timeframe']
+        for column in compare:
+            compare[column] = defs.get_window(trades, column, moment)
     
         # Get trade_advice
         result = defs.calculate_total_values(compare)        
@@ -685,6 +887,11 @@ def prechecks():
         goahead = False
         defs.announce("Need at least either Technical Indicators enabled or Spread to determine buy action!")
     
+    unknown = [name for name in config.indicators_set if name not in indicators.graph]
+    if use_indicators['enabled'] and (unknown or not indicators.selected):
+        goahead = False
+        defs.announce(f"Unknown or no indicators in indicators_set: {', '.join(unknown)}")
+
     if compounding['enabled'] and not config.wallet_report:
         goahead = False
         defs.announce("When compounding set wallet_report to True to use compounding!")
@@ -719,9 +926,16 @@ print(f"Limit     : {limit}\n")
 ## Preload all requirements
 print("\n*** Preloading ***\n")
 preload.check_files()
-if intervals[1] !=0  : klines[intervals[1]] = preload.get_klines(symbol, intervals[1], limit)
-if intervals[2] !=0  : klines[intervals[2]] = preload.get_klines(symbol, intervals[2], limit)
-if intervals[3] !=0  : klines[intervals[3]] = preload.get_klines(symbol, intervals[3], limit)
+if config.indicators_derive and intervals[1] != 0:
+    derived_intervals = [interval for interval in (intervals[2], intervals[3]) if defs.derivable(interval, intervals[1])]
+if intervals[1] !=0  : klines[intervals[1]] = preload.get_klines(symbol, intervals[1], (limit + 1) * max([1] + [interval // intervals[1] for interval in derived_intervals]))
+for interval in derived_intervals:
+    klines[interval] = defs.aggregate_klines(klines[intervals[1]], interval)
+if intervals[1] !=0  : series.trim(klines[intervals[1]], limit)
+if intervals[2] !=0 and intervals[2] not in derived_intervals: klines[intervals[2]] = preload.get_klines(symbol, intervals[2], limit)
+if intervals[3] !=0 and intervals[3] not in derived_intervals: klines[intervals[3]] = preload.get_klines(symbol, intervals[3], limit)
+if config.indicators_workers and use_indicators['enabled']: workers.start(klines)
+if active_order['wiggle'] == "ATR": distance.create_atr(klines[1] if intervals[1] == 1 else preload.get_klines(symbol, 1, limit))
 ticker               = preload.get_ticker(symbol)
 spot                 = ticker['lastPrice']
 info                 = preload.get_info(symbol, spot, multiplier, compounding)
@@ -736,8 +950,13 @@ if optimizer['enabled']:
     # Get historical prices and combine with current prices
     prices_old   = preload.get_prices(symbol, optimizer['interval'], 1000)
     prices       = preload.combine_prices(prices_old, prices)
-    
-    # Calulcate optimized data
+
+# Store prices in tiered history
+prices               = history.create(prices, optimizer['limit_max'])
+
+# Calulcate optimized data
+if optimizer['enabled']:
+    optimizer    = optimum.create_bars(optimizer, history.view(prices, "minute"))
     result       = optimum.optimize(prices, profit, active_order, use_spread, optimizer)
     profit       = result[0]
     active_order = result[1]
@@ -806,8 +1025,20 @@ def periodic_tasks(current_time):
     # Debug
     debug = False
     
-    # Pass
-    pass
+    # Report latency of the exchange per endpoint
+    client.report_latency()
+
+    # Report indicator advice cache
+    indicators.report_cache()
+
+    # Report reuse of trigger price distance
+    distance.report_context()
+
+    # Compact the journal of the buys database
+    database.compact()
+
+    # Report writes of the buys database
+    dbwriter.report_writer()
     
     # Return
     return
@@ -834,6 +1065,16 @@ def ping_message(current_time):
             defs.announce(f"Ping, {delay_ping} ms since last message and ticker update")
         else:
             defs.announce(f"Ping, {delay_ping} ms since last message and last ticker update was {delay_tickers} ms ago")
+
+    # Report ticks that were conflated because handle_ticker was busy
+    if uptime_ping['enabled'] and lock_ticker['conflated'] > 0:
+        conflated_perc = (lock_ticker['conflated'] / lock_ticker['received']) * 100
+        defs.announce(f"Ping, conflated {lock_ticker['conflated']} of {lock_ticker['received']} ticks ({conflated_perc:.2f} %) while busy")
+
+    # Report klines that were conflated because the worker was busy
+    if uptime_ping['enabled'] and lock_kline['conflated'] > 0:
+        conflated_perc = (lock_kline['conflated'] / lock_kline['received']) * 100
+        defs.announce(f"Ping, conflated {lock_kline['conflated']} of {lock_kline['received']} klines ({conflated_perc:.2f} %) while busy")
     
     # Return
     return
@@ -851,13 +1092,24 @@ def create_subscription_message(symbol, intervals):
         channels.append(f"chart.trades.{symbol.upper()}.{intervals[1]}")
         channel_handlers[f"chart.trades.{symbol.upper()}.{intervals[1]}"] = handle_kline_1
     
-    if intervals[2] != 0:
+    if intervals[2] != 0 and intervals[2] not in derived_intervals:
         channels.append(f"chart.trades.{symbol.upper()}.{intervals[2]}")
         channel_handlers[f"chart.trades.{symbol.upper()}.{intervals[2]}"] = handle_kline_2
 
-    if intervals[3] != 0:
+    if intervals[3] != 0 and intervals[3] not in derived_intervals:
         channels.append(f"chart.trades.{symbol.upper()}.{intervals[3]}")
         channel_handlers[f"chart.trades.{symbol.upper()}.{intervals[3]}"] = handle_kline_3
+
+    # ATR follows 1 minute trade klines, handle_kline already delivers them when an interval is 1 minute
+    if active_order['wiggle'] == "ATR" and 1 not in (intervals[1], intervals[2], intervals[3]):
+        channels.append(f"chart.trades.{symbol.upper()}.1")
+        channel_handlers[f"chart.trades.{symbol.upper()}.1"] = handle_kline_atr
+
+    # Private channels are subscribed separately, they require an authorized connection
+    if config.exchange_fills:
+        private = fills.channels(symbol)
+        channel_handlers[private[0]] = fills.handle_orders
+        channel_handlers[private[1]] = fills.handle_trades
   
     subscription_message = {
         "jsonrpc": "2.0",
@@ -896,6 +1148,55 @@ async def send_heartbeat(websocket, interval=30):
             break
         await asyncio.sleep(interval)
 
+# Report exceptions of handlers that ran in the worker thread
+def report_handler(future):
+
+    # Get exception if any
+    exception = future.exception()
+    
+    # Output to stdout
+    if exception:
+        defs.announce(f"*** Warning: Exception in worker thread: {exception} ***")
+
+    # Return
+    return
+
+# Submit function to the worker thread and report its exceptions
+def submit_handler(function, *args):
+
+    # Queue behind the work already submitted
+    future = execution['pool'].submit(function, *args)
+    future.add_done_callback(report_handler)
+
+    # Return
+    return
+
+# Dispatch message to handler, inline or in the worker thread
+def dispatch_handler(handler, message):
+
+    # Tickers are queued in the loop, the worker drains them when threaded and the receive loop when inline
+    if handler is handle_ticker:
+        if queue_ticker(message) and execution['threaded']:
+            submit_handler(drain_ticker)
+        return
+
+    # Run handler directly within the websocket loop, fill events only update a cache and are never queued
+    if (not execution['threaded']) or (handler in (fills.handle_orders, fills.handle_trades)):
+        handler(message)
+        return
+
+    # Klines are queued per interval and drained by the worker, so advice never runs on a backlog of stale updates
+    if handler in (handle_kline_1, handle_kline_2, handle_kline_3, handle_kline_atr):
+        if queue_kline(handler, message):
+            submit_handler(drain_kline, handler)
+        return
+
+    # All other handlers run in the worker, so the websocket keeps being read
+    submit_handler(handler, message)
+
+    # Return
+    return
+
 # Simulated ticker
 def simulated_ticker():
     
@@ -928,6 +1229,13 @@ async def call_api(symbol, intervals):
             
             # Send heartbeat
             asyncio.create_task(send_heartbeat(websocket))
+
+            # Allow order calls over this websocket
+            rpc.attach(websocket)
+
+            # Subscribe to order and trade updates
+            if config.exchange_fills:
+                asyncio.create_task(fills.subscribe(symbol))
             
             # Get data from exchange
             while (websocket.state is State.OPEN) and (not defs.halt_sunflow):
@@ -945,14 +1253,23 @@ async def call_api(symbol, intervals):
                         periodic_tasks(current_time)
                         periodic['time'] = current_time
 
-                    # Get response                    
-                    response      = await websocket.recv()
+                    # Get response, when inline queued ticks are drained once no message is waiting so ticks received while busy are conflated
+                    receive = asyncio.ensure_future(websocket.recv())
+                    if lock_ticker['pending'] and not execution['threaded']:
+                        await asyncio.sleep(0)
+                        if not receive.done():
+                            drain_ticker()
+                    response      = await receive
                     response_data = json.loads(response)
                     channel       = response_data.get('params', {}).get('channel')
 
+                    # Responses to order calls are resolved by id
+                    if rpc.resolve(response_data):
+                        continue
+
                     # Dispatch to appropriate handler based on channel
                     if channel and channel in channel_handlers:
-                        channel_handlers[channel](response_data)
+                        dispatch_handler(channel_handlers[channel], response_data)
                     else:
                         defs.announce(f"Unhandled message from channel {channel}, this might occur at start")
 
@@ -968,6 +1285,10 @@ async def call_api(symbol, intervals):
                     defs.log_error(message)
                     break
 
+            # Order calls go over HTTP and fills are polled until reconnected
+            rpc.detach()
+            fills.unsubscribe()
+
         # Wait before reconnecting
         defs.announce("Reconnecting to exchange in 5 seconds...")
         await asyncio.sleep(5)
@@ -980,6 +1301,10 @@ if __name__ == "__main__" and not defs.halt_sunflow:
     # Execute main
     asyncio.run(main())
 
+    # Finish work that is still in the worker thread
+    if execution['threaded']:
+        execution['pool'].shutdown(wait=True)
+
 
 ### Say goodbye ###
 if config.timeutc_std:
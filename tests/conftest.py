@@ -0,0 +1,16 @@
+### Sunflow Cryptobot ###
+#
+# Test configuration, modules load the config given with -c so the tests use a copy of config.py.txt
+
+# Load external libraries
+from pathlib import Path
+import shutil, sys, tempfile
+
+# Copy the example config
+root   = Path(__file__).resolve().parent.parent
+folder = Path(tempfile.mkdtemp())
+shutil.copy(root / "config.py.txt", folder / "config.py")
+
+# Point modules to the config and the repository
+sys.argv = [sys.argv[0], "-c", str(folder / "config.py")]
+sys.path.insert(0, str(root))
@@ -0,0 +1,48 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the database writer thread
+
+# Load external libraries
+import json, threading
+
+# Load internal libraries
+import dbwriter
+
+# Writer that fails once with an unexpected exception, which stops the thread
+def test_flush_returns_when_writer_died(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    monkeypatch.setattr(dbwriter.config, "dbase_file", str(tmp_path / "buys.json"))
+    monkeypatch.setattr(dbwriter.config, "dbase_coalesce", 1)
+    monkeypatch.setattr(dbwriter, "writer", {'thread': None, 'pending': None, 'dirty': False, 'writing': False, 'error': None})
+    write_file = dbwriter.write_file
+    failures   = []
+    def write_once(all_buys):
+        if not failures:
+            failures.append(True)
+            raise RuntimeError("disk gone")
+        write_file(all_buys)
+    monkeypatch.setattr(dbwriter, "write_file", write_once)
+
+    # Save and let the writer die
+    dbwriter.save([{'id': 1}])
+    dbwriter.writer['thread'].join(timeout=5)
+    assert not dbwriter.writer['thread'].is_alive()
+
+    # Flush returns, reports the error and writes the buys itself
+    done   = []
+    thread = threading.Thread(target=lambda: done.append(dbwriter.flush()))
+    thread.start()
+    thread.join(timeout=5)
+    assert done == [False]
+    assert isinstance(dbwriter.writer['error'], RuntimeError)
+    assert json.loads((tmp_path / "buys.json").read_text()) == [{'id': 1}]
+
+def test_flush_waits_for_write(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dbwriter.config, "dbase_file", str(tmp_path / "buys.json"))
+    monkeypatch.setattr(dbwriter.config, "dbase_coalesce", 1)
+    monkeypatch.setattr(dbwriter, "writer", {'thread': None, 'pending': None, 'dirty': False, 'writing': False, 'error': None})
+    dbwriter.save([{'id': 2}])
+    assert dbwriter.flush()
+    assert json.loads((tmp_path / "buys.json").read_text()) == [{'id': 2}]
@@ -0,0 +1,59 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the binary search time lookups and windows in defs against the linear scans they replaced
+
+# Load external libraries
+import numpy as np, random
+
+# Load internal libraries
+import defs
+
+# Closest index as the old linear scan found it, the first of equally close elements
+def closest_scan(data, span):
+    closest_index = None
+    min_diff = float('inf')
+    for i, t in enumerate(data['time']):
+        diff = abs(t - span)
+        if diff < min_diff:
+            min_diff = diff
+            closest_index = i
+    return closest_index
+
+# Number of items as the old scan counted them, only valid while data holds at most limit elements
+def number_scan(data, timeframe, limit):
+    elements = len(data['time'])
+    missing  = limit - elements if elements < limit else 0
+    return limit - closest_scan(data, data['time'][-1] - timeframe) - missing
+
+# Sorted times with gaps and duplicates
+def random_times(count):
+    return sorted(random.choice([random.randint(0, 10 * count), 5 * count]) for _ in range(count))
+
+def test_closest_index_matches_scan():
+    random.seed(7)
+    for count in (1, 2, 3, 10, 100, 1000):
+        times = random_times(count)
+        for data in ({'time': times}, {'time': np.array(times, dtype=np.int64)}):
+            for span in [-5, 0, 5 * count, 10 * count + 5] + [random.randint(-10, 10 * count + 10) for _ in range(50)] + times[:20]:
+                assert defs.get_closest_index(data, span) == closest_scan(data, span)
+
+def test_closest_index_of_no_data():
+    assert defs.get_closest_index({'time': []}, 10) is None
+
+def test_index_number_matches_scan():
+    random.seed(11)
+    limit = 200
+    for count in (1, 50, limit):
+        data = {'time': random_times(count)}
+        for timeframe in (0, 1, 37, 500, 5000):
+            assert defs.get_index_number(data, timeframe, limit) == number_scan(data, timeframe, limit)
+
+def test_window_matches_scan():
+    random.seed(13)
+    for count in (0, 1, 10, 1000):
+        times = random_times(count)
+        data  = {'time': times, 'price': [time * 2 for time in times]}
+        for moment in [-5, 0, 5 * count, 10 * count + 5] + [random.randint(-10, 10 * count + 10) for _ in range(50)] + times[:20]:
+            after = next((i for i, time in enumerate(times) if time >= moment), count)
+            assert defs.get_index_after(data, moment) == after
+            assert defs.get_window(data, 'price', moment) == data['price'][after:]
@@ -0,0 +1,126 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the streaming distance calculations against pandas_ta and pandas
+
+# Load external libraries
+import math, numpy as np, pandas as pd, pandas_ta as ta
+
+# Load internal libraries
+from loader import load_config
+import distance, series
+
+# Load config
+config = load_config()
+
+# Random walk of 1 minute trade klines
+def random_klines(count, seed):
+    rng    = np.random.default_rng(seed)
+    close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    spread = close * rng.uniform(0, 0.003, count)
+    return {'time': np.arange(count) * 60000, 'high': close + spread, 'low': close - spread, 'close': close}
+
+# Random walk of index ticks on a tick size of 0.5, so some returns are zero
+def random_ticks(count, seed):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.integers(50, 400, count)).tolist(), np.round(2 * 100 * np.exp(np.cumsum(rng.normal(0, 0.0005, count)))) / 2
+
+# EWM standard deviation of tick returns like the pandas code the trackers replaced
+def std_pandas(prices, span):
+    return pd.Series(prices).pct_change().ewm(span=span, adjust=False).std()
+
+# ATR percentage and its average over the last limit klines like pandas_ta calculates them over all klines
+def atr_pandas(klines):
+    df   = pd.DataFrame(klines)
+    atrp = ta.atr(df['high'], df['low'], df['close'], length=14) / df['close'] * 100
+    return atrp.iloc[-1], atrp.iloc[-config.limit:].mean()
+
+def test_atr_follows_trade_klines():
+    klines = random_klines(config.limit + 100, 21)
+    live   = {column: list(values[:config.limit]) for column, values in klines.items()}
+    distance.create_atr(live)
+
+    # Kline updates of the open bar, the last one is the closed bar
+    for i in range(config.limit, config.limit + 100):
+        for part in (0.3, 0.6, 1.0):
+            high  = klines['close'][i] + (klines['high'][i] - klines['close'][i]) * part
+            low   = klines['close'][i] - (klines['close'][i] - klines['low'][i]) * part
+            for column, value in (('time', klines['time'][i]), ('high', high), ('low', low), ('close', klines['close'][i])):
+                if part == 0.3: live[column].append(value)
+                else: live[column][-1] = value
+            distance.update_atr(int(klines['time'][i]), high, low, float(klines['close'][i]))
+            percentage, average, multiplier = distance.calculate_atr()
+            expected = atr_pandas(live)
+            assert math.isclose(percentage, expected[0], rel_tol=1e-9)
+            assert math.isclose(average, expected[1], rel_tol=1e-9)
+
+def test_ewm_std_wave_matches_pandas():
+    times, prices = random_ticks(2000, 5)
+    raw           = series.create({'time': [], 'price': []})
+    distance.ewm_std.clear()
+    for i, (time, price) in enumerate(zip(times, prices)):
+        series.append(raw, time, price)
+        distance.update_ewm_std(time, price)
+        if i % 100 == 99:
+            for span in (5, 40, 300):
+                expected = std_pandas(prices[:i + 1], span)
+                assert math.isclose(distance.ewm_std_wave(raw, span), expected.iloc[-1] / expected.max(), rel_tol=1e-9)
+
+def test_ewm_std_wave_after_eviction():
+    times, prices = random_ticks(6000, 7)
+    raw           = series.create({'time': [], 'price': []})
+    distance.ewm_std.clear()
+    for i, (time, price) in enumerate(zip(times, prices)):
+        series.append(raw, time, price)
+        series.evict(raw, time - config.history_raw)
+        distance.update_ewm_std(time, price)
+        if i == 0:
+            distance.ewm_std_wave(raw, 40)
+        if i % 500 == 499:
+
+            # Tracker carries the EWM over evicted ticks, only its maximum is limited to the kept ticks
+            expected = std_pandas(prices[:i + 1], 40)[np.asarray(times[:i + 1]) >= raw['time'][0]]
+            assert math.isclose(distance.ewm_std_wave(raw, 40), expected.iloc[-1] / expected.max(), rel_tol=1e-9)
+
+            # A new span starts from the kept ticks
+            span     = 41 + i // 500
+            expected = std_pandas(raw['price'], span)
+            assert math.isclose(distance.ewm_std_wave(raw, span), expected.iloc[-1] / expected.max(), rel_tol=1e-9)
+    assert raw['time'][0] > times[0]
+
+def test_only_spans_in_use_are_stepped():
+    times, prices = random_ticks(400, 9)
+    raw           = series.create({'time': [], 'price': []})
+    distance.ewm_std.clear()
+    for i, (time, price) in enumerate(zip(times, prices)):
+        series.append(raw, time, price)
+        distance.update_ewm_std(time, price)
+        distance.ewm_std_wave(raw, 40 if i < 100 else 41)
+        if i >= 100 and time - times[99] <= config.wave_timeframe:
+            assert set(distance.ewm_std) == {40, 41}
+    assert set(distance.ewm_std) == {41}
+
+def test_wave_is_reused_across_orders_of_the_same_price(monkeypatch):
+    times, prices = random_ticks(200, 13)
+    history       = {'raw': series.create({'time': [], 'price': []})}
+    for time, price in zip(times, prices):
+        series.append(history['raw'], time, price)
+    monkeypatch.setattr(distance, "context_stats", {'reused': 0, 'computed': 0})
+    distance.context['key'] = None
+
+    # Trailing sell closes and a buy starts on the same price, they share the wave but not the protection
+    spot = float(prices[-1])
+    sell = {'side': "Sell", 'start': spot * 0.99, 'current': spot, 'distance': 0.1, 'wiggle': "Wave", 'fluctuation': 0.1, 'wave': 0}
+    buy  = {'side': "Buy", 'start': spot, 'current': spot, 'distance': 0.1, 'wiggle': "Wave", 'fluctuation': 0.1, 'wave': 0}
+    sell = distance.calculate(sell, history)
+    buy  = distance.calculate(buy, history)
+    assert distance.context_stats == {'reused': 1, 'computed': 1}
+
+    # Reused wave gives the same distance as a fresh calculation
+    distance.context['key'] = None
+    fresh = distance.calculate({**buy, 'wave': 0, 'fluctuation': 0.1}, history)
+    assert fresh['fluctuation'] == buy['fluctuation'] and fresh['wave'] == buy['wave']
+
+    # A new price calculates again
+    series.append(history['raw'], times[-1] + 100, spot + 0.5)
+    distance.calculate(sell, history)
+    assert distance.context_stats == {'reused': 1, 'computed': 3}
@@ -0,0 +1,62 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the order state cache fed by user.orders and user.trades
+
+# Load external libraries
+import pytest
+
+# Load internal libraries
+import fills
+
+# Message of a private channel
+def message(channel, data):
+    return {'jsonrpc': "2.0", 'method': "subscription", 'params': {'channel': channel, 'data': data}}
+
+# Order as Deribit pushes it
+def order(order_id, state, label="Sunflow-1", **fields):
+    return {'order_id': order_id, 'order_state': state, 'label': label, 'instrument_name': "BTC-PERPETUAL", 'direction': "sell", 'order_type': "stop_market",
+            'price': "market_price", 'amount': 10, 'filled_amount': 0, 'average_price': 0, 'trigger_price': 60000, 'creation_timestamp': 1, 'last_update_timestamp': 1, **fields}
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    fills.orders.clear()
+    fills.trades.clear()
+    yield
+    fills.orders.clear()
+    fills.trades.clear()
+
+def test_plain_fill():
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("1", "open", order_type="limit")))
+    assert not fills.filled("1")
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("1", "filled", order_type="limit", filled_amount=10, average_price=60010)))
+    assert fills.filled("1")
+    assert fills.filled_order("1")['result']['average_price'] == 60010
+
+def test_triggered_stop_fills_as_new_order():
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("SLTS-1", "untriggered")))
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("SLTS-1", "triggered")))
+    assert not fills.filled("SLTS-1", "Sunflow-1")
+
+    # Market order of the trigger fills under its own ID
+    fills.handle_trades(message("user.trades.BTC-PERPETUAL.raw", [{'order_id': "2", 'label': "Sunflow-1", 'state': "filled", 'amount': 10, 'price': 59990}]))
+    assert fills.filled("SLTS-1", "Sunflow-1")
+    assert not fills.filled("SLTS-1")
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("2", "filled", order_type="market", trigger_order_id="SLTS-1", filled_amount=10, average_price=59990)))
+    assert fills.filled("SLTS-1")
+
+    # Filled order keeps the ID and trigger price of the stop order
+    result = fills.filled_order("SLTS-1", "Sunflow-1")['result']
+    assert result['order_id'] == "SLTS-1" and result['order_state'] == "filled" and result['average_price'] == 59990 and result['trigger_price'] == 60000
+
+    # Closing the trail forgets all of it
+    fills.forget("SLTS-1", "Sunflow-1")
+    assert not fills.orders and not fills.trades
+
+def test_other_labels_do_not_match():
+    fills.handle_orders(message("user.orders.BTC-PERPETUAL.raw", order("3", "filled", label="Sunflow-2")))
+    assert not fills.filled("SLTS-1", "Sunflow-1")
+    assert fills.filled_order("SLTS-1", "Sunflow-1") == {}
+
+def test_partial_trade_is_not_filled():
+    fills.handle_trades(message("user.trades.BTC-PERPETUAL.raw", [{'order_id': "4", 'label': "Sunflow-1", 'state': "open", 'amount': 5, 'price': 60000}]))
+    assert not fills.filled("4", "Sunflow-1")
@@ -0,0 +1,34 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the tiered price history
+
+# Load external libraries
+import numpy as np
+
+# Load internal libraries
+import history
+
+def test_minute_bars_match_resampling():
+    rng    = np.random.default_rng(3)
+    times  = np.cumsum(rng.integers(1, 5000, 2000))
+    prices = 100 + np.cumsum(rng.normal(0, 0.1, 2000))
+    tiers  = history.create({'time': [], 'price': []}, 10 ** 9)
+    for time, price in zip(times.tolist(), prices.tolist()):
+        history.append(tiers, time, price)
+    starts  = times - times % 60000
+    buckets = np.unique(starts)
+    bars    = tiers['minute']
+    assert np.array_equal(bars['time'], buckets)
+    for i, start in enumerate(buckets):
+        inside = prices[starts == start]
+        assert (bars['open'][i], bars['high'][i], bars['low'][i], bars['close'][i]) == (inside[0], inside.max(), inside.min(), inside[-1])
+
+def test_late_tick_keeps_time_order():
+    tiers = history.create({'time': [0, 61000], 'price': [1.0, 2.0]}, 10 ** 9)
+    history.append(tiers, 30000, 5.0)
+    history.append(tiers, 62000, 3.0)
+    assert list(tiers['raw']['time']) == [0, 61000, 62000]
+    assert list(tiers['minute']['time']) == [0, 60000]
+    assert (tiers['minute']['high'][-1], tiers['minute']['close'][-1]) == (5.0, 3.0)
+    history.evict(tiers, 61500 + tiers['horizon']['raw'])
+    assert list(tiers['raw']['time']) == [62000]
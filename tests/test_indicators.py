@@ -0,0 +1,75 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the indicator graph, only the selected indicators and their dependencies are calculated
+
+# Load external libraries
+import math, numpy as np, pytest
+
+# Load internal libraries
+import indicators, kernels, series, streaming
+
+# Subsets of indicators, the first is all of them
+subsets = [[name for name in indicators.graph if name != "range"], ["rsi", "macd", "EMA20", "SMA50"], ["stochrsi"], ["williamsr", "stochk"], ["adx", "uo", "ao", "momentum", "cci"]]
+
+# Backends calculating values of nodes
+backends = {
+    'Streaming': lambda klines, nodes: streaming.calculate(klines, len(nodes), nodes),
+    'Kernels'  : kernels.calculate,
+    'Pandas'   : indicators.calculate_pandas
+}
+
+# Random walk of klines with one minute interval
+def random_klines(count, seed):
+    rng    = np.random.default_rng(seed)
+    close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    spread = close * rng.uniform(0, 0.003, count)
+    return series.create({'time': np.arange(count) * 60000, 'open': close, 'high': close + spread, 'low': close - spread, 'close': close, 'volume': rng.uniform(1, 10, count)})
+
+def test_resolve_adds_dependencies():
+    assert indicators.resolve(["stochrsi"]) == {"stochrsi", "rsi"}
+    assert indicators.resolve(["macd"]) == {"macd", "EMA12", "EMA26"}
+    assert indicators.resolve(["williamsr", "stochk"]) == {"williamsr", "stochk", "range"}
+    assert indicators.resolve(["cci", "unknown"]) == {"cci", "rsi"}
+    assert indicators.resolve([]) == frozenset()
+
+def test_graph_is_closed():
+    for name, dependencies in indicators.graph.items():
+        assert all(dependency in indicators.graph for dependency in dependencies), name
+        assert indicators.resolve(indicators.resolve([name])) == indicators.resolve([name])
+
+@pytest.mark.parametrize("backend", list(backends))
+def test_selective_matches_full_calculation(backend):
+    klines = random_klines(250, 11)
+    full   = backends[backend](klines, indicators.resolve(subsets[0]))
+    for subset in subsets[1:]:
+        nodes  = indicators.resolve(subset)
+        values = backends[backend](klines, nodes)
+        assert set(values) < set(full)
+        for name, value in values.items():
+            assert math.isclose(value, full[name], rel_tol=1e-12, abs_tol=1e-12), name
+
+def test_evaluate_only_selected():
+    klines = random_klines(250, 13)
+    spot   = float(klines['close'][-1])
+    for subset in subsets:
+        values = indicators.calculate_pandas(klines, indicators.resolve(subset))
+        assert set(indicators.evaluate(values, spot, subset)) == set(subset)
+
+@pytest.mark.parametrize("backend", list(backends))
+def test_close_policy_uses_last_closed_kline(backend, monkeypatch):
+    monkeypatch.setattr(indicators.config, "indicators_policy", "Close")
+    monkeypatch.setattr(indicators.config, "indicators_backend", backend)
+    klines   = random_klines(251, 17)
+    expected = indicators.calculate_pandas(series.create({column: klines[column][:-1] for column in klines['columns']}), indicators.nodes)
+    interval = 900 + len(backend)
+
+    # Values are those of the last closed kline
+    values = indicators.calculate_values(klines, interval)
+    assert set(values) == set(expected)
+    for name, value in values.items():
+        assert math.isclose(value, expected[name], rel_tol=1e-6, abs_tol=1e-4) or (math.isnan(value) and math.isnan(expected[name])), name
+
+    # The open kline that is still forming does not change them
+    klines['close'][-1] = klines['close'][-1] * 1.05
+    klines['high'][-1]  = klines['close'][-1]
+    assert indicators.calculate_values(klines, interval) == values
@@ -0,0 +1,67 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the NumPy kernels against pandas and pandas_ta on every path of the exponentially weighted mean
+
+# Load external libraries
+import math, numpy as np, pandas as pd, pytest
+
+# Load internal libraries
+import indicators, kernels, series
+
+# Values may differ by rounding of cumulative sums only
+tolerance = {'rel_tol': 1e-9, 'abs_tol': 1e-9}
+
+# All indicators
+nodes = indicators.resolve(list(indicators.graph))
+
+# Random walk of klines with one minute interval and a flat stretch with zero ranges
+def random_klines(count, seed):
+    rng    = np.random.default_rng(seed)
+    close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    spread = close * rng.uniform(0, 0.003, count)
+    close[100:120] = close[100]
+    spread[100:120] = 0
+    return series.create({'time': np.arange(count) * 60000, 'open': close, 'high': close + spread, 'low': close - spread, 'close': close, 'volume': rng.uniform(1, 10, count)})
+
+# Select the path of the exponentially weighted mean
+@pytest.fixture(params=["closed", "interpreted", "numba"])
+def path(request, monkeypatch):
+    if request.param == "numba":
+        pytest.importorskip("numba")
+        assert kernels.njit is not None
+    else:
+        monkeypatch.setattr(kernels, "njit", None)
+        monkeypatch.setattr(kernels, "ewm_loop", getattr(kernels.ewm_loop, "py_func", kernels.ewm_loop))
+    if request.param == "interpreted":
+        monkeypatch.setattr(kernels, "closed_limit", 0)
+    return request.param
+
+def assert_close(values, expected):
+    assert len(values) == len(expected)
+    for value, reference in zip(values, expected):
+        assert (math.isnan(value) and math.isnan(reference)) or math.isclose(value, reference, **tolerance)
+
+@pytest.mark.parametrize("adjust", [True, False])
+def test_ewm_matches_pandas(path, adjust):
+    rng    = np.random.default_rng(7)
+    values = rng.normal(0, 1, 300)
+    values[:5] = np.nan
+    if adjust:
+        values[50:53] = np.nan
+    for alpha in (1 / 14, 2 / 27, 2 / 201):
+        expected = pd.Series(values).ewm(alpha=alpha, adjust=adjust, min_periods=14).mean().to_numpy()
+        assert_close(kernels.ewm(values, alpha, adjust, 14), expected)
+
+def test_ewm_falls_back_when_weights_overflow():
+    values   = np.random.default_rng(3).normal(0, 1, 10000)
+    expected = pd.Series(values).ewm(alpha=1 / 14, adjust=True, min_periods=14).mean().to_numpy()
+    assert -len(values) * math.log(1 - 1 / 14) >= kernels.closed_limit
+    assert_close(kernels.ewm(values, 1 / 14, True, 14), expected)
+
+def test_calculate_matches_pandas_ta(path):
+    klines   = random_klines(250, 17)
+    expected = indicators.calculate_pandas(klines, nodes)
+    values   = kernels.calculate(klines, nodes)
+    assert set(values) == set(expected)
+    for name, value in expected.items():
+        assert math.isclose(values[name], value, **tolerance), name
@@ -0,0 +1,49 @@
+### Sunflow Cryptobot ###
+#
+# Tests of klines of larger intervals derived from interval 1 klines
+
+# Load external libraries
+import numpy as np, pytest
+
+# Load internal libraries
+from loader import load_config
+import defs, series
+
+# Load config
+config = load_config()
+
+# Random walk of 1 minute klines
+def random_klines(count, seed):
+    rng   = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    return {'time': np.arange(count) * 60000, 'open': np.roll(close, 1), 'high': close * 1.001, 'low': close * 0.999, 'close': close, 'volume': rng.uniform(1, 10, count), 'turnover': rng.uniform(1, 10, count)}
+
+# Kline of interval as the exchange would provide it, aggregated over all history
+def expected_kline(data, end, interval):
+    full = defs.aggregate_klines(series.create({column: values[:end] for column, values in data.items()}), interval)
+    return {column: float(full[column][-1]) for column in data}
+
+def test_derivable():
+    assert defs.derivable(15, 1) and defs.derivable(10, 5)
+    assert not defs.derivable(0, 1) and not defs.derivable(15, 0) and not defs.derivable(7, 2)
+    assert not defs.derivable(config.limit + 110, 1)
+
+def test_derived_kline_matches_aggregation():
+    data   = random_klines(config.limit + 200, 4)
+    klines = series.create({column: values[:config.limit] for column, values in data.items()})
+    for i in range(config.limit, config.limit + 200):
+        klines = defs.add_kline({column: values[i] for column, values in data.items()}, klines)
+        assert defs.derive_kline(klines, 15) == pytest.approx(expected_kline(data, i + 1, 15), rel=1e-12)
+
+def test_ratio_above_limit_is_not_derived():
+    interval = config.limit + 110
+    data     = random_klines(2 * interval, 6)
+    klines   = series.create({column: values[:config.limit] for column, values in data.items()})
+    for i in range(config.limit, 2 * interval):
+        klines = defs.add_kline({column: values[i] for column, values in data.items()}, klines)
+
+    # The bucket started before the kept klines, deriving would give the open and volume of a partial bucket
+    derived  = defs.derive_kline(klines, interval)
+    expected = expected_kline(data, 2 * interval, interval)
+    assert derived['time'] == expected['time'] and derived['open'] != expected['open'] and derived['volume'] < expected['volume']
+    assert not defs.derivable(interval, 1)
@@ -0,0 +1,57 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the optimizer volatility engine against the pandas calculation it replaced
+
+# Load external libraries
+import math, numpy as np, pandas as pd
+
+# Load internal libraries
+import optimum
+
+# Deviation of the last bar as the old pandas code calculated it from the closes of the bars in the window
+def deviation_pandas(closes, length):
+    df               = pd.DataFrame({'price': closes})
+    df['log_return'] = df['price'].apply(math.log) - df['price'].shift(1).apply(math.log)
+    df['volatility'] = df['log_return'].rolling(window=length).std() * math.sqrt(length)
+    average          = df['volatility'].mean()
+    return (df['volatility'].iloc[-1] - average) / average
+
+# Random walk of ticks with gaps of up to two bars
+def random_ticks(count, seed):
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.integers(1, 120000, count)).tolist(), (100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))).tolist()
+
+def test_deviation_matches_pandas():
+    times, prices = random_ticks(3000, 5)
+    optimizer     = {'interval': 1, 'delta': 'min', 'limit_max': 10 ** 12}
+    optimizer     = optimum.create_bars(optimizer, {'time': times[:500], 'price': prices[:500]})
+    closes        = {}
+    for i, (time, price) in enumerate(zip(times, prices)):
+        if i >= 500:
+            optimum.update_bars(optimizer, time, price)
+        closes[time - time % 60000] = price
+        if i >= 500 and i % 50 == 0:
+            expected = deviation_pandas(list(closes.values()), 10)
+            assert math.isclose(optimum.deviation_volatility(optimizer['volatility'], optimizer['bars']['close'][-1]), expected, rel_tol=1e-9, abs_tol=1e-12)
+
+def test_deviation_matches_pandas_after_eviction():
+    times, prices = random_ticks(3000, 9)
+    optimizer     = {'interval': 1, 'delta': 'min', 'limit_max': 200 * 60000}
+    optimizer     = optimum.create_bars(optimizer, {'time': times[:1], 'price': prices[:1]})
+    closes        = {}
+    for i, (time, price) in enumerate(zip(times, prices)):
+        if i >= 1:
+            optimum.update_bars(optimizer, time, price)
+        closes[time - time % 60000] = price
+        if i >= 200 and i % 50 == 0:
+            kept     = optimum.series.size(optimizer['bars'])
+            expected = deviation_pandas(list(closes.values())[-kept:], 10)
+            assert math.isclose(optimum.deviation_volatility(optimizer['volatility'], optimizer['bars']['close'][-1]), expected, rel_tol=1e-9, abs_tol=1e-12)
+
+def test_calc_volatility_during_warm_up(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "data").mkdir()
+    times, prices = random_ticks(3, 11)
+    optimizer     = {'interval': 1, 'delta': 'min', 'limit_max': 10 ** 12, 'scaler': 1, 'adj_min': -1, 'adj_max': 1, 'spread_enabled': False}
+    optimizer     = optimum.create_bars(optimizer, {'time': times, 'price': prices})
+    assert optimum.calc_volatility(optimizer, {'time': times}, 0.2, 0.5, 1.0) == (0.2, 0.5, 1.0, False)
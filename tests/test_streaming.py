@@ -0,0 +1,68 @@
+### Sunflow Cryptobot ###
+#
+# Tests of the streaming indicators against pandas_ta, including after klines rolled off
+
+# Load external libraries
+import math, numpy as np
+
+# Load internal libraries
+from loader import load_config
+import defs, indicators, series, streaming
+
+# Load config
+config = load_config()
+
+# All indicators and the values evaluate uses of them
+nodes = indicators.resolve(list(indicators.graph))
+
+# Window based indicators and moving averages match pandas_ta over the kept klines, other recursions keep the klines that rolled off with weights
+# like (13 / 14) ** 236, oscillators from 0 to 100 then differ by up to 1e-5 and MACD by up to 1e-8 at prices around 100
+tolerance = {name: {'rel_tol': 1e-9, 'abs_tol': 1e-9} for name in ('cci', 'ao', 'ao_prev', 'momentum', 'momentum_prev', 'williamsr', 'uo', 'stoch_k', 'stoch_d', 'macd')}
+tolerance.update({name: {'rel_tol': 0, 'abs_tol': 1e-4} for name in ('rsi', 'stochrsi_k', 'stochrsi_d', 'adx', 'dmp', 'dmn')})
+tolerance.update({name: {'rel_tol': 0, 'abs_tol': 1e-7} for name in ('macd_signal', 'macd_hist', 'macd_hist_prev')})
+
+# Random walk of klines with one minute interval
+def random_klines(count, seed):
+    rng    = np.random.default_rng(seed)
+    close  = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, count)))
+    spread = close * rng.uniform(0, 0.003, count)
+    return {'time': np.arange(count) * 60000, 'open': close, 'high': close + spread, 'low': close - spread, 'close': close, 'volume': rng.uniform(1, 10, count)}
+
+# Compare all values of the streaming engine with pandas_ta
+def assert_matches(klines):
+    expected = indicators.calculate_pandas(klines, nodes)
+    values   = streaming.calculate(klines, 1, nodes)
+    for name, value in expected.items():
+        assert math.isclose(values[name], value, **tolerance.get(name, {'rel_tol': 1e-9, 'abs_tol': 1e-9})), name
+
+def test_streaming_matches_pandas_after_rollover():
+    data   = random_klines(config.limit + 300, 3)
+    klines = series.create({column: values[:config.limit] for column, values in data.items()})
+    streaming.engines.clear()
+    assert_matches(klines)
+
+    # Ticks update the open kline, new klines roll the oldest off
+    for i in range(config.limit, config.limit + 300):
+        kline = {column: values[i] for column, values in data.items()}
+        for price in (kline['open'], kline['high'], kline['low'], kline['close']):
+            klines = defs.add_kline(dict(kline, close=price), klines)
+            assert_matches(klines)
+    assert klines['time'][0] > data['time'][0]
+
+def test_streaming_rolls_without_rebuilding(monkeypatch):
+    data   = random_klines(config.limit + 50, 8)
+    klines = series.create({column: values[:config.limit] for column, values in data.items()})
+    streaming.engines.clear()
+    streaming.calculate(klines, 1, nodes)
+    engine = streaming.engines[1]
+
+    # Count steps, a new kline commits the closed kline and peeks at the open one
+    steps = []
+    step  = streaming.step
+    monkeypatch.setattr(streaming, "step", lambda *args: steps.append(args[-1]) or step(*args))
+    for i in range(config.limit, config.limit + 50):
+        klines = defs.add_kline({column: values[i] for column, values in data.items()}, klines)
+        streaming.calculate(klines, 1, nodes)
+        assert steps == [True, False]
+        steps.clear()
+    assert streaming.engines[1] is engine and engine['count'] == config.limit - 1
@@ -3,11 +3,11 @@
 # Traling buy and sell
 
 # Load external libraries
-import pprint, requests, threading
+import pprint, threading
 
 # Load internal libraries
 from loader import load_config
-import database, defs, deribit, distance, orders
+import client, database, defs, deribit, distance, fills, orders
 
 # Load config
 config = load_config()
@@ -34,24 +34,33 @@ def check_order(symbol, spot, compounding, active_order, all_buys, all_sells, in
     result         = ()
     type_check     = ""
     do_check_order = False
+    use_cache      = False
     fill_manual    = False
 
-    # Has current price crossed trigger price
-    if active_order['side'] == "Sell":
-        if active_order['current'] <= active_order['trigger']:
-            type_check     = "a regular"
-            do_check_order = True
-    else:
-        if active_order['current'] >= active_order['trigger']:
-            type_check     = "a regular"
+    # Fill was pushed by the exchange, no need to poll, a triggered stop order fills under its label
+    if fills.active():
+        if fills.filled(active_order['orderid'], active_order['linkid']):
+            type_check     = "a pushed"
             do_check_order = True
+            use_cache      = True
+
+    # Has current price crossed trigger price, also when subscribed in case an event was missed
+    if not do_check_order:
+        if active_order['side'] == "Sell":
+            if active_order['current'] <= active_order['trigger']:
+                type_check     = "a regular"
+                do_check_order = True
+        else:
+            if active_order['current'] >= active_order['trigger']:
+                type_check     = "a regular"
+                do_check_order = True
 
     # Check every interval, sometimes orders get stuck
     current_time = defs.now_utc()[4]
     if stuck['check']:
         stuck['check'] = False
         stuck['time']  = defs.now_utc()[4]
-    if current_time - stuck['time'] > stuck['interval']:
+    if (not do_check_order) and (current_time - stuck['time'] > stuck['interval']):
         type_check = "an additional"
         do_check_order = True
 
@@ -67,7 +76,7 @@ def check_order(symbol, spot, compounding, active_order, all_buys, all_sells, in
         stuck['check'] = True
         
         # Has trailing endend, check if order does still exist
-        result       = orders.transaction_from_id(active_order['orderid'], active_order['linkid'], info)
+        result       = orders.transaction_from_id(active_order['orderid'], active_order['linkid'], info, False, use_cache)
         order        = result[0]
         error_code   = result[1]
         
@@ -251,7 +260,7 @@ def close_trail(active_order, all_buys, all_sells, spot, info, fill_manual=False
     if not fill_manual:  
     
         # Close the transaction on either buy or sell trailing order
-        transaction = orders.transaction_from_id(active_order['orderid'], active_order['linkid'], info)[0]
+        transaction = orders.transaction_from_id(active_order['orderid'], active_order['linkid'], info, False, True)[0]
         transaction['status'] = "Closed"
         if debug:
             defs.announce(f"Debug: {active_order['side']} order")
@@ -284,6 +293,9 @@ def close_trail(active_order, all_buys, all_sells, spot, info, fill_manual=False
     if config.database_rebalance:
         all_buys = orders.rebalance(all_buys, info)
 
+    # Order is closed, remove pushed events
+    fills.forget(active_order['orderid'], active_order['linkid'])
+
     # Output to stdout
     defs.announce(f"Closed trailing {active_order['side'].lower()} order")
 
@@ -429,17 +441,11 @@ def amend_quantity_sell(symbol, active_order, info):
     deribit.authenticate()
     message = defs.announce("session: amend_order")
     try:
-        url     = config.api_url + "/private/edit"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "amount"  : float(active_order['qty_new']),
             "order_id": str(active_order['orderid']),
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/edit", params, True)
     except Exception as e:
         message = f"*** Error: Amend quantity sell failed: {e} ***"
         defs.announce(message)
@@ -556,18 +562,12 @@ def amend_trigger_price(symbol, active_order, info):
     deribit.authenticate()
     message = defs.announce("session: /private/edit")
     try:
-        url     = config.api_url + "/private/edit"
-        headers = {
-            "Authorization": f"Bearer {config.access_token}",
-            "Content-Type" : "application/json"
-        }
         params = {
             "amount"       : float(active_order['qty']),
             "order_id"     : str(active_order['orderid']),
             "trigger_price": str(active_order['trigger_new'])
         }
-        response = requests.get(url, headers=headers, params=params)
-        data     = response.json()
+        data = client.get("/private/edit", params, True)
     except Exception as e:
         message = f"*** Error: Amend trigger price failed: {e}"
         defs.announce(message)
@@ -0,0 +1,132 @@
+### Sunflow Cryptobot ###
+#
+# Worker processes that calculate indicator advice per interval, klines are shipped as shared memory
+
+# Load external libraries
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import atexit, multiprocessing, numpy as np
+
+# Load internal libraries
+from loader import load_config
+import defs, indicators
+
+# Load config
+config = load_config()
+
+# Kline columns in shared memory, time is stored as float64 which is exact for times in ms
+columns = ['time', 'open', 'high', 'low', 'close', 'volume', 'turnover']
+
+# Worker and shared memory per interval, in the main process
+pools  = {}
+blocks = {}
+
+# Shared memory attached per interval, in the worker processes
+attached = {}
+
+# Start one worker per interval, workers are forked so they share the loaded modules and streaming state
+def start(klines):
+
+    # Fork is required, spawn would run the main program again in every worker
+    if "fork" not in multiprocessing.get_all_start_methods():
+        defs.log_error("*** Warning: Worker processes require fork, calculating indicators serially ***")
+        return
+
+    # Handlers wait for the workers, on the event loop that would stall the websocket
+    if not config.exchange_threaded:
+        defs.log_error("*** Warning: Worker processes require exchange_threaded, calculating indicators serially ***")
+        return
+
+    # Start workers and wait until each is forked, before other threads exist that could hold locks in the fork
+    context = multiprocessing.get_context("fork")
+    for interval in klines:
+        pools[interval] = ProcessPoolExecutor(max_workers=1, mp_context=context)
+        pools[interval].submit(ready).result()
+    defs.announce(f"Started {len(pools)} indicator worker processes")
+
+    # Stop workers and release shared memory on exit
+    atexit.register(stop)
+
+    # Return
+    return
+
+# Does nothing, waiting for it makes sure the worker process was forked
+def ready():
+    return True
+
+# Stop workers and release shared memory
+def stop():
+
+    # Stop workers
+    for pool in pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+    pools.clear()
+
+    # Release shared memory
+    for block, capacity in blocks.values():
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+    # Return
+    return
+
+# Check if workers are running
+def active():
+    return len(pools) > 0
+
+# Copy klines into the shared memory of interval, memory is replaced when klines outgrow it
+def share(interval, klines):
+
+    # Initialize variables
+    length          = len(klines['time'])
+    block, capacity = blocks.get(interval, (None, 0))
+
+    # Allocate shared memory with room to grow
+    if length > capacity:
+        if block is not None:
+            block.close()
+            block.unlink()
+        capacity         = max(2 * length, 1)
+        block            = shared_memory.SharedMemory(create=True, size=len(columns) * capacity * 8)
+        blocks[interval] = (block, capacity)
+
+    # Copy columns
+    buffer = np.ndarray((len(columns), capacity), dtype=np.float64, buffer=block.buf)
+    for row, column in enumerate(columns):
+        buffer[row, :length] = klines[column]
+
+    # Return name, capacity and length
+    return block.name, capacity, length
+
+# Submit advice calculation of interval to its worker
+def submit(interval, klines, spot):
+
+    # Share klines, the worker reads them before the next update because callers wait for the result
+    name, capacity, length = share(interval, klines)
+
+    # Return future
+    return pools[interval].submit(evaluate, interval, name, capacity, length, spot)
+
+# Calculate advice from shared memory, runs in a worker process
+def evaluate(interval, name, capacity, length, spot):
+
+    # Attach shared memory once per block
+    if interval not in attached or attached[interval].name != name:
+        if interval in attached:
+            attached[interval].close()
+        attached[interval] = shared_memory.SharedMemory(name=name)
+    block = attached[interval]
+
+    # Klines as views on shared memory, like series provides them
+    buffer = np.ndarray((len(columns), capacity), dtype=np.float64, buffer=block.buf)
+    klines = {'columns': columns}
+    for row, column in enumerate(columns):
+        klines[column] = buffer[row, :length]
+
+    # Calculate advice
+    values = indicators.calculate_values(klines, interval)
+    result = indicators.advice(indicators.evaluate(values, spot, indicators.selected))
+
+    # Return strength and advice
+    return result